@@ -0,0 +1,127 @@
+"""
+Benchmark inline completion under typing.
+
+Starts a fake OpenAI-compatible server that answers after ``--upstream-ms`` and a
+Pulse-TeX server pointed at it. ``--editors`` concurrent editors type a sentence
+one character every ``--keystroke-ms``, pausing ``--pause-ms`` after each word
+and requesting a completion per keystroke, then retype it. Reports how many
+keystrokes reached the upstream and the server's p50/p95 latency for served
+completions.
+
+Usage:
+    python benchmarks/bench_inline_completion.py [--editors 4] [--keystroke-ms 60] [--pause-ms 500] [--upstream-ms 120]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+SENTENCE = "We evaluate the sampler on three standard image benchmarks"
+
+
+class FakeUpstream:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def completions(self, request):
+        body = await request.json()
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return JSONResponse(
+            {
+                "id": "bench",
+                "object": "chat.completion",
+                "created": 0,
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": " and report FID."},
+                        "finish_reason": "stop",
+                    }
+                ],
+            }
+        )
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[Route("/v1/chat/completions", self.completions, methods=["POST"])])
+
+
+def _serve(app) -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+async def _type(client: httpx.AsyncClient, editor: int, keystroke: float, pause: float) -> list[str]:
+    prefix = f"\\section{{Results {editor}}}\n"
+    requests = []
+    for char in SENTENCE:
+        prefix += char
+        payload = {"prefix": prefix, "suffix": "\n", "session_id": f"editor-{editor}"}
+        requests.append(asyncio.create_task(client.post("/api/ai/complete", json=payload)))
+        await asyncio.sleep(pause if char == " " else keystroke)
+    return [(await r).json()["source"] for r in requests]
+
+
+async def _run(base_url: str, editors: int, keystroke: float, pause: float) -> list[str]:
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        results = await asyncio.gather(*(_type(client, e, keystroke, pause) for e in range(editors)))
+    return [source for sources in results for source in sources]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--editors", type=int, default=4)
+    parser.add_argument("--keystroke-ms", type=float, default=60)
+    parser.add_argument("--pause-ms", type=float, default=500)
+    parser.add_argument("--upstream-ms", type=float, default=120)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="pulse-tex-bench-"))
+    os.environ["PULSE_TEX_DATABASE_URL"] = f"sqlite:///{workdir / 'bench.db'}"
+    os.environ["PULSE_TEX_PROJECTS_DIR"] = str(workdir / "projects")
+
+    from pulse_tex.web.app import create_app
+
+    upstream = FakeUpstream(args.upstream_ms / 1000)
+    upstream_url = _serve(upstream.app())
+    base_url = _serve(create_app())
+    httpx.patch(f"{base_url}/api/config", json={"ai_api_key": "bench", "ai_base_url": upstream_url}).raise_for_status()
+
+    for run in ("first pass", "retyped"):
+        calls = upstream.calls
+        sources = asyncio.run(_run(base_url, args.editors, args.keystroke_ms / 1000, args.pause_ms / 1000))
+        print(f"{run} ({len(sources)} keystrokes):")
+        for source in ("upstream", "cache", "superseded"):
+            print(f"  {source + ':':<12} {sources.count(source):6d}")
+        print(f"  upstream calls: {upstream.calls - calls:4d}")
+
+    stats = httpx.get(f"{base_url}/api/ai/status").json()["completion"]
+    print(f"served latency p50: {stats['latency_ms']['p50']:8.1f} ms")
+    print(f"served latency p95: {stats['latency_ms']['p95']:8.1f} ms")
+    print(f"upstream p50:       {stats['upstream_latency_ms']['p50']:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark revision history storage and reconstruction on a long-lived file.
+
+Usage:
+    python benchmarks/bench_revisions.py [--revisions 10000] [--snapshot-every 20]
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pulse_tex.core.revisions import (  # noqa: E402
+    RevisionPolicy,
+    reconstruct_revision,
+    record_revision,
+    revision_storage,
+)
+from pulse_tex.models import Base  # noqa: E402
+
+
+def _edit(lines: list[str], rng: random.Random) -> None:
+    i = rng.randrange(len(lines))
+    action = rng.random()
+    if action < 0.6:
+        lines[i] = f"Edited sentence {rng.randrange(10**6)} with some words about the results.\n"
+    elif action < 0.85:
+        lines.insert(i, f"New sentence {rng.randrange(10**6)} added while writing.\n")
+    elif len(lines) > 10:
+        del lines[i]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--revisions", type=int, default=10000)
+    parser.add_argument("--snapshot-every", type=int, default=20)
+    parser.add_argument("--lines", type=int, default=400)
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    policy = RevisionPolicy(min_interval=0, snapshot_every=args.snapshot_every, max_per_file=0)
+
+    lines = [f"Line {i} of the paper body with typical LaTeX \\cite{{key{i}}} content.\n" for i in range(args.lines)]
+    start = datetime(2026, 1, 1)
+    full_bytes = 0
+
+    with Session(engine) as session:
+        t0 = time.perf_counter()
+        for i in range(args.revisions):
+            _edit(lines, rng)
+            content = "".join(lines)
+            full_bytes += len(content)
+            record_revision(session, "bench", "main.tex", content, start + timedelta(minutes=i), policy)
+            if i % 500 == 0:
+                session.commit()
+        session.commit()
+        record_time = time.perf_counter() - t0
+
+        storage = revision_storage(session, "bench")
+
+        revs = [rng.randint(1, args.revisions) for _ in range(args.samples)]
+        timings = []
+        for rev in revs:
+            t0 = time.perf_counter()
+            assert reconstruct_revision(session, "bench", "main.tex", rev) is not None
+            timings.append(time.perf_counter() - t0)
+        timings.sort()
+
+    print(f"revisions:          {storage['revisions']}")
+    print(f"record throughput:  {args.revisions / record_time:,.0f} rev/s")
+    print(f"full-copy storage:  {full_bytes / 1e6:,.1f} MB")
+    ratio = full_bytes / storage["stored_bytes"]
+    print(f"delta storage:      {storage['stored_bytes'] / 1e6:,.1f} MB ({ratio:.1f}x smaller)")
+    print(f"reconstruct p50:    {timings[len(timings) // 2] * 1e3:.2f} ms")
+    print(f"reconstruct p95:    {timings[int(len(timings) * 0.95)] * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
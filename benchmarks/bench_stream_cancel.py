@@ -0,0 +1,148 @@
+"""
+Benchmark how quickly an abandoned AI stream releases its upstream connection.
+
+Starts a fake OpenAI-compatible server that streams a token every ``--interval``
+seconds forever and a Pulse-TeX server pointed at it, opens ``--streams``
+concurrent chat streams and stops each after its first event, either by closing
+the client connection or through the cancel endpoint. Reports the time until
+the fake upstream sees its connection closed.
+
+Usage:
+    python benchmarks/bench_stream_cancel.py [--streams 20] [--interval 0.05]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+class FakeUpstream:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.open = 0
+        self.closed_at: dict[str, float] = {}
+
+    async def completions(self, request):
+        body = await request.json()
+        tag = body["messages"][-1]["content"]
+        chunk = {
+            "id": "bench",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": body["model"],
+            "choices": [{"index": 0, "delta": {"content": "token "}, "finish_reason": None}],
+        }
+
+        async def tokens():
+            self.open += 1
+            try:
+                while True:
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    await asyncio.sleep(self.interval)
+            finally:
+                self.open -= 1
+                self.closed_at[tag] = time.perf_counter()
+
+        return StreamingResponse(tokens(), media_type="text/event-stream")
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[Route("/v1/chat/completions", self.completions, methods=["POST"])])
+
+
+def _serve(app) -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+async def _first_event(lines) -> None:
+    async for line in lines:
+        if line.startswith("data: {"):
+            return
+
+
+async def _disconnect(client: httpx.AsyncClient, tag: str) -> float:
+    async with client.stream("POST", "/api/ai/chat/stream", json={"message": tag}) as response:
+        await _first_event(response.aiter_lines())
+        stopped = time.perf_counter()
+    return stopped
+
+
+async def _cancel(client: httpx.AsyncClient, tag: str) -> float:
+    async with client.stream("POST", "/api/ai/chat/stream", json={"message": tag}) as response:
+        lines = response.aiter_lines()
+        await _first_event(lines)
+        stopped = time.perf_counter()
+        (await client.post(f"/api/ai/streams/{response.headers['X-Stream-ID']}/cancel")).raise_for_status()
+        async for line in lines:
+            if line == "data: [DONE]":
+                break
+    return stopped
+
+
+def _percentile(values: list[float], q: float) -> float:
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def _measure(base_url: str, upstream: FakeUpstream, mode, streams: int) -> list[float]:
+    tags = [f"{mode.__name__.strip('_')}-{i}" for i in range(streams)]
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        stopped = await asyncio.gather(*(mode(client, tag) for tag in tags))
+    deadline = time.perf_counter() + 5
+    while any(tag not in upstream.closed_at for tag in tags) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    return sorted(upstream.closed_at.get(tag, float("inf")) - t for tag, t in zip(tags, stopped))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--streams", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.05)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="pulse-tex-bench-"))
+    os.environ["PULSE_TEX_DATABASE_URL"] = f"sqlite:///{workdir / 'bench.db'}"
+    os.environ["PULSE_TEX_PROJECTS_DIR"] = str(workdir / "projects")
+    os.environ["PULSE_TEX_AI_UPSTREAM_CONCURRENCY"] = str(args.streams)
+
+    from pulse_tex.web.app import create_app
+
+    upstream = FakeUpstream(args.interval)
+    upstream_url = _serve(upstream.app())
+    base_url = _serve(create_app())
+    httpx.patch(f"{base_url}/api/config", json={"ai_api_key": "bench", "ai_base_url": upstream_url}).raise_for_status()
+
+    for mode in (_disconnect, _cancel):
+        latencies = asyncio.run(_measure(base_url, upstream, mode, args.streams))
+        print(f"{mode.__name__.strip('_')} ({args.streams} streams):")
+        print(f"  release p50:  {_percentile(latencies, 0.5) * 1000:8.1f} ms")
+        print(f"  release p95:  {_percentile(latencies, 0.95) * 1000:8.1f} ms")
+        print(f"  release max:  {latencies[-1] * 1000:8.1f} ms")
+
+    status = httpx.get(f"{base_url}/api/ai/status").json()
+    print(f"upstream connections open: {upstream.open}")
+    print(f"in flight after:           {status['queue']['in_flight']}")
+
+
+if __name__ == "__main__":
+    main()
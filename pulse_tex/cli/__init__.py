@@ -155,6 +155,8 @@ def cli():
         stop           Stop background service
         restart        Restart service
         status         View service status
+        db maintain    Checkpoint, vacuum and analyze the database
+        gc             Report disk usage and remove unused files
 
     After starting, visit http://localhost:8001
 
@@ -165,6 +167,8 @@ def cli():
         tex-serve serve . -f           # Run in foreground
         tex-serve stop .               # Stop service
         tex-serve status .             # View status
+        tex-serve db maintain .        # Compact the database
+        tex-serve gc . --dry-run       # Show what GC would remove
     """
     pass
 
@@ -624,5 +628,119 @@ def restart(directory, foreground, force):
     _do_serve(str(directory), prev_host, prev_port, foreground, False)
 
 
+def _format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+@cli.group()
+def db():
+    """Database maintenance"""
+    pass
+
+
+@db.command()
+@click.argument("directory", type=click.Path(exists=False, file_okay=False), default=".")
+@click.option("--no-vacuum", is_flag=True, help="Skip VACUUM (checkpoint and analyze only)")
+@click.option("--top", default=10, type=int, help="Number of projects to list by size (default: 10)")
+@click.option(
+    "--compact-days",
+    type=int,
+    default=None,
+    help="Thin revision history older than this many days (default: PULSE_TEX_REVISION_COMPACT_DAYS, 0 = skip)",
+)
+def maintain(directory, no_vacuum, top, compact_days):
+    """Thin old revision history, checkpoint the WAL, VACUUM, ANALYZE and report database sizes"""
+    from pulse_tex.core.config import get_db
+
+    directory = Path(directory).resolve()
+    db_path = directory / "data" / "pulse_tex.db"
+    if not db_path.exists():
+        click.secho("未初始化，请先运行 'tex-serve init'", fg="red")
+        return
+    os.environ["PULSE_TEX_DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["PULSE_TEX_PROJECTS_DIR"] = str(directory / "projects")
+
+    click.echo(f"\n{'=' * 50}")
+    click.echo("  Pulse-TeX - Database Maintenance")
+    click.echo(f"{'=' * 50}\n")
+    click.echo(f"Database: {db_path}")
+
+    report = get_db().maintain(vacuum=not no_vacuum, compact_days=compact_days)
+    before, after = report["before"], report["after"]
+
+    click.echo(f"\nDatabase: {_format_bytes(before['db_bytes'])} -> {_format_bytes(after['db_bytes'])}")
+    click.echo(f"WAL:      {_format_bytes(before['wal_bytes'])} -> {_format_bytes(after['wal_bytes'])}")
+    click.echo(f"Free pages: {before['free_pages']} -> {after['free_pages']}")
+    click.echo(f"VACUUM: {'done' if report['vacuumed'] else 'skipped'}")
+    click.echo(f"Revisions compacted: {report['revisions_removed']} removed")
+    checkpoint = report["checkpoint"]
+    if checkpoint and checkpoint["busy"]:
+        click.secho("Checkpoint incomplete: database busy (is the service running?)", fg="yellow")
+
+    projects = report["projects"]
+    if projects and top > 0:
+        click.echo(f"\nLargest projects ({min(top, len(projects))} of {len(projects)}):")
+        for project in projects[:top]:
+            click.echo(
+                f"  {project['name'][:30]:<30} files {_format_bytes(project['file_bytes']):>10}"
+                f"  history {_format_bytes(project['revision_bytes']):>10}"
+            )
+    click.secho("\nMaintenance complete", fg="green", bold=True)
+
+
+@cli.command()
+@click.argument("directory", type=click.Path(exists=False, file_okay=False), default=".")
+@click.option("--quota", type=int, default=None, help="Disk quota in MB (default: PULSE_TEX_DISK_QUOTA_MB, 0 = none)")
+@click.option("--dry-run", is_flag=True, help="Only report what would be removed")
+@click.option("--top", default=10, type=int, help="Number of projects to list by size (default: 10)")
+def gc(directory, quota, dry_run, top):
+    """Report disk usage, remove files of deleted projects and evict old build outputs"""
+    from pulse_tex.core.config import Config, get_db
+    from pulse_tex.core.disk import collect_garbage, disk_usage
+
+    directory = Path(directory).resolve()
+    db_path = directory / "data" / "pulse_tex.db"
+    if not db_path.exists():
+        click.secho("未初始化，请先运行 'tex-serve init'", fg="red")
+        return
+    os.environ["PULSE_TEX_DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["PULSE_TEX_PROJECTS_DIR"] = str(directory / "projects")
+
+    click.echo(f"\n{'=' * 50}")
+    click.echo("  Pulse-TeX - Garbage Collection")
+    click.echo(f"{'=' * 50}\n")
+
+    db = get_db()
+    usage = disk_usage(db)
+    click.echo(f"Projects directory: {usage['root']}")
+    click.echo(f"Total: {_format_bytes(usage['total_bytes'])} (blobs {_format_bytes(usage['blob_bytes'])})")
+    projects = usage["projects"]
+    if projects and top > 0:
+        click.echo(f"\nLargest projects ({min(top, len(projects))} of {len(projects)}):")
+        for project in projects[:top]:
+            click.echo(
+                f"  {project['name'][:30]:<30} sources {_format_bytes(project['source_bytes']):>10}"
+                f"  outputs {_format_bytes(project['output_bytes']):>10}"
+            )
+
+    quota_bytes = Config.DISK_QUOTA_BYTES if quota is None else max(0, quota) * 1024 * 1024
+    report = collect_garbage(db, quota_bytes=quota_bytes, dry_run=dry_run)
+
+    verb = "Would remove" if dry_run else "Removed"
+    click.echo(f"\n{verb} {len(report['removed_projects'])} deleted project directories")
+    click.echo(f"{verb} {report['removed_blobs']} unreferenced blobs")
+    click.echo(f"{verb} {report['removed_temp_files']} stale temp files")
+    click.echo(f"{'Would evict' if dry_run else 'Evicted'} build outputs of {len(report['evicted_outputs'])} projects")
+    click.echo(f"{'Reclaimable' if dry_run else 'Freed'}: {_format_bytes(report['freed_bytes'])}")
+    if report["over_quota"]:
+        click.secho(
+            f"Still over quota: {_format_bytes(report['total_bytes'])} > {_format_bytes(quota_bytes)}", fg="yellow"
+        )
+    click.secho("\nGC complete", fg="green", bold=True)
+
+
 if __name__ == "__main__":
     cli()
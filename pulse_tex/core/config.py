@@ -1,3 +1,4 @@
+import json
 import os
 from pathlib import Path
 
@@ -13,6 +14,13 @@ class classproperty:
 _db_instance = None
 
 
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
 def get_db():
     global _db_instance
     if _db_instance is None:
@@ -61,6 +69,119 @@ class Config:
     def PROJECTS_DIR(cls) -> str:
         return os.getenv("PULSE_TEX_PROJECTS_DIR", "./projects")
 
+    @classproperty
+    def DEFAULT_STORAGE(cls) -> str:
+        """Where new projects keep their sources: "db" (SQLite) or "fs" (files under PROJECTS_DIR/<id>/src)."""
+        storage = os.getenv("PULSE_TEX_STORAGE", "db")
+        return storage if storage in ("db", "fs") else "db"
+
+    @classproperty
+    def FILE_FLUSH_INTERVAL(cls) -> float:
+        try:
+            return float(os.getenv("PULSE_TEX_FILE_FLUSH_INTERVAL", "2"))
+        except ValueError:
+            return 2.0
+
+    @classproperty
+    def REVISION_MIN_INTERVAL(cls) -> int:
+        return _env_int("PULSE_TEX_REVISION_MIN_INTERVAL", 60)
+
+    @classproperty
+    def REVISION_SNAPSHOT_EVERY(cls) -> int:
+        return max(1, _env_int("PULSE_TEX_REVISION_SNAPSHOT_EVERY", 20))
+
+    @classproperty
+    def REVISION_MAX_PER_FILE(cls) -> int:
+        return _env_int("PULSE_TEX_REVISION_MAX_PER_FILE", 1000)
+
+    @classproperty
+    def REVISION_COMPACT_DAYS(cls) -> int:
+        """Age in days after which database maintenance thins revision history; 0 disables it."""
+        return max(0, _env_int("PULSE_TEX_REVISION_COMPACT_DAYS", 30))
+
+    @classproperty
+    def CONFIG_CHECK_INTERVAL(cls) -> float:
+        return _env_int("PULSE_TEX_CONFIG_CHECK_INTERVAL_MS", 1000) / 1000
+
+    @classproperty
+    def IMPORT_MAX_BYTES(cls) -> int:
+        return _env_int("PULSE_TEX_IMPORT_MAX_MB", 500) * 1024 * 1024
+
+    @classproperty
+    def DB_MAINTENANCE_INTERVAL(cls) -> int:
+        """Seconds between background checkpoint/ANALYZE runs in the server; 0 disables them."""
+        return max(0, _env_int("PULSE_TEX_DB_MAINTENANCE_HOURS", 0)) * 3600
+
+    @classproperty
+    def DISK_QUOTA_BYTES(cls) -> int:
+        """Soft limit for PROJECTS_DIR; over it, GC evicts least recently used build outputs. 0 means no quota."""
+        return max(0, _env_int("PULSE_TEX_DISK_QUOTA_MB", 0)) * 1024 * 1024
+
+    @classproperty
+    def GC_INTERVAL(cls) -> int:
+        """Seconds between background garbage collections of PROJECTS_DIR; 0 disables them."""
+        return max(0, _env_int("PULSE_TEX_GC_HOURS", 0)) * 3600
+
+    @classproperty
+    def AI_CACHE_TTL(cls) -> int:
+        """Seconds a cached AI response stays valid; 0 disables the response cache."""
+        return max(0, _env_int("PULSE_TEX_AI_CACHE_TTL_HOURS", 168)) * 3600
+
+    @classproperty
+    def AI_CACHE_MAX_ENTRIES(cls) -> int:
+        return max(1, _env_int("PULSE_TEX_AI_CACHE_MAX_ENTRIES", 2000))
+
+    @classproperty
+    def AI_CONCURRENCY(cls) -> int:
+        """Chunks of one document-level AI request processed at the same time."""
+        return max(1, _env_int("PULSE_TEX_AI_CONCURRENCY", 4))
+
+    @classproperty
+    def AI_CHUNK_CHARS(cls) -> int:
+        return max(500, _env_int("PULSE_TEX_AI_CHUNK_CHARS", 3000))
+
+    @classproperty
+    def AI_CONTEXT_TOKENS(cls) -> int:
+        """Budget for project passages retrieved into a chat prompt."""
+        return max(200, _env_int("PULSE_TEX_AI_CONTEXT_TOKENS", 2000))
+
+    @classproperty
+    def AI_HISTORY_TOKENS(cls) -> int:
+        """Budget for the earlier turns of a chat session; older turns are folded into its summary."""
+        return max(500, _env_int("PULSE_TEX_AI_HISTORY_TOKENS", 3000))
+
+    @classproperty
+    def AI_COMPLETION_MAX_TOKENS(cls) -> int:
+        """Length cap of an inline completion."""
+        return max(8, _env_int("PULSE_TEX_AI_COMPLETION_MAX_TOKENS", 48))
+
+    @classproperty
+    def AI_COMPLETION_DEBOUNCE_MS(cls) -> int:
+        """How long an inline completion request waits for a newer one from the same editor."""
+        return max(0, _env_int("PULSE_TEX_AI_COMPLETION_DEBOUNCE_MS", 150))
+
+    @classproperty
+    def AI_UPSTREAM_CONCURRENCY(cls) -> int:
+        """Requests to the AI provider in flight at once across the whole server."""
+        return max(1, _env_int("PULSE_TEX_AI_UPSTREAM_CONCURRENCY", 8))
+
+    @classproperty
+    def AI_REQUESTS_PER_MINUTE(cls) -> int:
+        return max(0, _env_int("PULSE_TEX_AI_RPM", 0))
+
+    @classproperty
+    def AI_TOKENS_PER_MINUTE(cls) -> int:
+        return max(0, _env_int("PULSE_TEX_AI_TPM", 0))
+
+    @classproperty
+    def AI_QUEUE_TIMEOUT(cls) -> int:
+        """Seconds a request may wait for admission before it fails as busy."""
+        return max(1, _env_int("PULSE_TEX_AI_QUEUE_TIMEOUT", 60))
+
+    @classproperty
+    def AI_MAX_RETRIES(cls) -> int:
+        return max(0, _env_int("PULSE_TEX_AI_MAX_RETRIES", 3))
+
     @classproperty
     def AI_API_KEY(cls) -> str | None:
         key = cls._get("ai_api_key", "")
@@ -94,6 +215,15 @@ class Config:
     def TECTONIC_PATH(cls) -> str:
         return cls._get("latex_engine", "tectonic")
 
+    @classproperty
+    def PROJECT_TEMPLATES(cls) -> dict[str, str]:
+        """Template name -> id of the project it is cloned from."""
+        try:
+            templates = json.loads(cls._get("project_templates", "{}"))
+        except ValueError:
+            return {}
+        return templates if isinstance(templates, dict) else {}
+
     @classmethod
     def is_initialized(cls) -> bool:
         db = get_db()
@@ -111,8 +241,8 @@ class Config:
 
     @classmethod
     def update_config(cls, config_dict: dict[str, str]) -> None:
-        for key, value in config_dict.items():
-            cls._set(key, value)
+        db = get_db()
+        db.update_config(config_dict)
 
     @classmethod
     def validate(cls) -> bool:
@@ -1,15 +1,174 @@
+import asyncio
+import base64
+import functools
+import html
 import json
-from datetime import UTC, datetime
+import re
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import UTC, datetime, timedelta
 
-from sqlalchemy import create_engine, event
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import (
+    LargeBinary,
+    and_,
+    bindparam,
+    cast,
+    create_engine,
+    delete,
+    event,
+    func,
+    literal,
+    select,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import defer, sessionmaker
 
-from pulse_tex.models import Base, Project, ProjectFile, SystemConfig
+from pulse_tex.core import maintenance, revisions
+from pulse_tex.core.migrations import has_file_search, run_migrations
+from pulse_tex.core.storage import fs_storage, invalid_path
+from pulse_tex.models import Base, ChatMessage, ChatSession, FileRevision, Project, ProjectFile, SystemConfig
+
+CONFIG_VERSION_KEY = "_config_version"
+REGEX_CANDIDATES_PER_RESULT = 10
+
+_MARK_OPEN, _MARK_CLOSE = "\ue000", "\ue001"
+_RENAME_STAGING = ".pulse-tex-rename"
+
+_FS_UNINDEX = text(
+    "DELETE FROM file_search WHERE rowid = "
+    "(SELECT id FROM project_files WHERE project_id = :b_project_id AND path = :b_path)"
+)
+_FS_INDEX = text(
+    "INSERT INTO file_search (rowid, project_id, path, content) "
+    "SELECT id, project_id, path, :b_content FROM project_files WHERE project_id = :b_project_id AND path = :b_path"
+)
+
+
+def _encode_cursor(project: Project) -> str:
+    raw = f"{project.updated_at.isoformat()}|{project.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        updated_at, project_id = raw.split("|", 1)
+        return datetime.fromisoformat(updated_at), project_id
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _fts_query(query: str) -> str:
+    """Turn free text into an FTS5 query of quoted terms (implicit AND); a trailing ``*`` keeps prefix matching."""
+    terms = []
+    for term in query.split():
+        prefix = term.endswith("*")
+        term = term.rstrip("*").replace('"', '""')
+        if term:
+            terms.append(f'"{term}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def _highlight(snippet: str) -> str:
+    return html.escape(snippet).replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
+
+
+def _regex_lines(pattern: re.Pattern, content: str, limit: int = 5) -> list[dict]:
+    lines = []
+    for number, line in enumerate(content.splitlines(), start=1):
+        if pattern.search(line):
+            lines.append({"line": number, "text": line[:200]})
+            if len(lines) >= limit:
+                break
+    return lines
+
+
+class FileWriteBuffer:
+    """Holds the latest unsaved content per (project_id, path) until a flush has committed it.
+
+    Entries stay readable while a flush is writing them and are only removed once it has
+    committed, and only if no newer content arrived meanwhile. Flushes and direct writers
+    ``reserve`` the keys they write, so a flush never commits older content over a direct
+    write of the same file.
+    """
+
+    def __init__(self):
+        self._lock = threading.Condition()
+        self._pending: dict[tuple[str, str], tuple[str, datetime]] = {}
+        self._reserved: set[tuple[str, str]] = set()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def __contains__(self, key: tuple[str, str]) -> bool:
+        return key in self._pending
+
+    def put(self, project_id: str, path: str, content: str) -> datetime:
+        updated_at = datetime.now(UTC).replace(tzinfo=None)
+        with self._lock:
+            self._pending[(project_id, path)] = (content, updated_at)
+        return updated_at
+
+    def get(self, project_id: str, path: str) -> tuple[str, datetime] | None:
+        return self._pending.get((project_id, path))
+
+    def discard(self, project_id: str, path: str | None = None) -> None:
+        with self._lock:
+            if path is not None:
+                self._pending.pop((project_id, path), None)
+            else:
+                for key in [k for k in self._pending if k[0] == project_id]:
+                    del self._pending[key]
+
+    def keys(self, project_id: str | None = None) -> list[tuple[str, str]]:
+        with self._lock:
+            return [k for k in self._pending if project_id is None or k[0] == project_id]
+
+    def snapshot(self, keys) -> dict[tuple[str, str], tuple[str, datetime]]:
+        """The entries still pending among ``keys``, left in the buffer."""
+        with self._lock:
+            return {k: self._pending[k] for k in keys if k in self._pending}
+
+    def settle(self, entries: dict[tuple[str, str], tuple[str, datetime]]) -> None:
+        """Remove flushed entries, except those replaced by newer content since the snapshot."""
+        with self._lock:
+            for key, value in entries.items():
+                if self._pending.get(key) == value:
+                    del self._pending[key]
+
+    @contextmanager
+    def reserve(self, keys):
+        """Wait until no flush or direct write holds any of ``keys``, then hold them for the block."""
+        keys = set(keys)
+        with self._lock:
+            self._lock.wait_for(lambda: not keys & self._reserved)
+            self._reserved |= keys
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._reserved -= keys
+                self._lock.notify_all()
 
 
 class Database:
     _instance = None
     _engine = None
+    _write_buffer: FileWriteBuffer
+    _executor: ThreadPoolExecutor
+    _config_lock: threading.Lock
+    _config_cache: dict[str, str] | None = None
+    _config_checked_at: float = 0.0
+    _config_check_interval: float = 1.0
+    _has_file_search: bool = False
+    _fs_projects: dict[str, bool]
 
     def __new__(cls, db_url: str | None = None):
         if cls._instance is None:
@@ -21,55 +180,135 @@ class Database:
                 pool_pre_ping=True,
                 connect_args={"check_same_thread": False} if "sqlite" in (db_url or "") else {},
             )
-            Base.metadata.create_all(cls._engine)
+            sqlite = "sqlite" in str(cls._engine.url)
 
             @event.listens_for(cls._engine, "connect")
             def set_sqlite_pragma(dbapi_connection, connection_record):
-                if "sqlite" in str(cls._engine.url):
+                if sqlite:
                     cursor = dbapi_connection.cursor()
-                    cursor.execute("PRAGMA journal_mode=WAL")
-                    cursor.execute("PRAGMA synchronous=NORMAL")
                     cursor.execute("PRAGMA busy_timeout=30000")
+                    cursor.execute("PRAGMA synchronous=NORMAL")
                     cursor.close()
 
+            if sqlite:
+                # WAL is a property of the database file: switch once here rather than on every
+                # new pooled connection, where the switch can fail with "database is locked"
+                # while other connections are writing.
+                with cls._engine.connect() as conn:
+                    conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+            Base.metadata.create_all(cls._engine)
+            cls._write_buffer = FileWriteBuffer()
+            cls._executor = ThreadPoolExecutor(max_workers=10, thread_name_prefix="pulse-tex-db")
+            cls._config_lock = threading.Lock()
+            cls._fs_projects = {}
+
+            from pulse_tex.core.config import Config
+
+            cls._config_check_interval = Config.CONFIG_CHECK_INTERVAL
+
+            run_migrations(cls._engine)
+            with cls._engine.connect() as conn:
+                cls._has_file_search = has_file_search(conn)
+
         return cls._instance
 
     def __init__(self, db_url: str | None = None):
-        self.Session = sessionmaker(bind=self._engine)
+        self.Session = sessionmaker(bind=self._engine, expire_on_commit=False)
 
     def get_session(self):
         return self.Session()
 
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking Database call on the DB thread pool so it does not stall the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    def _config_snapshot(self) -> dict[str, str]:
+        """Return the cached SystemConfig snapshot, reloading it when another process bumped the version."""
+        cache = self._config_cache
+        now = time.monotonic()
+        if cache is not None and now - self._config_checked_at < self._config_check_interval:
+            return cache
+
+        with self._config_lock:
+            cache = self._config_cache
+            if cache is not None and now - self._config_checked_at < self._config_check_interval:
+                return cache
+            with self.get_session() as session:
+                if cache is not None:
+                    version = session.query(SystemConfig.value).filter_by(key=CONFIG_VERSION_KEY).scalar()
+                    if version == cache.get(CONFIG_VERSION_KEY):
+                        Database._config_checked_at = now
+                        return cache
+                cache = {c.key: c.value for c in session.query(SystemConfig).all()}
+            Database._config_cache = cache
+            Database._config_checked_at = now
+            return cache
+
+    def invalidate_config_cache(self) -> None:
+        Database._config_cache = None
+
     def get_config(self, key: str, default: str | None = None) -> str | None:
-        with self.get_session() as session:
-            config = session.query(SystemConfig).filter_by(key=key).first()
-            if config:
-                return config.value
-            return default
+        value = self._config_snapshot().get(key)
+        return value if value is not None else default
 
     def set_config(self, key: str, value: str, description: str | None = None) -> None:
+        self.update_config({key: value}, description=description)
+
+    def update_config(self, values: dict[str, str], description: str | None = None) -> None:
+        """Write several config keys in one transaction and bump the shared config version."""
+        with self.get_session() as session:
+            for key, value in {**values, CONFIG_VERSION_KEY: uuid.uuid4().hex}.items():
+                config = session.query(SystemConfig).filter_by(key=key).first()
+                if config:
+                    config.value = value
+                    if description:
+                        config.description = description
+                else:
+                    config = SystemConfig(key=key, value=value, description=description)
+                    session.add(config)
+            session.commit()
+        self.invalidate_config_cache()
+
+    def edit_json_config(self, key: str, edit: Callable[[dict], None]) -> dict:
+        """Apply ``edit`` to a JSON object config value in one write transaction and return the result.
+
+        The config version is bumped first, which takes SQLite's write lock before the value is read,
+        so concurrent edits of the same key cannot overwrite each other.
+        """
+        version = uuid.uuid4().hex
         with self.get_session() as session:
-            config = session.query(SystemConfig).filter_by(key=key).first()
+            session.execute(
+                sqlite_insert(SystemConfig)
+                .values(key=CONFIG_VERSION_KEY, value=version)
+                .on_conflict_do_update(index_elements=[SystemConfig.key], set_={"value": version})
+            )
+            config = session.get(SystemConfig, key)
+            try:
+                current = json.loads(config.value) if config else {}
+            except ValueError:
+                current = {}
+            if not isinstance(current, dict):
+                current = {}
+            edit(current)
             if config:
-                config.value = value
-                if description:
-                    config.description = description
+                config.value = json.dumps(current)
             else:
-                config = SystemConfig(key=key, value=value, description=description)
-                session.add(config)
+                session.add(SystemConfig(key=key, value=json.dumps(current)))
             session.commit()
+        self.invalidate_config_cache()
+        return current
 
     def get_all_config(self) -> dict[str, str]:
-        with self.get_session() as session:
-            configs = session.query(SystemConfig).all()
-            return {c.key: c.value for c in configs}
+        return {k: v for k, v in self._config_snapshot().items() if k != CONFIG_VERSION_KEY}
 
     def init_default_config(self) -> None:
         from pulse_tex.core.config import DEFAULT_CONFIG
 
-        for key, value in DEFAULT_CONFIG.items():
-            if self.get_config(key) is None:
-                self.set_config(key, value)
+        missing = {key: value for key, value in DEFAULT_CONFIG.items() if self.get_config(key) is None}
+        if missing:
+            self.update_config(missing)
 
     def is_initialized(self) -> bool:
         return self.get_config("is_initialized") == "true"
@@ -77,13 +316,27 @@ class Database:
     def set_initialized(self, initialized: bool = True) -> None:
         self.set_config("is_initialized", "true" if initialized else "false")
 
-    def create_project(self, name: str, description: str = "") -> Project:
+    def create_project(self, name: str, description: str = "", storage: str = "db") -> Project:
         with self.get_session() as session:
-            project = Project(name=name, description=description)
+            project = Project(name=name, description=description, storage=storage)
             session.add(project)
             session.commit()
             session.refresh(project)
-            return project
+        self._fs_projects[project.id] = storage == "fs"
+        if storage == "fs":
+            fs_storage.src_dir(project.id).mkdir(parents=True, exist_ok=True)
+        return project
+
+    def _is_fs(self, project_id: str) -> bool:
+        """Whether a project keeps its sources on disk. Cached, since a project's storage never changes."""
+        cached = self._fs_projects.get(project_id)
+        if cached is None:
+            with self.get_session() as session:
+                storage = session.scalar(select(Project.storage).where(Project.id == project_id))
+            if storage is None:
+                return False
+            cached = self._fs_projects[project_id] = storage == "fs"
+        return cached
 
     def get_project(self, project_id: str) -> Project | None:
         with self.get_session() as session:
@@ -93,58 +346,808 @@ class Database:
         with self.get_session() as session:
             return session.query(Project).order_by(Project.updated_at.desc()).all()
 
-    def update_project(self, project_id: str, **kwargs) -> bool:
+    def list_projects(
+        self,
+        query: str | None = None,
+        limit: int | None = None,
+        cursor: str | None = None,
+        with_stats: bool = False,
+    ) -> tuple[list[dict], str | None]:
+        """Page projects newest first using keyset pagination on (updated_at, id).
+
+        Returns the serialized page and the cursor for the next one. With ``with_stats`` each
+        project also carries its file count and total size, computed in the same query.
+        Raises ValueError for a malformed cursor.
+        """
+        columns = [Project]
+        if with_stats:
+            owned = ProjectFile.project_id == Project.id
+            size = func.coalesce(ProjectFile.blob_size, func.length(cast(ProjectFile.content, LargeBinary)), 0)
+            columns.append(select(func.count(ProjectFile.id)).where(owned).scalar_subquery().label("file_count"))
+            columns.append(select(func.coalesce(func.sum(size), 0)).where(owned).scalar_subquery().label("total_size"))
+
+        stmt = select(*columns).order_by(Project.updated_at.desc(), Project.id.desc())
+        if query:
+            stmt = stmt.where(Project.name.icontains(query, autoescape=True))
+        if cursor:
+            updated_at, project_id = _decode_cursor(cursor)
+            stmt = stmt.where(tuple_(Project.updated_at, Project.id) < tuple_(literal(updated_at), literal(project_id)))
+        if limit is not None:
+            stmt = stmt.limit(limit + 1)
+
         with self.get_session() as session:
-            project = session.query(Project).filter_by(id=project_id).first()
-            if project:
-                for key, value in kwargs.items():
-                    setattr(project, key, value)
-                project.updated_at = datetime.now(UTC).replace(tzinfo=None)
-                session.commit()
-                return True
-            return False
+            rows = session.execute(stmt).all()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1][0])
+
+        projects = []
+        for row in rows:
+            data = row[0].to_dict()
+            if with_stats:
+                data["file_count"], data["total_size"] = row.file_count, row.total_size
+            projects.append(data)
+        return projects, next_cursor
+
+    def record_compile(self, project_id: str, success: bool) -> None:
+        """Store the outcome of the latest build without bumping the project's updated_at."""
+        with self.get_session() as session:
+            session.execute(
+                update(Project)
+                .where(Project.id == project_id)
+                .values(
+                    last_compile_status="success" if success else "failed",
+                    last_compiled_at=datetime.now(UTC).replace(tzinfo=None),
+                    updated_at=Project.updated_at,
+                )
+            )
+            session.commit()
+
+    def update_project(self, project_id: str, **kwargs) -> Project | None:
+        with self.get_session() as session:
+            stmt = (
+                update(Project)
+                .where(Project.id == project_id)
+                .values(**kwargs, updated_at=datetime.now(UTC).replace(tzinfo=None))
+                .returning(Project)
+            )
+            project = session.scalars(stmt).first()
+            session.commit()
+            return project
 
     def delete_project(self, project_id: str) -> bool:
         with self.get_session() as session:
             project = session.query(Project).filter_by(id=project_id).first()
             if project:
+                self._write_buffer.discard(project_id)
                 session.query(ProjectFile).filter_by(project_id=project_id).delete()
+                session.query(FileRevision).filter_by(project_id=project_id).delete()
+                chats = select(ChatSession.id).where(ChatSession.project_id == project_id)
+                session.query(ChatMessage).filter(ChatMessage.session_id.in_(chats)).delete(synchronize_session=False)
+                session.query(ChatSession).filter_by(project_id=project_id).delete()
                 session.delete(project)
                 session.commit()
+                self._fs_projects.pop(project_id, None)
+                fs_storage.remove_project(project_id)
                 return True
             return False
 
+    def clone_project(self, source_id: str, name: str, description: str | None = None) -> Project | None:
+        """Copy a project and all its files server-side. Blob files share the source's blobs by reference.
+
+        Filesystem projects are cloned as filesystem projects with a full copy of their tree, so editors
+        that save in place cannot change the template or other clones.
+        """
+        self.flush_file_writes(source_id)
+        now = datetime.now(UTC).replace(tzinfo=None)
+        with self.get_session() as session:
+            source = session.get(Project, source_id)
+            if source is None:
+                return None
+            project = Project(
+                name=name,
+                description=source.description if description is None else description,
+                main_file=source.main_file,
+                storage=source.storage,
+                created_at=now,
+                updated_at=now,
+            )
+            session.add(project)
+            session.flush()
+
+            files = select(
+                literal(project.id),
+                ProjectFile.path,
+                ProjectFile.content,
+                ProjectFile.blob_hash,
+                ProjectFile.blob_size,
+                literal(now),
+                literal(now),
+            ).where(ProjectFile.project_id == source_id)
+            session.execute(
+                sqlite_insert(ProjectFile).from_select(
+                    ["project_id", "path", "content", "blob_hash", "blob_size", "created_at", "updated_at"], files
+                )
+            )
+            snapshots = select(
+                literal(project.id),
+                ProjectFile.path,
+                literal(1),
+                literal("snapshot"),
+                func.coalesce(ProjectFile.content, ""),
+                func.length(func.coalesce(ProjectFile.content, "")),
+                literal(now),
+            ).where(ProjectFile.project_id == source_id, ProjectFile.blob_hash.is_(None))
+            if source.storage == "fs":
+                fs_storage.copy_project(source_id, project.id)
+                if self._has_file_search:
+                    session.execute(
+                        text(
+                            "INSERT INTO file_search (rowid, project_id, path, content) "
+                            "SELECT copy.id, copy.project_id, copy.path, file_search.content "
+                            "FROM project_files AS copy JOIN project_files AS original "
+                            "ON original.project_id = :source AND original.path = copy.path "
+                            "JOIN file_search ON file_search.rowid = original.id "
+                            "WHERE copy.project_id = :target"
+                        ),
+                        {"source": source_id, "target": project.id},
+                    )
+            else:
+                session.execute(
+                    sqlite_insert(FileRevision).from_select(
+                        ["project_id", "path", "rev", "kind", "data", "size", "created_at"], snapshots
+                    )
+                )
+            session.commit()
+        self._fs_projects[project.id] = project.storage == "fs"
+        return project
+
+    def _apply_pending(self, file: ProjectFile | None) -> ProjectFile | None:
+        """Overlay buffered content, and load the content of filesystem-backed text files from disk."""
+        if file is not None:
+            pending = self._write_buffer.get(file.project_id, file.path)
+            if pending:
+                file.content, file.updated_at = pending
+                file.blob_hash = file.blob_size = None
+            elif file.content is None and file.blob_hash is None and self._is_fs(file.project_id):
+                file.content = fs_storage.read(file.project_id, file.path) or ""
+        return file
+
+    def _stored(self, fs: bool, content: str) -> dict:
+        """Column values for text ``content``: inline for SQLite projects, only its size for filesystem ones."""
+        if fs:
+            return {"content": None, "blob_size": len(content.encode("utf-8"))}
+        return {"content": content, "blob_size": None}
+
+    def _index_fs_files(self, session, project_id: str, contents: dict[str, str]) -> None:
+        """Refresh search index rows of filesystem-backed files; the project_files triggers only see inline content."""
+        if self._has_file_search and contents:
+            params = [{"b_project_id": project_id, "b_path": p, "b_content": c} for p, c in contents.items()]
+            session.execute(_FS_UNINDEX, params)
+            session.execute(_FS_INDEX, params)
+
+    def _write_fs_files(self, session, project_id: str, contents: dict[str, str], now: datetime) -> None:
+        for path, content in contents.items():
+            fs_storage.write(project_id, path, content, now)
+        self._index_fs_files(session, project_id, contents)
+
     def get_file(self, project_id: str, path: str) -> ProjectFile | None:
         with self.get_session() as session:
-            return session.query(ProjectFile).filter_by(project_id=project_id, path=path).first()
+            file = session.query(ProjectFile).filter_by(project_id=project_id, path=path).first()
+            return self._apply_pending(file)
 
     def get_files(self, project_id: str) -> list[ProjectFile]:
+        if self._is_fs(project_id):
+            self.sync_project_files(project_id)
         with self.get_session() as session:
-            return session.query(ProjectFile).filter_by(project_id=project_id).all()
+            files = session.query(ProjectFile).filter_by(project_id=project_id).all()
+            return [self._apply_pending(f) for f in files]
+
+    def snapshot_files(self, project_id: str) -> list[ProjectFile]:
+        """Persist buffered edits, then read every file of a SQLite-backed project in one statement.
 
-    def create_file(self, project_id: str, path: str, content: str = "") -> ProjectFile:
+        Unlike ``get_files`` no buffered content is overlaid, so later autosaves cannot leak into the
+        result: it is exactly the committed state at one point in time.
+        """
+        self.flush_file_writes(project_id)
         with self.get_session() as session:
-            file = ProjectFile(project_id=project_id, path=path, content=content)
-            session.add(file)
+            return list(session.scalars(select(ProjectFile).where(ProjectFile.project_id == project_id)).all())
+
+    def iter_files(self, project_id: str, batch_size: int = 100) -> Iterator[ProjectFile]:
+        """Yield a project's files in id order, loading ``batch_size`` rows per short-lived session."""
+        last_id = 0
+        while True:
+            with self.get_session() as session:
+                batch = (
+                    session.query(ProjectFile)
+                    .filter(ProjectFile.project_id == project_id, ProjectFile.id > last_id)
+                    .order_by(ProjectFile.id)
+                    .limit(batch_size)
+                    .all()
+                )
+            if not batch:
+                return
+            for f in batch:
+                yield self._apply_pending(f)
+            last_id = batch[-1].id
+
+    def text_file_versions(self, project_id: str) -> dict[str, datetime]:
+        """``updated_at`` of every text file, after persisting buffered edits and external changes."""
+        if self._is_fs(project_id):
+            self.sync_project_files(project_id)
+        else:
+            self.flush_file_writes(project_id)
+        with self.get_session() as session:
+            rows = session.execute(
+                select(ProjectFile.path, ProjectFile.updated_at).where(
+                    ProjectFile.project_id == project_id, ProjectFile.blob_hash.is_(None)
+                )
+            )
+            return {row.path: row.updated_at for row in rows}
+
+    def read_text_files(self, project_id: str, paths: list[str]) -> dict[str, str]:
+        with self.get_session() as session:
+            files = session.scalars(
+                select(ProjectFile).where(
+                    ProjectFile.project_id == project_id,
+                    ProjectFile.path.in_(paths),
+                    ProjectFile.blob_hash.is_(None),
+                )
+            ).all()
+            return {f.path: self._apply_pending(f).content or "" for f in files}
+
+    def insert_files(self, project_id: str, files: list[dict]) -> int:
+        """Bulk insert or replace files in one executemany statement.
+
+        Each item has ``path`` and either ``content`` or ``blob_hash``/``blob_size``.
+        """
+        if not files:
+            return 0
+        fs = self._is_fs(project_id)
+        now = datetime.now(UTC).replace(tzinfo=None)
+        rows = [
+            {
+                "project_id": project_id,
+                "path": f["path"],
+                "blob_hash": f.get("blob_hash"),
+                **(
+                    self._stored(fs, f.get("content", ""))
+                    if f.get("blob_hash") is None
+                    else {"content": "", "blob_size": f.get("blob_size")}
+                ),
+                "created_at": now,
+                "updated_at": now,
+            }
+            for f in files
+        ]
+        stmt = sqlite_insert(ProjectFile)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["project_id", "path"],
+            set_={
+                "content": stmt.excluded.content,
+                "blob_hash": stmt.excluded.blob_hash,
+                "blob_size": stmt.excluded.blob_size,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        with self._write_buffer.reserve((project_id, f["path"]) for f in files), self.get_session() as session:
+            for f in files:
+                self._write_buffer.discard(project_id, f["path"])
+            session.execute(stmt, rows)
+            texts = {f["path"]: f.get("content", "") for f in files if f.get("blob_hash") is None}
+            if fs:
+                self._write_fs_files(session, project_id, texts, now)
+                for f in files:
+                    if f.get("blob_hash") is not None:
+                        fs_storage.copy_blob(project_id, f["path"], f["blob_hash"])
+            for path, content in texts.items():
+                self._record_revision(session, project_id, path, content, now)
             session.commit()
-            session.refresh(file)
-            return file
+        return len(rows)
 
-    def update_file(self, project_id: str, path: str, content: str) -> bool:
+    def create_file(self, project_id: str, path: str, content: str = "") -> ProjectFile | None:
+        """Insert a file in one statement. Returns None if the project is missing or the path is taken."""
+        fs = self._is_fs(project_id)
+        stored = self._stored(fs, content)
+        now = datetime.now(UTC).replace(tzinfo=None)
+        source = select(
+            Project.id,
+            literal(path),
+            literal(stored["content"]),
+            literal(stored["blob_size"]),
+            literal(now),
+            literal(now),
+        ).where(Project.id == project_id)
+        stmt = (
+            sqlite_insert(ProjectFile)
+            .from_select(["project_id", "path", "content", "blob_size", "created_at", "updated_at"], source)
+            .on_conflict_do_nothing(index_elements=["project_id", "path"])
+            .returning(ProjectFile)
+        )
         with self.get_session() as session:
-            file = session.query(ProjectFile).filter_by(project_id=project_id, path=path).first()
+            file = session.scalars(stmt).first()
+            if file:
+                if fs:
+                    self._write_fs_files(session, project_id, {path: content}, now)
+                self._record_revision(session, project_id, path, content, now)
+            session.commit()
+        if file and fs:
+            file.content = content
+        return file
+
+    def put_file(
+        self,
+        project_id: str,
+        path: str,
+        content: str = "",
+        blob_hash: str | None = None,
+        blob_size: int | None = None,
+    ) -> ProjectFile | None:
+        """Create or replace a file, either as text ``content`` or as a reference to a stored blob."""
+        fs = self._is_fs(project_id)
+        if blob_hash is None:
+            stored = self._stored(fs, content)
+        else:
+            stored = {"content": content, "blob_size": blob_size}
+        now = datetime.now(UTC).replace(tzinfo=None)
+        source = select(
+            Project.id,
+            literal(path),
+            literal(stored["content"]),
+            literal(blob_hash),
+            literal(stored["blob_size"]),
+            literal(now),
+            literal(now),
+        ).where(Project.id == project_id)
+        stmt = sqlite_insert(ProjectFile).from_select(
+            ["project_id", "path", "content", "blob_hash", "blob_size", "created_at", "updated_at"], source
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["project_id", "path"],
+            set_={
+                "content": stmt.excluded.content,
+                "blob_hash": stmt.excluded.blob_hash,
+                "blob_size": stmt.excluded.blob_size,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        ).returning(ProjectFile)
+        with self._write_buffer.reserve([(project_id, path)]), self.get_session() as session:
+            self._write_buffer.discard(project_id, path)
+            file = session.scalars(stmt).first()
+            if file and fs:
+                if blob_hash is None:
+                    self._write_fs_files(session, project_id, {path: content}, now)
+                else:
+                    fs_storage.copy_blob(project_id, path, blob_hash)
+            if file and blob_hash is None:
+                self._record_revision(session, project_id, path, content, now)
+            session.commit()
+        if file and fs and blob_hash is None:
+            file.content = content
+        return file
+
+    def update_file(self, project_id: str, path: str, content: str, buffered: bool = False) -> ProjectFile | None:
+        """Write file content, or with ``buffered`` queue it for the next batched flush."""
+        if buffered:
+            with self.get_session() as session:
+                file = (
+                    session.query(ProjectFile)
+                    .options(defer(ProjectFile.content))
+                    .filter_by(project_id=project_id, path=path)
+                    .first()
+                )
             if file:
+                file.updated_at = self._write_buffer.put(project_id, path, content)
                 file.content = content
-                file.updated_at = datetime.now(UTC).replace(tzinfo=None)
+                file.blob_hash = file.blob_size = None
+            return file
+
+        fs = self._is_fs(project_id)
+        now = datetime.now(UTC).replace(tzinfo=None)
+        stmt = (
+            update(ProjectFile)
+            .where(ProjectFile.project_id == project_id, ProjectFile.path == path)
+            .values(**self._stored(fs, content), blob_hash=None, updated_at=now)
+            .returning(ProjectFile)
+        )
+        with self._write_buffer.reserve([(project_id, path)]), self.get_session() as session:
+            self._write_buffer.discard(project_id, path)
+            file = session.scalars(stmt).first()
+            if file:
+                if fs:
+                    self._write_fs_files(session, project_id, {path: content}, now)
+                self._record_revision(session, project_id, path, content, now)
+            session.commit()
+        if file and fs:
+            file.content = content
+        return file
+
+    def flush_file_writes(self, project_id: str | None = None) -> int:
+        """Persist buffered file writes in a single transaction. Returns the number of files written."""
+        keys = self._write_buffer.keys(project_id)
+        if not keys:
+            return 0
+        with self._write_buffer.reserve(keys):
+            pending = self._write_buffer.snapshot(keys)
+            if not pending:
+                return 0
+            self._write_pending(pending)
+            self._write_buffer.settle(pending)
+        return len(pending)
+
+    def _write_pending(self, pending: dict[tuple[str, str], tuple[str, datetime]]) -> None:
+        table = ProjectFile.__table__
+        stmt = (
+            table.update()
+            .where(and_(table.c.project_id == bindparam("b_project_id"), table.c.path == bindparam("b_path")))
+            .values(
+                content=bindparam("b_content"),
+                blob_hash=None,
+                blob_size=bindparam("b_size"),
+                updated_at=bindparam("b_updated_at"),
+            )
+        )
+        fs_projects = {pid for pid, _ in pending if self._is_fs(pid)}
+        params = []
+        for (pid, path), (content, updated_at) in pending.items():
+            stored = self._stored(pid in fs_projects, content)
+            params.append(
+                {
+                    "b_project_id": pid,
+                    "b_path": path,
+                    "b_content": stored["content"],
+                    "b_size": stored["blob_size"],
+                    "b_updated_at": updated_at,
+                }
+            )
+        with self.get_session() as session:
+            session.execute(stmt, params)
+            for (pid, path), (content, updated_at) in pending.items():
+                if pid in fs_projects:
+                    self._write_fs_files(session, pid, {path: content}, updated_at)
+                self._record_revision(session, pid, path, content, updated_at)
+            session.commit()
+
+    def sync_project_files(self, project_id: str) -> int:
+        """Reconcile a filesystem project's metadata with files added, changed or removed outside the app.
+
+        A file counts as changed when its mtime is newer than its row's ``updated_at``; our own writes
+        stamp both with the same time. Returns the number of rows added, updated or removed.
+        """
+        from pulse_tex.services.blob_store import blob_store, is_text_path
+
+        if not self._is_fs(project_id):
+            return 0
+        self.flush_file_writes(project_id)
+        disk = fs_storage.scan(project_id)
+        changed = 0
+        with self.get_session() as session:
+            rows = {
+                row.path: row
+                for row in session.execute(
+                    select(ProjectFile.path, ProjectFile.updated_at).where(ProjectFile.project_id == project_id)
+                )
+            }
+            removed = [path for path in rows if path not in disk]
+            if removed:
+                session.execute(
+                    delete(ProjectFile).where(ProjectFile.project_id == project_id, ProjectFile.path.in_(removed))
+                )
+                changed += len(removed)
+
+            for path, stat in disk.items():
+                mtime = datetime.fromtimestamp(stat.st_mtime, UTC).replace(tzinfo=None)
+                row = rows.get(path)
+                if row is not None and row.updated_at is not None and mtime <= row.updated_at:
+                    continue
+
+                content = fs_storage.read(project_id, path) if is_text_path(path) else None
+                if content is not None:
+                    values = {"blob_hash": None, **self._stored(True, content)}
+                else:
+                    with open(fs_storage.path_for(project_id, path), "rb") as f:
+                        digest, size = blob_store.save_file(f)
+                    values = {"content": "", "blob_hash": digest, "blob_size": size}
+                stmt = sqlite_insert(ProjectFile).values(
+                    project_id=project_id, path=path, created_at=mtime, updated_at=mtime, **values
+                )
+                session.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=["project_id", "path"], set_={**values, "updated_at": mtime}
+                    )
+                )
+                if content is not None:
+                    self._index_fs_files(session, project_id, {path: content})
+                    self._record_revision(session, project_id, path, content, mtime)
+                changed += 1
+            session.commit()
+        return changed
+
+    def _record_revision(self, session, project_id: str, path: str, content: str, now: datetime) -> None:
+        revisions.record_revision(session, project_id, path, content, now, revisions.RevisionPolicy.from_config())
+
+    def list_revisions(self, project_id: str, path: str) -> list[FileRevision]:
+        with self.get_session() as session:
+            return revisions.list_revisions(session, project_id, path)
+
+    def get_revision(self, project_id: str, path: str, rev: int) -> str | None:
+        with self.get_session() as session:
+            return revisions.reconstruct_revision(session, project_id, path, rev)
+
+    def compact_revisions(self, project_id: str | None = None, older_than_days: int = 30) -> int:
+        """Thin old revision history for every file (of one project). Returns the number of revisions removed."""
+        older_than = datetime.now(UTC).replace(tzinfo=None) - timedelta(days=older_than_days)
+        policy = revisions.RevisionPolicy.from_config()
+        removed = 0
+        with self.get_session() as session:
+            query = session.query(FileRevision.project_id, FileRevision.path).distinct()
+            if project_id:
+                query = query.filter(FileRevision.project_id == project_id)
+            for pid, path in query.all():
+                removed += revisions.compact_revisions(session, pid, path, policy, older_than)
                 session.commit()
-                return True
-            return False
+        return removed
 
-    def delete_file(self, project_id: str, path: str) -> bool:
+    def project_sizes(self) -> list[dict]:
+        """Bytes held by each project's files and revision history, largest first."""
+        size = func.coalesce(ProjectFile.blob_size, func.length(cast(ProjectFile.content, LargeBinary)), 0)
+        file_bytes = (
+            select(func.coalesce(func.sum(size), 0)).where(ProjectFile.project_id == Project.id).scalar_subquery()
+        )
+        revision_bytes = (
+            select(func.coalesce(func.sum(func.length(FileRevision.data)), 0))
+            .where(FileRevision.project_id == Project.id)
+            .scalar_subquery()
+        )
+        stmt = select(Project.id, Project.name, file_bytes.label("file_bytes"), revision_bytes.label("revision_bytes"))
         with self.get_session() as session:
-            file = session.query(ProjectFile).filter_by(project_id=project_id, path=path).first()
-            if file:
-                session.delete(file)
+            rows = session.execute(stmt).all()
+        sizes = [
+            {"id": r.id, "name": r.name, "file_bytes": r.file_bytes, "revision_bytes": r.revision_bytes} for r in rows
+        ]
+        return sorted(sizes, key=lambda s: s["file_bytes"] + s["revision_bytes"], reverse=True)
+
+    def referenced_blobs(self) -> set[str]:
+        with self.get_session() as session:
+            stmt = select(ProjectFile.blob_hash).where(ProjectFile.blob_hash.is_not(None)).distinct()
+            return set(session.scalars(stmt))
+
+    def maintain(self, vacuum: bool | None = True, compact_days: int | None = None) -> dict:
+        """Flush buffered writes and thin revision history older than ``compact_days``, then checkpoint,
+        vacuum and analyze the database. See ``core.maintenance``.
+
+        ``compact_days`` defaults to ``Config.REVISION_COMPACT_DAYS``; 0 skips compaction.
+        """
+        from pulse_tex.core.config import Config
+
+        if compact_days is None:
+            compact_days = Config.REVISION_COMPACT_DAYS
+        self.flush_file_writes()
+        removed = self.compact_revisions(older_than_days=compact_days) if compact_days > 0 else 0
+        report = maintenance.run_maintenance(self._engine, vacuum=vacuum)
+        report["revisions_removed"] = removed
+        report["projects"] = self.project_sizes()
+        return report
+
+    def search_files(
+        self,
+        query: str,
+        project_id: str | None = None,
+        limit: int = 20,
+        offset: int = 0,
+        regex: re.Pattern | None = None,
+    ) -> tuple[list[dict], bool]:
+        """Ranked full-text search over text files. Returns ``(results, has_more)``.
+
+        With ``regex``, FTS matches are post-filtered by the pattern and annotated with matching lines.
+        Only the best ``(offset + limit) * REGEX_CANDIDATES_PER_RESULT`` FTS matches are checked; if
+        the page is not full by then, the matches found so far are returned with ``has_more`` set.
+        """
+        fts_query = _fts_query(query)
+        if not fts_query:
+            return [], False
+
+        self.flush_file_writes(project_id)
+        params = {"q": fts_query, "project_id": project_id}
+        if self._has_file_search:
+            sql = f"""
+                SELECT file_search.project_id, file_search.path, projects.name AS project_name,
+                       snippet(file_search, 2, '{_MARK_OPEN}', '{_MARK_CLOSE}', '…', 16) AS snippet,
+                       bm25(file_search) AS rank, file_search.content
+                FROM file_search JOIN projects ON projects.id = file_search.project_id
+                WHERE file_search MATCH :q {"AND file_search.project_id = :project_id" if project_id else ""}
+                ORDER BY rank
+            """
+        else:
+            terms = [t.strip('"*').replace('""', '"') for t in fts_query.split()]
+            params.update({f"t{i}": f"%{t}%" for i, t in enumerate(terms)})
+            conditions = [f"project_files.content LIKE :t{i}" for i in range(len(terms))]
+            if project_id:
+                conditions.append("project_files.project_id = :project_id")
+            sql = f"""
+                SELECT project_files.project_id, project_files.path, projects.name AS project_name,
+                       '' AS snippet, 0.0 AS rank, project_files.content
+                FROM project_files JOIN projects ON projects.id = project_files.project_id
+                WHERE project_files.blob_hash IS NULL AND {" AND ".join(conditions)}
+                ORDER BY project_files.updated_at DESC
+            """
+
+        candidates = (offset + limit) * REGEX_CANDIDATES_PER_RESULT
+        if regex is None:
+            sql += " LIMIT :limit OFFSET :offset"
+            params.update({"limit": limit + 1, "offset": offset})
+        else:
+            sql += " LIMIT :limit"
+            params["limit"] = candidates + 1
+
+        results = []
+        skipped = scanned = 0
+        with self.get_session() as session:
+            for row in session.execute(text(sql), params):
+                scanned += 1
+                if regex is not None and scanned > candidates:
+                    return results, True
+                result = {
+                    "project_id": row.project_id,
+                    "project_name": row.project_name,
+                    "path": row.path,
+                    "snippet": _highlight(row.snippet) if row.snippet else html.escape(row.content[:200]),
+                    "rank": row.rank,
+                }
+                if regex is not None:
+                    lines = _regex_lines(regex, row.content)
+                    if not lines:
+                        continue
+                    if skipped < offset:
+                        skipped += 1
+                        continue
+                    result["matches"] = lines
+                results.append(result)
+                if len(results) > limit:
+                    break
+        return results[:limit], len(results) > limit
+
+    def delete_file(self, project_id: str, path: str) -> bool:
+        with self._write_buffer.reserve([(project_id, path)]):
+            self._write_buffer.discard(project_id, path)
+            with self.get_session() as session:
+                result = session.execute(
+                    delete(ProjectFile).where(ProjectFile.project_id == project_id, ProjectFile.path == path)
+                )
                 session.commit()
-                return True
-            return False
+            if result.rowcount and self._is_fs(project_id):
+                fs_storage.delete(project_id, path)
+        return result.rowcount > 0
+
+    def apply_file_operations(self, project_id: str, operations: list[dict], atomic: bool = False) -> list[dict] | None:
+        """Apply create/update/delete/rename operations in one transaction.
+
+        Operations are checked in order against the project's file list; the valid ones are
+        reduced to their net effect and written with one executemany per kind of change.
+        With ``atomic`` nothing is written if any operation fails. Returns per-op results,
+        or None if the project does not exist.
+        """
+        self.flush_file_writes(project_id)
+        fs = self._is_fs(project_id)
+        now = datetime.now(UTC).replace(tzinfo=None)
+        touched = {(project_id, p) for op in operations for p in (op.get("path"), op.get("new_path")) if p}
+        with self._write_buffer.reserve(touched), self.get_session() as session:
+            if session.get(Project, project_id) is None:
+                return None
+            for _, path in touched:
+                self._write_buffer.discard(project_id, path)
+            rows = session.execute(
+                select(ProjectFile.path, ProjectFile.blob_hash).where(ProjectFile.project_id == project_id)
+            ).all()
+            existing = {row.path for row in rows}
+            binary = {row.path for row in rows if row.blob_hash is not None}
+
+            # path -> (original path or None for new files, new content or None if unchanged)
+            state: dict[str, tuple[str | None, str | None]] = {p: (p, None) for p in existing}
+            results = []
+            for index, op in enumerate(operations):
+                kind, path, new_path = op.get("op"), op.get("path") or "", op.get("new_path")
+                error = None
+                if any(invalid_path(p) for p in (path, new_path) if p is not None):
+                    error = "Invalid file path"
+                elif kind == "create":
+                    if path in state:
+                        error = "File already exists"
+                    else:
+                        state[path] = (None, op.get("content") or "")
+                elif kind in ("update", "delete", "rename") and path not in state:
+                    error = "File not found"
+                elif kind == "update":
+                    state[path] = (state[path][0], op.get("content") or "")
+                elif kind == "delete":
+                    del state[path]
+                elif kind == "rename":
+                    if not new_path:
+                        error = "new_path is required"
+                    elif new_path in state:
+                        error = "File already exists"
+                    else:
+                        state[new_path] = state.pop(path)
+                else:
+                    error = f"Unknown operation: {kind}"
+                result = {"index": index, "op": kind, "path": path, "success": error is None}
+                if new_path:
+                    result["new_path"] = new_path
+                if error:
+                    result["error"] = error
+                results.append(result)
+
+            if atomic and not all(r["success"] for r in results):
+                for r in results:
+                    if r["success"]:
+                        r["success"], r["error"] = False, "Batch aborted"
+                return results
+
+            kept = {origin for origin, _ in state.values() if origin is not None}
+            deleted = [p for p in existing if p not in kept]
+            moves = {origin: path for path, (origin, _) in state.items() if origin is not None and origin != path}
+            writes = {path: content for path, (origin, content) in state.items() if content is not None}
+            inserts = [path for path, (origin, _) in state.items() if origin is None]
+
+            files = ProjectFile.__table__
+            if deleted:
+                session.execute(
+                    files.delete().where(files.c.project_id == project_id, files.c.path == bindparam("b_path")),
+                    [{"b_path": p} for p in deleted],
+                )
+            self._move_paths(session, project_id, moves)
+            updates = [p for p in writes if p not in inserts]
+            if updates:
+                params = []
+                for path in updates:
+                    stored = self._stored(fs, writes[path])
+                    params.append({"b_path": path, "b_content": stored["content"], "b_size": stored["blob_size"]})
+                session.execute(
+                    files.update()
+                    .where(files.c.project_id == project_id, files.c.path == bindparam("b_path"))
+                    .values(
+                        content=bindparam("b_content"),
+                        blob_hash=None,
+                        blob_size=bindparam("b_size"),
+                        updated_at=now,
+                    ),
+                    params,
+                )
+            if inserts:
+                new_rows = [{"path": p, **self._stored(fs, writes[p])} for p in inserts]
+                session.execute(
+                    sqlite_insert(ProjectFile).values(project_id=project_id, created_at=now, updated_at=now), new_rows
+                )
+            if fs:
+                for path in deleted:
+                    fs_storage.delete(project_id, path)
+                fs_storage.move(project_id, moves)
+                moved = {new: fs_storage.read(project_id, new) for old, new in moves.items() if old not in binary}
+                self._index_fs_files(
+                    session, project_id, {p: c for p, c in moved.items() if c is not None and p not in writes}
+                )
+                self._write_fs_files(session, project_id, writes, now)
+            for path, content in writes.items():
+                self._record_revision(session, project_id, path, content, now)
+            session.commit()
+            return results
+
+    def _move_paths(self, session, project_id: str, moves: dict[str, str]) -> None:
+        """Rename files and their revision history, going through temporary paths so swaps do not collide."""
+        if not moves:
+            return
+        for table in (ProjectFile.__table__, FileRevision.__table__):
+            rename = (
+                table.update()
+                .where(table.c.project_id == project_id, table.c.path == bindparam("b_old"))
+                .values(path=bindparam("b_new"))
+            )
+            staged = {old: f"{_RENAME_STAGING}/{old}" for old in moves}
+            session.execute(rename, [{"b_old": old, "b_new": tmp} for old, tmp in staged.items()])
+            if table is FileRevision.__table__:
+                session.execute(
+                    table.delete().where(table.c.project_id == project_id, table.c.path.in_(list(moves.values())))
+                )
+            session.execute(rename, [{"b_old": staged[old], "b_new": new} for old, new in moves.items()])
@@ -0,0 +1,215 @@
+"""
+Disk usage accounting and garbage collection for ``PROJECTS_DIR``.
+
+Layout of the projects directory::
+
+    _blobs/<sha[:2]>/<sha[2:]>      content-addressed binary assets (see ``BlobStore``)
+    <project_id>/src/...            sources of filesystem-backed projects
+    <project_id>/output.pdf         latest build outputs, plus synctex and build.json
+
+``collect_garbage`` removes what no project refers to any more (directories of
+deleted projects, blobs without a ``project_files`` row, temp files and build
+directories left by crashes) and, when a quota is set, evicts the build outputs
+of the least recently used projects until usage fits. Sources and referenced
+blobs are never evicted; an evicted project simply recompiles on next use.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from pulse_tex.core.storage import SRC_DIR_NAME, TEMP_PREFIX, fs_storage
+
+OUTPUT_FILES = ("output.pdf", "output.synctex.gz", "build.json")
+PUBLISH_TEMP_FILES = frozenset(f".{name}.tmp" for name in OUTPUT_FILES)
+BUILD_DIR_PREFIX = "pulse-tex-build-"
+STALE_AFTER = 6 * 3600
+
+
+def _tree_files(path: Path):
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            full = Path(dirpath) / name
+            try:
+                yield full, full.lstat()
+            except FileNotFoundError:
+                continue
+
+
+def _tree_size(path: Path, seen: set[tuple[int, int]]) -> int:
+    """Bytes under ``path``, counting each inode once across calls sharing ``seen`` (blobs are hardlinked)."""
+    total = 0
+    for _, st in _tree_files(path):
+        if (st.st_dev, st.st_ino) not in seen:
+            seen.add((st.st_dev, st.st_ino))
+            total += st.st_size
+    return total
+
+
+def _is_stale(st: os.stat_result, now: float) -> bool:
+    return now - st.st_mtime > STALE_AFTER
+
+
+def _last_used(project) -> datetime | None:
+    times = [t for t in (project.updated_at, project.last_compiled_at) if t]
+    return max(times) if times else None
+
+
+def disk_usage(db) -> dict:
+    """Per-project source and output bytes plus the size of the shared blob store.
+
+    A project's ``output_bytes`` is everything in its directory outside ``src``: build outputs and temp files.
+    """
+    from pulse_tex.services.blob_store import blob_store
+
+    root = fs_storage.root
+    seen: set[tuple[int, int]] = set()
+    blob_bytes = _tree_size(blob_store.root, seen)
+
+    projects = []
+    for project in db.get_projects():
+        project_dir = root / project.id
+        source_bytes = _tree_size(project_dir / SRC_DIR_NAME, seen)
+        output_bytes = _tree_size(project_dir, seen)
+        projects.append(
+            {
+                "id": project.id,
+                "name": project.name,
+                "source_bytes": source_bytes,
+                "output_bytes": output_bytes,
+                "last_used": _last_used(project),
+            }
+        )
+
+    orphans = [p.name for p in _orphan_dirs(root, {p["id"] for p in projects})]
+    orphan_bytes = sum(_tree_size(root / name, seen) for name in orphans)
+    total = blob_bytes + orphan_bytes + sum(p["source_bytes"] + p["output_bytes"] for p in projects)
+    projects.sort(key=lambda p: p["source_bytes"] + p["output_bytes"], reverse=True)
+    return {
+        "root": str(root),
+        "total_bytes": total,
+        "blob_bytes": blob_bytes,
+        "orphan_bytes": orphan_bytes,
+        "orphans": orphans,
+        "projects": projects,
+    }
+
+
+def _orphan_dirs(root: Path, project_ids: set[str], now: float | None = None) -> list[Path]:
+    """Project directories without a project row; with ``now``, only those untouched for ``STALE_AFTER``."""
+    if not root.exists():
+        return []
+    return [
+        entry
+        for entry in root.iterdir()
+        if entry.is_dir()
+        and not entry.name.startswith(("_", "."))
+        and entry.name not in project_ids
+        and (now is None or _is_stale(entry.stat(), now))
+    ]
+
+
+def _remove(path: Path, dry_run: bool) -> int:
+    """Delete a file or tree. Returns the bytes it held."""
+    if path.is_dir():
+        size = _tree_size(path, set())
+        if not dry_run:
+            shutil.rmtree(path, ignore_errors=True)
+        return size
+    try:
+        size = path.stat().st_size
+    except FileNotFoundError:
+        return 0
+    if not dry_run:
+        path.unlink(missing_ok=True)
+    return size
+
+
+def _unreferenced_blobs(db, now: float) -> list[Path]:
+    from pulse_tex.services.blob_store import blob_store
+
+    if not blob_store.root.exists():
+        return []
+    stale = [path for path, st in _tree_files(blob_store.root) if _is_stale(st, now)]
+    referenced = db.referenced_blobs()
+    return [
+        path for path in stale if path.name.startswith(".upload-") or path.parent.name + path.name not in referenced
+    ]
+
+
+def _stale_temp_files(root: Path, project_ids: set[str], now: float) -> list[Path]:
+    """Temp files of interrupted writes: ``TEMP_PREFIX`` files anywhere, and publish temps of build outputs.
+
+    Other names under ``src`` are sources of filesystem projects, whatever their suffix.
+    """
+    found = []
+    for project_id in project_ids:
+        project_dir = root / project_id
+        for path, st in _tree_files(project_dir):
+            is_temp = path.name.startswith(TEMP_PREFIX) or (
+                path.parent == project_dir and path.name in PUBLISH_TEMP_FILES
+            )
+            if is_temp and _is_stale(st, now):
+                found.append(path)
+    return found
+
+
+def _stale_build_dirs(now: float) -> list[Path]:
+    found = []
+    for entry in Path(tempfile.gettempdir()).glob(f"{BUILD_DIR_PREFIX}*"):
+        try:
+            if entry.is_dir() and _is_stale(entry.stat(), now):
+                found.append(entry)
+        except FileNotFoundError:
+            continue
+    return found
+
+
+def collect_garbage(db, quota_bytes: int = 0, dry_run: bool = False) -> dict:
+    """Remove orphaned data, then evict least recently used build outputs while usage exceeds ``quota_bytes``.
+
+    Anything created within ``STALE_AFTER`` seconds is left alone so that uploads and builds
+    in flight are not collected before their rows or outputs land. With ``dry_run`` nothing is
+    deleted and the report lists what would have been.
+    """
+    now = time.time()
+    root = fs_storage.root
+    project_ids = {p.id for p in db.get_projects()}
+
+    orphans = _orphan_dirs(root, project_ids, now)
+    blobs = _unreferenced_blobs(db, now)
+    temp_files = _stale_temp_files(root, project_ids, now)
+    build_dirs = _stale_build_dirs(now)
+    freed = sum(_remove(path, dry_run) for path in [*orphans, *blobs, *temp_files])
+    build_bytes = sum(_remove(path, dry_run) for path in build_dirs)
+
+    usage = disk_usage(db)
+    total = usage["total_bytes"] - (freed if dry_run else 0)
+    freed += build_bytes
+    evicted = []
+    if quota_bytes and total > quota_bytes:
+        candidates = [p for p in usage["projects"] if p["output_bytes"]]
+        candidates.sort(key=lambda p: p["last_used"] or datetime.min)
+        for project in candidates:
+            if total <= quota_bytes:
+                break
+            project_dir = root / project["id"]
+            released = sum(_remove(project_dir / name, dry_run) for name in reversed(OUTPUT_FILES))
+            total -= released
+            freed += released
+            evicted.append(project["id"])
+
+    return {
+        "dry_run": dry_run,
+        "removed_projects": [p.name for p in orphans],
+        "removed_blobs": len(blobs),
+        "removed_temp_files": len(temp_files) + len(build_dirs),
+        "evicted_outputs": evicted,
+        "freed_bytes": freed,
+        "total_bytes": total,
+        "quota_bytes": quota_bytes,
+        "over_quota": bool(quota_bytes) and total > quota_bytes,
+    }
@@ -0,0 +1,76 @@
+"""
+SQLite housekeeping.
+
+The database runs in WAL mode, so committed pages accumulate in ``<db>-wal``
+until a checkpoint copies them back, and pages freed by deletes stay in the
+file until a ``VACUUM`` rewrites it. ``run_maintenance`` does both and refreshes
+the planner statistics; it is used by ``tex-serve db maintain`` and by the
+optional periodic task in the app lifespan.
+"""
+
+import os
+from pathlib import Path
+
+from sqlalchemy import Engine, text
+
+VACUUM_FREE_RATIO = 0.25
+
+
+def database_path(engine: Engine) -> Path | None:
+    if engine.dialect.name != "sqlite" or engine.url.database in (None, "", ":memory:"):
+        return None
+    return Path(engine.url.database)
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def database_sizes(engine: Engine) -> dict:
+    """Sizes in bytes of the database file and its WAL, plus page accounting."""
+    path = database_path(engine)
+    if path is None:
+        return {"db_bytes": 0, "wal_bytes": 0, "page_size": 0, "page_count": 0, "free_pages": 0}
+    with engine.connect() as conn:
+        page_size = conn.exec_driver_sql("PRAGMA page_size").scalar()
+        page_count = conn.exec_driver_sql("PRAGMA page_count").scalar()
+        free_pages = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+    return {
+        "db_bytes": _file_size(path),
+        "wal_bytes": _file_size(path.with_name(path.name + "-wal")),
+        "page_size": page_size,
+        "page_count": page_count,
+        "free_pages": free_pages,
+    }
+
+
+def run_maintenance(engine: Engine, vacuum: bool | None = True) -> dict:
+    """Checkpoint the WAL, optionally VACUUM, then ANALYZE and ``PRAGMA optimize``.
+
+    ``vacuum=None`` vacuums only when at least ``VACUUM_FREE_RATIO`` of the pages are free,
+    which keeps the periodic task from rewriting the whole file every time it runs.
+    Returns the sizes before and after and which steps ran.
+    """
+    before = database_sizes(engine)
+    if database_path(engine) is None:
+        return {"before": before, "after": before, "vacuumed": False, "checkpoint": None}
+
+    if vacuum is None:
+        vacuum = bool(before["page_count"]) and before["free_pages"] / before["page_count"] >= VACUUM_FREE_RATIO
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if vacuum:
+            conn.exec_driver_sql("VACUUM")
+        conn.exec_driver_sql("ANALYZE")
+        conn.exec_driver_sql("PRAGMA optimize")
+        busy, wal_pages, checkpointed = conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)").one()
+
+    return {
+        "before": before,
+        "after": database_sizes(engine),
+        "vacuumed": vacuum,
+        "checkpoint": {"busy": bool(busy), "wal_pages": wal_pages, "checkpointed_pages": checkpointed},
+    }
@@ -0,0 +1,112 @@
+"""
+SQLite schema migrations, tracked with ``PRAGMA user_version``.
+
+``Base.metadata.create_all`` only creates missing tables, so changes to existing
+tables (indexes, columns, virtual tables) are applied here. Fresh databases replay
+every step as well, so each migration must be idempotent.
+"""
+
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+
+def _columns(conn: Connection, table: str) -> set[str]:
+    return {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+
+
+def add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    if column not in _columns(conn, table):
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+def _unique_file_paths(conn: Connection) -> None:
+    conn.exec_driver_sql(
+        "DELETE FROM project_files WHERE id NOT IN (SELECT MAX(id) FROM project_files GROUP BY project_id, path)"
+    )
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_project_files_project_id")
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_project_files_project_path ON project_files (project_id, path)"
+    )
+
+
+def _file_blobs(conn: Connection) -> None:
+    add_column(conn, "project_files", "blob_hash", "VARCHAR(64)")
+    add_column(conn, "project_files", "blob_size", "INTEGER")
+
+
+def has_file_search(conn: Connection) -> bool:
+    return conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'file_search'").first() is not None
+
+
+def _file_search_index(conn: Connection) -> None:
+    if has_file_search(conn):
+        return
+    try:
+        conn.exec_driver_sql(
+            "CREATE VIRTUAL TABLE file_search USING fts5(project_id UNINDEXED, path UNINDEXED, content)"
+        )
+    except OperationalError:
+        # SQLite built without FTS5: search falls back to scanning project_files.
+        return
+
+    conn.exec_driver_sql(
+        """
+        CREATE TRIGGER IF NOT EXISTS project_files_search_insert AFTER INSERT ON project_files
+        WHEN new.blob_hash IS NULL AND new.content IS NOT NULL BEGIN
+            INSERT INTO file_search (rowid, project_id, path, content)
+            VALUES (new.id, new.project_id, new.path, new.content);
+        END
+        """
+    )
+    conn.exec_driver_sql(
+        """
+        CREATE TRIGGER IF NOT EXISTS project_files_search_delete AFTER DELETE ON project_files BEGIN
+            DELETE FROM file_search WHERE rowid = old.id;
+        END
+        """
+    )
+    conn.exec_driver_sql(
+        """
+        CREATE TRIGGER IF NOT EXISTS project_files_search_update
+        AFTER UPDATE OF project_id, path, content, blob_hash ON project_files BEGIN
+            DELETE FROM file_search WHERE rowid = old.id;
+            INSERT INTO file_search (rowid, project_id, path, content)
+            SELECT new.id, new.project_id, new.path, new.content
+            WHERE new.blob_hash IS NULL AND new.content IS NOT NULL;
+        END
+        """
+    )
+    conn.exec_driver_sql(
+        "INSERT INTO file_search (rowid, project_id, path, content) "
+        "SELECT id, project_id, path, content FROM project_files WHERE blob_hash IS NULL AND content IS NOT NULL"
+    )
+
+
+def _project_listing(conn: Connection) -> None:
+    add_column(conn, "projects", "last_compile_status", "VARCHAR(16)")
+    add_column(conn, "projects", "last_compiled_at", "DATETIME")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_projects_updated_at ON projects (updated_at, id)")
+
+
+def _project_storage(conn: Connection) -> None:
+    add_column(conn, "projects", "storage", "VARCHAR(8) DEFAULT 'db'")
+
+
+MIGRATIONS = [
+    _unique_file_paths,
+    _file_blobs,
+    _file_search_index,
+    _project_listing,
+    _project_storage,
+]
+
+
+def run_migrations(engine: Engine) -> None:
+    if engine.dialect.name != "sqlite":
+        return
+
+    with engine.begin() as conn:
+        version = conn.exec_driver_sql("PRAGMA user_version").scalar() or 0
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {number}")
@@ -0,0 +1,182 @@
+"""
+File revision history stored as reverse deltas.
+
+The newest revision of a file is always a full snapshot. When a new revision is
+recorded, the previous head is re-encoded as a delta against the new content,
+except every ``snapshot_every``-th revision, which stays a full snapshot so that
+reconstruction never applies more than ``snapshot_every`` deltas. Because deltas
+point from newer to older revisions, the oldest revisions can be pruned freely.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session, defer
+
+from pulse_tex.models import FileRevision
+from pulse_tex.utils.delta import apply_delta, make_delta
+
+
+@dataclass
+class RevisionPolicy:
+    min_interval: int = 60
+    snapshot_every: int = 20
+    max_per_file: int = 1000
+
+    @classmethod
+    def from_config(cls) -> "RevisionPolicy":
+        from pulse_tex.core.config import Config
+
+        return cls(
+            min_interval=Config.REVISION_MIN_INTERVAL,
+            snapshot_every=Config.REVISION_SNAPSHOT_EVERY,
+            max_per_file=Config.REVISION_MAX_PER_FILE,
+        )
+
+
+def _file_filter(project_id: str, path: str):
+    return (FileRevision.project_id == project_id, FileRevision.path == path)
+
+
+def _snapshot(project_id: str, path: str, rev: int, content: str, now: datetime) -> FileRevision:
+    return FileRevision(project_id=project_id, path=path, rev=rev, data=content, size=len(content), created_at=now)
+
+
+def record_revision(
+    session: Session,
+    project_id: str,
+    path: str,
+    content: str,
+    now: datetime,
+    policy: RevisionPolicy,
+) -> None:
+    """Record ``content`` as the newest revision of a file inside the caller's transaction."""
+    recent = session.scalars(
+        select(FileRevision).where(*_file_filter(project_id, path)).order_by(FileRevision.rev.desc()).limit(2)
+    ).all()
+    head = recent[0] if recent else None
+    previous = recent[1] if len(recent) > 1 else None
+
+    if head is None:
+        session.add(_snapshot(project_id, path, 1, content, now))
+        return
+
+    if head.data == content:
+        return
+
+    if now - head.created_at < timedelta(seconds=policy.min_interval):
+        # Coalesce into the head without diffing on every save: the previous revision's delta
+        # was taken against the head's old content, so it is materialized as a snapshot once
+        # per burst and re-encoded when the next revision starts.
+        if previous is not None and previous.kind == "delta":
+            previous.data = apply_delta(head.data, previous.data)
+            previous.kind = "snapshot"
+        head.data = content
+        head.size = len(content)
+        return
+
+    if previous is not None and previous.kind == "snapshot" and (head.rev - 1) % policy.snapshot_every:
+        previous.data = make_delta(head.data, previous.data)
+        previous.kind = "delta"
+    if head.rev % policy.snapshot_every:
+        head.data = make_delta(content, head.data)
+        head.kind = "delta"
+    session.add(_snapshot(project_id, path, head.rev + 1, content, now))
+
+    if policy.max_per_file and head.rev + 1 > policy.max_per_file:
+        session.execute(
+            delete(FileRevision).where(
+                *_file_filter(project_id, path), FileRevision.rev <= head.rev + 1 - policy.max_per_file
+            )
+        )
+
+
+def _revisions(session: Session, project_id: str, path: str, *options) -> list[FileRevision]:
+    return list(
+        session.scalars(
+            select(FileRevision)
+            .where(*_file_filter(project_id, path))
+            .order_by(FileRevision.rev.desc())
+            .options(*options)
+        ).all()
+    )
+
+
+def list_revisions(session: Session, project_id: str, path: str) -> list[FileRevision]:
+    """Revision metadata of a file, newest first; the stored ``data`` is not loaded."""
+    return _revisions(session, project_id, path, defer(FileRevision.data))
+
+
+def reconstruct_revision(session: Session, project_id: str, path: str, rev: int) -> str | None:
+    """Rebuild the content of revision ``rev`` from the nearest newer snapshot."""
+    snapshot_rev = (
+        select(func.min(FileRevision.rev))
+        .where(*_file_filter(project_id, path), FileRevision.rev >= rev, FileRevision.kind == "snapshot")
+        .scalar_subquery()
+    )
+    chain = session.execute(
+        select(FileRevision.rev, FileRevision.kind, FileRevision.data)
+        .where(*_file_filter(project_id, path), FileRevision.rev >= rev, FileRevision.rev <= snapshot_rev)
+        .order_by(FileRevision.rev)
+    ).all()
+    if not chain or chain[0].rev != rev:
+        return None
+
+    content = chain[-1].data
+    for row in reversed(chain[:-1]):
+        content = apply_delta(content, row.data)
+    return content
+
+
+def compact_revisions(
+    session: Session,
+    project_id: str,
+    path: str,
+    policy: RevisionPolicy,
+    older_than: datetime,
+) -> int:
+    """Thin revisions older than ``older_than`` to one per day and re-encode the chain. Returns rows removed."""
+    revisions = _revisions(session, project_id, path)
+    if len(revisions) < 2:
+        return 0
+
+    contents: dict[int, str] = {}
+    content = ""
+    for revision in revisions:
+        content = revision.data if revision.kind == "snapshot" else apply_delta(content, revision.data)
+        contents[revision.rev] = content
+
+    kept: list[FileRevision] = []
+    seen_days = set()
+    for revision in revisions:
+        day = revision.created_at.date()
+        if revision.created_at < older_than and day in seen_days:
+            session.delete(revision)
+            continue
+        seen_days.add(day)
+        kept.append(revision)
+
+    # Kept revisions are sparse, so snapshots are placed by position as if the kept revisions
+    # were numbered consecutively down from the head. This bounds every delta chain, including
+    # the one that continues into this history once newer revisions are recorded on top of it.
+    newer = None
+    for index, revision in enumerate(kept):
+        if newer is None or (kept[0].rev - index) % policy.snapshot_every == 0:
+            revision.kind, revision.data = "snapshot", contents[revision.rev]
+        else:
+            revision.kind, revision.data = "delta", make_delta(contents[newer.rev], contents[revision.rev])
+        newer = revision
+    return len(revisions) - len(kept)
+
+
+def revision_storage(session: Session, project_id: str | None = None) -> dict:
+    stmt = select(
+        func.count(FileRevision.id),
+        func.coalesce(func.sum(func.length(FileRevision.data)), 0),
+        func.coalesce(func.sum(FileRevision.size), 0),
+    )
+    if project_id:
+        stmt = stmt.where(FileRevision.project_id == project_id)
+    count, stored, logical = session.execute(stmt).one()
+    return {"revisions": count, "stored_bytes": stored, "logical_bytes": logical}
@@ -0,0 +1,145 @@
+"""
+Filesystem storage for projects created with ``storage="fs"``.
+
+Sources of such projects live as plain files under ``PROJECTS_DIR/<id>/src`` so
+the build and external tools (git, editors) work on the same tree. SQLite keeps
+one metadata row per file in ``project_files`` with ``content`` left NULL; see
+``Database`` for how reads and writes are routed here.
+"""
+
+import os
+import shutil
+import tempfile
+from datetime import UTC, datetime
+from pathlib import Path, PurePosixPath
+
+SRC_DIR_NAME = "src"
+TEMP_PREFIX = ".pulse-tex-"
+IGNORED_DIRS = {".git", ".hg", ".svn"}
+
+
+def invalid_path(path: str) -> bool:
+    """Whether ``path`` is empty, absolute or escapes the project with ``..``."""
+    pure = PurePosixPath(path)
+    return not path or pure.is_absolute() or ".." in pure.parts
+
+
+class FilesystemStorage:
+    def __init__(self, root: str | Path | None = None):
+        self._root = Path(root) if root else None
+
+    @property
+    def root(self) -> Path:
+        from pulse_tex.core.config import Config
+
+        return self._root or Path(Config.PROJECTS_DIR)
+
+    def src_dir(self, project_id: str) -> Path:
+        return self.root / project_id / SRC_DIR_NAME
+
+    def path_for(self, project_id: str, path: str) -> Path:
+        if invalid_path(path):
+            raise ValueError(f"Invalid file path: {path}")
+        return self.src_dir(project_id).joinpath(*PurePosixPath(path).parts)
+
+    def read(self, project_id: str, path: str) -> str | None:
+        try:
+            return self.path_for(project_id, path).read_text(encoding="utf-8")
+        except (FileNotFoundError, UnicodeDecodeError):
+            return None
+
+    def write(self, project_id: str, path: str, content: str, mtime: datetime) -> int:
+        """Atomically replace a file and stamp it with ``mtime`` (naive UTC). Returns its size in bytes."""
+        target = self.path_for(project_id, path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        data = content.encode("utf-8")
+        with tempfile.NamedTemporaryFile(dir=target.parent, prefix=TEMP_PREFIX, delete=False) as tmp:
+            try:
+                tmp.write(data)
+            except BaseException:
+                tmp.close()
+                os.unlink(tmp.name)
+                raise
+        os.replace(tmp.name, target)
+        timestamp = mtime.replace(tzinfo=UTC).timestamp()
+        os.utime(target, (timestamp, timestamp))
+        return len(data)
+
+    def copy_blob(self, project_id: str, path: str, digest: str) -> None:
+        """Atomically place a private, writable copy of a stored blob at ``path``.
+
+        Blobs are read-only and shared by every file with the same digest, so they are only
+        hardlinked into throwaway build directories, never into trees that users edit.
+        """
+        from pulse_tex.services.blob_store import blob_store
+
+        target = self.path_for(project_id, path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with (
+            blob_store.open(digest) as source,
+            tempfile.NamedTemporaryFile(dir=target.parent, prefix=TEMP_PREFIX, delete=False) as tmp,
+        ):
+            try:
+                shutil.copyfileobj(source, tmp)
+            except BaseException:
+                tmp.close()
+                os.unlink(tmp.name)
+                raise
+        os.replace(tmp.name, target)
+
+    def delete(self, project_id: str, path: str) -> None:
+        self.path_for(project_id, path).unlink(missing_ok=True)
+
+    def move(self, project_id: str, moves: dict[str, str]) -> None:
+        """Rename files, staging them first so swaps within one call do not clobber each other."""
+        staged = {}
+        for old in moves:
+            source = self.path_for(project_id, old)
+            if source.exists():
+                staging = source.with_name(f"{TEMP_PREFIX}move-{source.name}")
+                os.replace(source, staging)
+                staged[old] = staging
+        for old, staging in staged.items():
+            target = self.path_for(project_id, moves[old])
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(staging, target)
+
+    def scan(self, project_id: str) -> dict[str, os.stat_result]:
+        """List the files of a project's tree, skipping VCS metadata and in-flight temp files."""
+        src = self.src_dir(project_id)
+        found = {}
+        for dirpath, dirnames, filenames in os.walk(src):
+            dirnames[:] = [d for d in dirnames if d not in IGNORED_DIRS]
+            for name in filenames:
+                if name.startswith(TEMP_PREFIX):
+                    continue
+                full = Path(dirpath) / name
+                found[full.relative_to(src).as_posix()] = full.stat()
+        return found
+
+    def copy_tree(self, project_id: str, target: Path) -> None:
+        """Copy a project's tree (without VCS metadata) into ``target``, e.g. a build directory.
+
+        Files are copied, not hardlinked: TeX engines rewrite outputs such as ``main.aux`` or
+        ``main.bbl`` in place, which through a link would overwrite the project's own files.
+        """
+        source = self.src_dir(project_id)
+        if source.exists():
+            shutil.copytree(
+                source,
+                target,
+                ignore=shutil.ignore_patterns(*IGNORED_DIRS, f"{TEMP_PREFIX}*"),
+                copy_function=shutil.copy2,
+                dirs_exist_ok=True,
+            )
+
+    def copy_project(self, source_id: str, target_id: str) -> None:
+        """Give a clone its own copy of the source tree; nothing is shared with the template."""
+        self.copy_tree(source_id, self.src_dir(target_id))
+
+    def remove_project(self, project_id: str) -> None:
+        """Delete a project's directory: its sources and any build outputs."""
+        shutil.rmtree(self.root / project_id, ignore_errors=True)
+
+
+fs_storage = FilesystemStorage()
@@ -1,3 +1,21 @@
-from pulse_tex.models.base import Base, Project, ProjectFile, SystemConfig
+from pulse_tex.models.base import (
+    AICacheEntry,
+    Base,
+    ChatMessage,
+    ChatSession,
+    FileRevision,
+    Project,
+    ProjectFile,
+    SystemConfig,
+)
 
-__all__ = ["Base", "Project", "ProjectFile", "SystemConfig"]
+__all__ = [
+    "AICacheEntry",
+    "Base",
+    "ChatMessage",
+    "ChatSession",
+    "FileRevision",
+    "Project",
+    "ProjectFile",
+    "SystemConfig",
+]
@@ -1,6 +1,6 @@
 from datetime import UTC, datetime
 
-from sqlalchemy import Column, DateTime, Integer, String, Text
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
 from sqlalchemy.orm import DeclarativeBase
 from ulid import ULID
 
@@ -29,11 +29,15 @@ class SystemConfig(Base):
 
 class Project(Base):
     __tablename__ = "projects"
+    __table_args__ = (Index("ix_projects_updated_at", "updated_at", "id"),)
 
     id = Column(String(26), primary_key=True, default=generate_ulid)
     name = Column(String, nullable=False)
     description = Column(Text, default="")
     main_file = Column(String, default="main.tex")
+    storage = Column(String(8), default="db")
+    last_compile_status = Column(String(16))
+    last_compiled_at = Column(DateTime)
     created_at = Column(DateTime, default=utcnow)
     updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
 
@@ -43,6 +47,9 @@ class Project(Base):
             "name": self.name,
             "description": self.description,
             "main_file": self.main_file,
+            "storage": self.storage or "db",
+            "last_compile_status": self.last_compile_status,
+            "last_compiled_at": self.last_compiled_at.isoformat() + "Z" if self.last_compiled_at else None,
             "created_at": self.created_at.isoformat() + "Z" if self.created_at else None,
             "updated_at": self.updated_at.isoformat() + "Z" if self.updated_at else None,
         }
@@ -50,20 +57,112 @@ class Project(Base):
 
 class ProjectFile(Base):
     __tablename__ = "project_files"
+    __table_args__ = (Index("ix_project_files_project_path", "project_id", "path", unique=True),)
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    project_id = Column(String(26), nullable=False, index=True)
+    project_id = Column(String(26), nullable=False)
     path = Column(String, nullable=False)
     content = Column(Text, default="")
+    blob_hash = Column(String(64))
+    blob_size = Column(Integer)
     created_at = Column(DateTime, default=utcnow)
     updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
 
+    @property
+    def is_binary(self) -> bool:
+        return self.blob_hash is not None
+
     def to_dict(self) -> dict:
         return {
             "id": self.id,
             "project_id": self.project_id,
             "path": self.path,
             "content": self.content,
+            "is_binary": self.is_binary,
+            "blob_hash": self.blob_hash,
+            "blob_size": self.blob_size,
             "created_at": self.created_at.isoformat() + "Z" if self.created_at else None,
             "updated_at": self.updated_at.isoformat() + "Z" if self.updated_at else None,
         }
+
+
+class FileRevision(Base):
+    __tablename__ = "file_revisions"
+    __table_args__ = (Index("ix_file_revisions_file_rev", "project_id", "path", "rev", unique=True),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    project_id = Column(String(26), nullable=False)
+    path = Column(String, nullable=False)
+    rev = Column(Integer, nullable=False)
+    kind = Column(String(8), nullable=False, default="snapshot")
+    data = Column(Text, nullable=False, default="")
+    size = Column(Integer, default=0)
+    created_at = Column(DateTime, default=utcnow)
+
+    def to_dict(self) -> dict:
+        return {
+            "rev": self.rev,
+            "path": self.path,
+            "kind": self.kind,
+            "size": self.size,
+            "created_at": self.created_at.isoformat() + "Z" if self.created_at else None,
+        }
+
+
+class AICacheEntry(Base):
+    """A cached response of a deterministic AI operation, keyed by a hash of model, operation, parameters and input."""
+
+    __tablename__ = "ai_cache"
+    __table_args__ = (Index("ix_ai_cache_last_used_at", "last_used_at"),)
+
+    key = Column(String(64), primary_key=True)
+    operation = Column(String(32), nullable=False)
+    model = Column(String, nullable=False)
+    response = Column(Text, nullable=False)
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=utcnow)
+    last_used_at = Column(DateTime, default=utcnow)
+
+
+class ChatSession(Base):
+    """A conversation with the assistant; turns up to ``summarized_through`` are folded into ``summary``."""
+
+    __tablename__ = "chat_sessions"
+    __table_args__ = (Index("ix_chat_sessions_project_updated", "project_id", "updated_at"),)
+
+    id = Column(String(26), primary_key=True, default=generate_ulid)
+    project_id = Column(String(26))
+    title = Column(String, default="")
+    summary = Column(Text, default="")
+    summarized_through = Column(Integer, default=0)
+    created_at = Column(DateTime, default=utcnow)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "project_id": self.project_id,
+            "title": self.title,
+            "summary": self.summary,
+            "created_at": self.created_at.isoformat() + "Z" if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() + "Z" if self.updated_at else None,
+        }
+
+
+class ChatMessage(Base):
+    __tablename__ = "chat_messages"
+    __table_args__ = (Index("ix_chat_messages_session_id", "session_id", "id"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    session_id = Column(String(26), nullable=False)
+    role = Column(String(16), nullable=False)
+    content = Column(Text, nullable=False, default="")
+    created_at = Column(DateTime, default=utcnow)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "role": self.role,
+            "content": self.content,
+            "created_at": self.created_at.isoformat() + "Z" if self.created_at else None,
+        }
@@ -1,26 +1,58 @@
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
 from openai import AsyncOpenAI
 
-from pulse_tex.core.config import Config
+from pulse_tex.core.config import Config, get_db
+from pulse_tex.services.ai_cache import ai_cache
+from pulse_tex.services.llm_clients import llm_clients
+from pulse_tex.services.rate_limit import AdmissionController, estimate_tokens, is_retryable, retry_delay
+from pulse_tex.services.retrieval import project_retrieval
+from pulse_tex.utils.latex_chunks import split_latex, split_whitespace
+from pulse_tex.utils.texlog import error_context, error_files
+
+
+@dataclass
+class Completion:
+    """A single-turn prompt. With an ``operation`` the response is cached under it, ``params`` and ``cache_input``."""
+
+    system_prompt: str
+    user_message: str
+    temperature: float
+    operation: str | None = None
+    params: dict = field(default_factory=dict)
+    cache_input: str = ""
 
 
 class AIService:
     def __init__(self):
-        self._client: AsyncOpenAI | None = None
+        self._limiter: AdmissionController | None = None
+        self._limiter_key: tuple | None = None
 
     @property
     def client(self) -> AsyncOpenAI:
-        if self._client is None:
-            api_key = Config.AI_API_KEY
-            if not api_key:
-                raise ValueError("AI API key not configured")
-            base_url = Config.AI_BASE_URL
-            if not base_url.endswith("/v1"):
-                base_url = f"{base_url.rstrip('/')}/v1"
-            self._client = AsyncOpenAI(
-                api_key=api_key,
-                base_url=base_url,
-            )
-        return self._client
+        """The shared client for the current settings, so config changes apply to the next request."""
+        api_key = Config.AI_API_KEY
+        if not api_key:
+            raise ValueError("AI API key not configured")
+        return llm_clients.get(Config.AI_BASE_URL, api_key)
+
+    @property
+    def limiter(self) -> AdmissionController:
+        """The admission controller for the running event loop and current settings."""
+        key = (
+            asyncio.get_running_loop(),
+            Config.AI_UPSTREAM_CONCURRENCY,
+            Config.AI_REQUESTS_PER_MINUTE,
+            Config.AI_TOKENS_PER_MINUTE,
+            Config.AI_QUEUE_TIMEOUT,
+        )
+        if self._limiter is None or self._limiter_key != key:
+            self._limiter = AdmissionController(*key[1:])
+            self._limiter_key = key
+        return self._limiter
 
     @property
     def model(self) -> str:
@@ -30,63 +62,177 @@ class AIService:
     def is_configured(self) -> bool:
         return bool(Config.AI_API_KEY)
 
-    async def chat(
+    async def _chat_messages(
         self,
         message: str,
-        context: str | None = None,
-        system_prompt: str | None = None,
-    ) -> str:
+        context: str | None,
+        system_prompt: str | None,
+        project_id: str | None,
+        history: list[dict] | None = None,
+    ) -> list[dict]:
+        """With a ``project_id``, the passages of the project most relevant to the question are included.
+
+        ``history`` holds the earlier turns of a chat session, placed before the question.
+        """
+        excerpts = ""
+        if project_id:
+            db = get_db()
+            excerpts = await db.run(project_retrieval.context, db, project_id, message)
+
+        parts = []
+        if excerpts:
+            parts.append(f"Relevant excerpts from my project:\n{excerpts}")
+        if context:
+            parts.append(f"Context (from my paper):\n{context}")
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
-        if context:
-            messages.append(
-                {
-                    "role": "user",
-                    "content": f"Context (from my paper):\n{context}\n\nMy question: {message}",
-                }
-            )
+        messages.extend(history or [])
+        if parts:
+            messages.append({"role": "user", "content": "\n\n".join([*parts, f"My question: {message}"])})
         else:
             messages.append({"role": "user", "content": message})
+        return messages
 
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=0.7,
-        )
-        return response.choices[0].message.content or ""
+    async def chat(
+        self,
+        message: str,
+        context: str | None = None,
+        system_prompt: str | None = None,
+        project_id: str | None = None,
+        history: list[dict] | None = None,
+    ) -> str:
+        messages = await self._chat_messages(message, context, system_prompt, project_id, history)
+        async with self._upstream(messages, 0.7) as response:
+            return response.choices[0].message.content or ""
 
     async def chat_stream(
         self,
         message: str,
         context: str | None = None,
         system_prompt: str | None = None,
+        project_id: str | None = None,
+        history: list[dict] | None = None,
     ):
-        messages = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        if context:
-            messages.append(
-                {
-                    "role": "user",
-                    "content": f"Context (from my paper):\n{context}\n\nMy question: {message}",
-                }
-            )
-        else:
-            messages.append({"role": "user", "content": message})
-
-        stream = await self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=0.7,
-            stream=True,
+        messages = await self._chat_messages(message, context, system_prompt, project_id, history)
+        async with self._upstream(messages, 0.7, stream=True) as stream:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    async def summarize_conversation(self, summary: str, turns: list[dict]) -> str:
+        """Fold ``turns`` into the running ``summary`` of a chat session."""
+        system_prompt = """You maintain the running summary of a conversation between a researcher and their LaTeX writing assistant.
+Merge the new turns into the existing summary.
+Keep what later turns may rely on: facts about the paper, decisions, requested conventions, code or text that was agreed on, open questions.
+Drop greetings and anything superseded. Write at most 200 words, in the language of the conversation.
+Return ONLY the updated summary."""
+        transcript = "\n\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+        user_message = f"Existing summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"
+        return (await self._complete(system_prompt, user_message, 0.2)).strip()
+
+    async def complete_inline(self, prefix: str, suffix: str = "") -> str:
+        """A short continuation of ``prefix`` to show as ghost text. Not retried: by then the author has moved on."""
+        system_prompt = """You are the inline autocompletion of a LaTeX editor.
+Continue the document at <CURSOR> with what the author is most likely to type next: the rest of the word, command, environment line or sentence.
+Return ONLY the text to insert at the cursor. Do not repeat the text before the cursor, do not explain, do not use code fences.
+Return nothing if no continuation is likely."""
+        messages = self._messages(system_prompt, f"{prefix}<CURSOR>{suffix}")
+        async with self._upstream(
+            messages, 0.2, max_tokens=Config.AI_COMPLETION_MAX_TOKENS, stop=["\n\n"], retries=0
+        ) as response:
+            return response.choices[0].message.content or ""
+
+    @asynccontextmanager
+    async def _upstream(
+        self,
+        messages: list[dict],
+        temperature: float,
+        stream: bool = False,
+        max_tokens: int | None = None,
+        stop: list[str] | None = None,
+        retries: int | None = None,
+    ):
+        """Call the provider through the admission controller, retrying 429/5xx with backoff.
+
+        The concurrency slot is held until the caller leaves the block, so a stream counts
+        as in flight until it has been read or abandoned, and is closed either way. Failures
+        after the response arrived are not retried.
+        """
+        limiter = self.limiter
+        tokens = estimate_tokens(messages, max_tokens)
+        extra = {"stream": True} if stream else {}
+        if max_tokens is not None:
+            extra["max_tokens"] = max_tokens
+        if stop:
+            extra["stop"] = stop
+        retries = Config.AI_MAX_RETRIES if retries is None else retries
+        for attempt in range(retries + 1):
+            async with limiter.admit(tokens), llm_clients.using(self.client) as client:
+                try:
+                    response = await client.chat.completions.create(
+                        model=self.model, messages=messages, temperature=temperature, **extra
+                    )
+                except Exception as e:
+                    if attempt == retries or not is_retryable(e):
+                        raise
+                    delay = retry_delay(e, attempt)
+                else:
+                    try:
+                        yield response
+                    finally:
+                        if stream:
+                            # Also reached when the reader is cancelled: release the connection now, not at GC.
+                            await response.close()
+                    usage = getattr(response, "usage", None)
+                    limiter.settle(tokens, getattr(usage, "total_tokens", 0) or 0)
+                    return
+            await asyncio.sleep(delay)
+
+    def _messages(self, system_prompt: str, user_message: str) -> list[dict]:
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message},
+        ]
+
+    async def _complete(self, system_prompt: str, user_message: str, temperature: float) -> str:
+        async with self._upstream(self._messages(system_prompt, user_message), temperature) as response:
+            return response.choices[0].message.content or ""
+
+    async def complete(self, completion: Completion, use_cache: bool = True) -> str:
+        def compute():
+            return self._complete(completion.system_prompt, completion.user_message, completion.temperature)
+
+        if completion.operation is None:
+            return await compute()
+        return await ai_cache.fetch(
+            self.model, completion.operation, completion.params, completion.cache_input, compute, use_cache=use_cache
         )
 
-        async for chunk in stream:
-            if chunk.choices and chunk.choices[0].delta.content:
-                yield chunk.choices[0].delta.content
-
-    async def polish(self, text: str, style: str = "academic") -> str:
+    async def stream(self, completion: Completion, use_cache: bool = True) -> AsyncIterator[str]:
+        """Streaming counterpart of ``complete``, shared by every streaming endpoint.
+
+        A cache hit is yielded as a single piece; a response streamed to the end is cached.
+        """
+        key = (self.model, completion.operation, completion.params, completion.cache_input)
+        cacheable = completion.operation is not None and ai_cache.enabled
+        if cacheable and use_cache:
+            cached = await ai_cache.lookup(*key)
+            if cached is not None:
+                yield cached
+                return
+
+        messages = self._messages(completion.system_prompt, completion.user_message)
+        parts = []
+        async with self._upstream(messages, completion.temperature, stream=True) as stream:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield parts[-1]
+        if cacheable and parts:
+            await ai_cache.store(*key, "".join(parts))
+
+    def _polish_prompt(self, text: str, style: str) -> Completion:
         system_prompt = """You are an academic writing assistant. Your task is to polish and improve the given text while maintaining its original meaning. 
 - Improve clarity, grammar, and flow
 - Use formal academic language
@@ -106,17 +252,15 @@ Text to polish:
 
 Polished text:"""
 
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message},
-            ],
-            temperature=0.3,
-        )
-        return response.choices[0].message.content or ""
+        return Completion(system_prompt, user_message, 0.3, "polish", {"style": style}, text)
+
+    async def polish(self, text: str, style: str = "academic", use_cache: bool = True) -> str:
+        return await self.complete(self._polish_prompt(text, style), use_cache=use_cache)
+
+    def polish_stream(self, text: str, style: str = "academic", use_cache: bool = True) -> AsyncIterator[str]:
+        return self.stream(self._polish_prompt(text, style), use_cache=use_cache)
 
-    async def translate(self, text: str, direction: str = "en") -> str:
+    def _translate_prompt(self, text: str, direction: str) -> Completion:
         if direction == "en":
             lang_pair = "Chinese to English"
             target = "English"
@@ -135,17 +279,70 @@ Polished text:"""
 
 Translation:"""
 
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message},
-            ],
-            temperature=0.3,
-        )
-        return response.choices[0].message.content or ""
-
-    async def explain_error(self, log_content: str, source_code: str | None = None) -> str:
+        return Completion(system_prompt, user_message, 0.3, "translate", {"direction": direction}, text)
+
+    async def translate(self, text: str, direction: str = "en", use_cache: bool = True) -> str:
+        return await self.complete(self._translate_prompt(text, direction), use_cache=use_cache)
+
+    def translate_stream(self, text: str, direction: str = "en", use_cache: bool = True) -> AsyncIterator[str]:
+        return self.stream(self._translate_prompt(text, direction), use_cache=use_cache)
+
+    async def process_document(self, text: str, transform: Callable[[str], Awaitable[str]]) -> AsyncIterator[dict]:
+        """Apply ``transform`` to a long LaTeX text chunk by chunk, running up to ``AI_CONCURRENCY`` chunks at once.
+
+        Yields a ``start`` event with the chunk count, a ``chunk`` event per chunk as soon as it
+        finishes (in completion order, with its index), and a ``done`` event with the chunks
+        reassembled in order. A failed chunk keeps its original text and is listed in ``failed``.
+        """
+        chunks = split_latex(text, Config.AI_CHUNK_CHARS)
+        results = list(chunks)
+        failed = []
+        semaphore = asyncio.Semaphore(Config.AI_CONCURRENCY)
+
+        async def run(index: int, chunk: str) -> dict:
+            leading, body, trailing = split_whitespace(chunk)
+            if not body:
+                return {"type": "chunk", "index": index, "content": chunk}
+            async with semaphore:
+                try:
+                    result = await transform(body)
+                except Exception as e:
+                    return {"type": "chunk", "index": index, "content": chunk, "error": str(e)}
+            return {"type": "chunk", "index": index, "content": leading + result.strip() + trailing}
+
+        yield {"type": "start", "chunks": len(chunks)}
+        tasks = [asyncio.create_task(run(index, chunk)) for index, chunk in enumerate(chunks)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                event = await finished
+                results[event["index"]] = event["content"]
+                if "error" in event:
+                    failed.append(event["index"])
+                yield event
+        finally:
+            for task in tasks:
+                task.cancel()
+        yield {"type": "done", "content": "".join(results), "failed": sorted(failed)}
+
+    def polish_document(self, text: str, style: str = "academic", use_cache: bool = True) -> AsyncIterator[dict]:
+        return self.process_document(text, lambda body: self.polish(body, style=style, use_cache=use_cache))
+
+    def translate_document(self, text: str, direction: str = "en", use_cache: bool = True) -> AsyncIterator[dict]:
+        return self.process_document(text, lambda body: self.translate(body, direction=direction, use_cache=use_cache))
+
+    def _explain_error_prompt(
+        self,
+        log_content: str,
+        source_code: str | None,
+        sources: dict[str, str] | None = None,
+        source_path: str = "main.tex",
+    ) -> Completion:
+        """Prompt with only the error blocks of the log and the source around them.
+
+        ``sources`` holds the project files the errors point to. ``source_code`` is the editor
+        buffer of ``source_path`` and, being newer, replaces that file's source when an error
+        points to it; it is never shown as the source of another file, such as a package.
+        """
         system_prompt = """You are a LaTeX expert helping debug compilation errors. 
 Analyze the error log and explain in simple terms:
 1. What went wrong
@@ -154,34 +351,57 @@ Analyze the error log and explain in simple terms:
 
 Be concise and helpful. If you can identify the exact issue, provide the corrected code snippet."""
 
-        user_message = f"""Here is the LaTeX compilation error log:
+        sources = dict(sources or {})
+        files = error_files(log_content)
+        if source_code and source_path in files:
+            sources[source_path] = source_code
+        context = error_context(log_content, sources)
+
+        user_message = f"""Here are the errors from the LaTeX compilation log:
 
 ```
-{log_content[:4000]}
+{context}
 ```
 """
 
-        if source_code:
+        extra_source = source_code[:2000] if source_code and not files else ""
+        if extra_source:
             user_message += f"""
 The source .tex file content:
 ```
-{source_code[:2000]}
+{extra_source}
 ```
 """
 
         user_message += "\nPlease explain the error and how to fix it:"
 
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message},
-            ],
-            temperature=0.5,
+        return Completion(system_prompt, user_message, 0.5, "explain_error", {"source_code": extra_source}, context)
+
+    async def explain_error(
+        self,
+        log_content: str,
+        source_code: str | None = None,
+        use_cache: bool = True,
+        sources: dict[str, str] | None = None,
+        source_path: str = "main.tex",
+    ) -> str:
+        return await self.complete(
+            self._explain_error_prompt(log_content, source_code, sources, source_path), use_cache=use_cache
+        )
+
+    def explain_error_stream(
+        self,
+        log_content: str,
+        source_code: str | None = None,
+        use_cache: bool = True,
+        sources: dict[str, str] | None = None,
+        source_path: str = "main.tex",
+    ) -> AsyncIterator[str]:
+        return self.stream(
+            self._explain_error_prompt(log_content, source_code, sources, source_path), use_cache=use_cache
         )
-        return response.choices[0].message.content or ""
 
-    async def generate_tikz(self, description: str) -> str:
+    def _tikz_prompt(self, description: str) -> Completion:
         system_prompt = """You are a TikZ/LaTeX expert. Generate clean, compilable TikZ code based on the user's description.
 
 Rules:
@@ -197,17 +417,15 @@ Rules:
 
 TikZ code:"""
 
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message},
-            ],
-            temperature=0.3,
-        )
-        return response.choices[0].message.content or ""
+        return Completion(system_prompt, user_message, 0.3, "generate_tikz", {}, description)
 
-    async def generate_plot(self, description: str, data: str | None = None) -> str:
+    async def generate_tikz(self, description: str, use_cache: bool = True) -> str:
+        return await self.complete(self._tikz_prompt(description), use_cache=use_cache)
+
+    def generate_tikz_stream(self, description: str, use_cache: bool = True) -> AsyncIterator[str]:
+        return self.stream(self._tikz_prompt(description), use_cache=use_cache)
+
+    def _plot_prompt(self, description: str, data: str | None) -> Completion:
         system_prompt = """You are a Python/Matplotlib expert. Generate Python code to create scientific plots.
 
 Rules:
@@ -231,15 +449,13 @@ Data provided:
 
         user_message += "\nPython code:"
 
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message},
-            ],
-            temperature=0.3,
-        )
-        return response.choices[0].message.content or ""
+        return Completion(system_prompt, user_message, 0.3)
+
+    async def generate_plot(self, description: str, data: str | None = None) -> str:
+        return await self.complete(self._plot_prompt(description, data))
+
+    def generate_plot_stream(self, description: str, data: str | None = None) -> AsyncIterator[str]:
+        return self.stream(self._plot_prompt(description, data))
 
 
 ai_service = AIService()
@@ -0,0 +1,216 @@
+"""
+Persistent cache for deterministic AI operations.
+
+Polish, translate, error explanations and TikZ generation run at low
+temperature and are often re-run on the same text, so their responses are
+stored in the ``ai_cache`` table keyed by a hash of model, operation,
+parameters and the normalized input. Entries expire after
+``Config.AI_CACHE_TTL`` and the least recently used ones are evicted beyond
+``Config.AI_CACHE_MAX_ENTRIES``.
+
+Recently used responses are also kept in memory, so a hit neither touches
+the database nor leaves the event loop. Hit counts and last use times are
+collected in memory and written in one batch by ``flush_hits``: before each
+insert (so eviction sees them), on ``stats`` and periodically by the server.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import bindparam, delete, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from pulse_tex.core.config import Config, get_db
+from pulse_tex.models import AICacheEntry
+
+
+def _now() -> datetime:
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+def normalize_input(text: str) -> str:
+    """Ignore differences a re-selection typically introduces: line endings and surrounding whitespace."""
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def cache_key(model: str, operation: str, params: dict, text: str) -> str:
+    payload = json.dumps(
+        {"model": model, "operation": operation, "params": params, "input": normalize_input(text)},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+MEMORY_ENTRIES = 256
+
+
+class AIResponseCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, tuple[str, datetime]] = OrderedDict()
+        self._hits: dict[str, tuple[int, datetime]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return Config.AI_CACHE_TTL > 0
+
+    def _remember(self, key: str, response: str, created_at: datetime) -> None:
+        with self._lock:
+            self._memory[key] = (response, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > min(MEMORY_ENTRIES, Config.AI_CACHE_MAX_ENTRIES):
+                self._memory.popitem(last=False)
+
+    def _count_hit(self, key: str) -> None:
+        count = self._hits[key][0] if key in self._hits else 0
+        self._hits[key] = (count + 1, _now())
+
+    def cached(self, key: str) -> str | None:
+        """The response held in memory for ``key``, if it has not expired."""
+        cutoff = _now() - timedelta(seconds=Config.AI_CACHE_TTL)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            response, created_at = entry
+            if created_at < cutoff:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self._count_hit(key)
+            return response
+
+    def get(self, key: str) -> str | None:
+        cached = self.cached(key)
+        if cached is not None:
+            return cached
+        cutoff = _now() - timedelta(seconds=Config.AI_CACHE_TTL)
+        with get_db().get_session() as session:
+            row = session.execute(
+                select(AICacheEntry.response, AICacheEntry.created_at).where(
+                    AICacheEntry.key == key, AICacheEntry.created_at >= cutoff
+                )
+            ).first()
+        if row is None:
+            return None
+        self._remember(key, row.response, row.created_at)
+        with self._lock:
+            self._count_hit(key)
+        return row.response
+
+    def flush_hits(self) -> int:
+        """Write the hits counted since the last flush in one statement. Returns the number of entries updated."""
+        with self._lock:
+            hits, self._hits = self._hits, {}
+        if not hits:
+            return 0
+        table = AICacheEntry.__table__
+        stmt = (
+            table.update()
+            .where(table.c.key == bindparam("b_key"))
+            .values(hits=table.c.hits + bindparam("b_hits"), last_used_at=bindparam("b_used"))
+        )
+        params = [{"b_key": key, "b_hits": count, "b_used": used} for key, (count, used) in hits.items()]
+        try:
+            with get_db().get_session() as session:
+                session.execute(stmt, params)
+                session.commit()
+        except Exception:
+            with self._lock:
+                for key, (count, used) in hits.items():
+                    if key in self._hits:
+                        newer, used = self._hits[key]
+                        count += newer
+                    self._hits[key] = (count, used)
+            raise
+        return len(hits)
+
+    def put(self, key: str, operation: str, model: str, response: str) -> None:
+        self.flush_hits()
+        now = _now()
+        cutoff = now - timedelta(seconds=Config.AI_CACHE_TTL)
+        stmt = sqlite_insert(AICacheEntry).values(
+            key=key, operation=operation, model=model, response=response, hits=0, created_at=now, last_used_at=now
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AICacheEntry.key],
+            set_={"response": response, "created_at": now, "last_used_at": now},
+        )
+        keep = (
+            select(AICacheEntry.key)
+            .order_by(AICacheEntry.last_used_at.desc())
+            .limit(Config.AI_CACHE_MAX_ENTRIES)
+            .scalar_subquery()
+        )
+        with get_db().get_session() as session:
+            session.execute(stmt)
+            session.execute(
+                delete(AICacheEntry).where((AICacheEntry.created_at < cutoff) | AICacheEntry.key.not_in(keep))
+            )
+            session.commit()
+        self._remember(key, response, now)
+
+    def clear(self) -> int:
+        with self._lock:
+            self._memory.clear()
+            self._hits.clear()
+        with get_db().get_session() as session:
+            removed = session.execute(delete(AICacheEntry)).rowcount
+            session.commit()
+            return removed
+
+    def stats(self) -> dict:
+        self.flush_hits()
+        with get_db().get_session() as session:
+            entries, hits, size = session.execute(
+                select(
+                    func.count(AICacheEntry.key),
+                    func.coalesce(func.sum(AICacheEntry.hits), 0),
+                    func.coalesce(func.sum(func.length(AICacheEntry.response)), 0),
+                )
+            ).one()
+        return {"enabled": self.enabled, "entries": entries, "hits": hits, "size": size}
+
+    async def lookup(self, model: str, operation: str, params: dict, text: str) -> str | None:
+        key = cache_key(model, operation, params, text)
+        cached = self.cached(key)
+        if cached is not None:
+            return cached
+        return await get_db().run(self.get, key)
+
+    async def store(self, model: str, operation: str, params: dict, text: str, response: str) -> None:
+        await get_db().run(self.put, cache_key(model, operation, params, text), operation, model, response)
+
+    async def fetch(
+        self,
+        model: str,
+        operation: str,
+        params: dict,
+        text: str,
+        compute: Callable[[], Awaitable[str]],
+        use_cache: bool = True,
+    ) -> str:
+        """Return the cached response or compute and store it.
+
+        ``use_cache=False`` skips the lookup but still stores the fresh response, so
+        regenerating replaces the cached answer.
+        """
+        if not self.enabled:
+            return await compute()
+        if use_cache:
+            cached = await self.lookup(model, operation, params, text)
+            if cached is not None:
+                return cached
+        response = await compute()
+        if response:
+            await self.store(model, operation, params, text, response)
+        return response
+
+
+ai_cache = AIResponseCache()
@@ -0,0 +1,106 @@
+"""
+Content-addressed storage for binary project assets (figures, PDFs, ...).
+
+Blobs live under ``PROJECTS_DIR/_blobs/<sha256[:2]>/<sha256[2:]>`` and are shared by
+every project file that references the same digest, so identical uploads are
+stored once. Blobs are read-only and are hardlinked into build directories.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from pathlib import Path
+from typing import BinaryIO
+
+from pulse_tex.core.config import Config
+
+BLOB_DIR_NAME = "_blobs"
+CHUNK_SIZE = 1024 * 1024
+
+TEXT_EXTENSIONS = {
+    ".tex",
+    ".bib",
+    ".sty",
+    ".cls",
+    ".bst",
+    ".bbx",
+    ".cbx",
+    ".def",
+    ".cfg",
+    ".txt",
+    ".md",
+    ".csv",
+    ".dat",
+    ".tikz",
+    ".pgf",
+}
+
+
+def is_text_path(path: str) -> bool:
+    return Path(path).suffix.lower() in TEXT_EXTENSIONS
+
+
+class BlobStore:
+    def __init__(self, root: str | Path | None = None):
+        self._root = Path(root) if root else None
+
+    @property
+    def root(self) -> Path:
+        return self._root or Path(Config.PROJECTS_DIR) / BLOB_DIR_NAME
+
+    def path_for(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest[2:]
+
+    def exists(self, digest: str) -> bool:
+        return self.path_for(digest).exists()
+
+    def save_file(self, fileobj: BinaryIO) -> tuple[str, int]:
+        """Stream a file object into the store. Returns ``(sha256, size)``."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        hasher = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=self.root, prefix=".upload-", delete=False) as tmp:
+            try:
+                while chunk := fileobj.read(CHUNK_SIZE):
+                    hasher.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+            except BaseException:
+                tmp.close()
+                os.unlink(tmp.name)
+                raise
+
+        digest = hasher.hexdigest()
+        target = self.path_for(digest)
+        if target.exists():
+            os.unlink(tmp.name)
+            os.utime(target)
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.chmod(tmp.name, 0o444)
+            os.replace(tmp.name, target)
+        return digest, size
+
+    def save_bytes(self, data: bytes) -> tuple[str, int]:
+        return self.save_file(BytesIO(data))
+
+    def open(self, digest: str) -> BinaryIO:
+        return open(self.path_for(digest), "rb")
+
+    def link_into(self, digest: str, target: Path) -> None:
+        """Materialize a blob at ``target``, hardlinking when possible and copying otherwise.
+
+        Only for throwaway build directories: the link shares the read-only blob's inode.
+        """
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if target.exists():
+            target.unlink()
+        try:
+            os.link(self.path_for(digest), target)
+        except OSError:
+            shutil.copyfile(self.path_for(digest), target)
+
+
+blob_store = BlobStore()
@@ -0,0 +1,180 @@
+"""
+Server-side chat sessions.
+
+Every turn of a session is stored in ``chat_messages``, so a client only sends
+the new question. The prompt carries the session summary plus the most recent
+turns that fit ``Config.AI_HISTORY_TOKENS``. Once the turns not yet summarized
+outgrow that budget, a background task folds the older ones into the summary,
+keeping about half the budget of recent turns verbatim. Replies never wait on
+it: until it finishes, the oldest turns are simply left out of the prompt.
+"""
+
+import asyncio
+from collections.abc import AsyncIterator
+
+from sqlalchemy import delete, func, select, update
+
+from pulse_tex.core.config import Config, get_db
+from pulse_tex.models import ChatMessage, ChatSession
+from pulse_tex.models.base import utcnow
+from pulse_tex.services.ai_assistant import ai_service
+
+MAX_TITLE_CHARS = 60
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class ChatSessionStore:
+    def __init__(self):
+        self._summarizing: dict[str, asyncio.Task] = {}
+
+    def create(self, project_id: str | None = None, title: str = "") -> ChatSession:
+        with get_db().get_session() as session:
+            chat = ChatSession(project_id=project_id, title=title)
+            session.add(chat)
+            session.commit()
+            return chat
+
+    def get(self, session_id: str) -> ChatSession | None:
+        with get_db().get_session() as session:
+            return session.get(ChatSession, session_id)
+
+    def list_sessions(self, project_id: str | None = None, limit: int = 50) -> list[ChatSession]:
+        stmt = select(ChatSession).order_by(ChatSession.updated_at.desc()).limit(limit)
+        if project_id:
+            stmt = stmt.where(ChatSession.project_id == project_id)
+        with get_db().get_session() as session:
+            return list(session.scalars(stmt))
+
+    def messages(self, session_id: str, after: int = 0) -> list[ChatMessage]:
+        with get_db().get_session() as session:
+            return list(
+                session.scalars(
+                    select(ChatMessage)
+                    .where(ChatMessage.session_id == session_id, ChatMessage.id > after)
+                    .order_by(ChatMessage.id)
+                )
+            )
+
+    def delete(self, session_id: str) -> bool:
+        with get_db().get_session() as session:
+            removed = session.execute(delete(ChatSession).where(ChatSession.id == session_id)).rowcount
+            session.execute(delete(ChatMessage).where(ChatMessage.session_id == session_id))
+            session.commit()
+            return bool(removed)
+
+    def append(self, session_id: str, question: str, reply: str) -> None:
+        with get_db().get_session() as session:
+            session.add_all(
+                [
+                    ChatMessage(session_id=session_id, role="user", content=question),
+                    ChatMessage(session_id=session_id, role="assistant", content=reply),
+                ]
+            )
+            title = question.strip().splitlines()[0][:MAX_TITLE_CHARS] if question.strip() else ""
+            session.execute(
+                update(ChatSession)
+                .where(ChatSession.id == session_id)
+                .values(
+                    updated_at=utcnow(),
+                    title=func.coalesce(func.nullif(ChatSession.title, ""), title),
+                )
+            )
+            session.commit()
+
+    def save_summary(self, session_id: str, summary: str, through: int) -> None:
+        with get_db().get_session() as session:
+            session.execute(
+                update(ChatSession)
+                .where(ChatSession.id == session_id, ChatSession.summarized_through < through)
+                .values(summary=summary, summarized_through=through)
+            )
+            session.commit()
+
+    def history(self, session_id: str) -> list[dict] | None:
+        """Prompt messages standing for the conversation so far, or None for an unknown session."""
+        chat = self.get(session_id)
+        if chat is None:
+            return None
+        budget = Config.AI_HISTORY_TOKENS
+        recent: list[dict] = []
+        for message in reversed(self.messages(session_id, after=chat.summarized_through or 0)):
+            budget -= _tokens(message.content)
+            if budget < 0:
+                break
+            recent.append({"role": message.role, "content": message.content})
+        history = []
+        if chat.summary:
+            history.append({"role": "system", "content": f"Summary of the earlier conversation:\n{chat.summary}"})
+        history.extend(reversed(recent))
+        return history
+
+    def pending_turns(self, session_id: str) -> tuple[str, list[ChatMessage]] | None:
+        """The summary and the oldest turns to fold into it, if the turns not yet summarized exceed the budget."""
+        chat = self.get(session_id)
+        if chat is None:
+            return None
+        messages = self.messages(session_id, after=chat.summarized_through or 0)
+        remaining = sum(_tokens(message.content) for message in messages)
+        if remaining <= Config.AI_HISTORY_TOKENS:
+            return None
+        keep = Config.AI_HISTORY_TOKENS // 2
+        older = []
+        for message in messages:
+            # Stop on a question so the turns kept verbatim start with one.
+            if remaining <= keep and message.role == "user":
+                break
+            older.append(message)
+            remaining -= _tokens(message.content)
+        return chat.summary or "", older
+
+    async def _summarize(self, session_id: str) -> None:
+        db = get_db()
+        try:
+            pending = await db.run(self.pending_turns, session_id)
+            if not pending:
+                return
+            summary, older = pending
+            turns = [{"role": message.role, "content": message.content} for message in older]
+            updated = await ai_service.summarize_conversation(summary, turns)
+            if updated:
+                await db.run(self.save_summary, session_id, updated, older[-1].id)
+        except Exception as e:
+            print(f"Warning: failed to summarize chat session {session_id}: {e}")
+
+    def _forget(self, session_id: str, task: asyncio.Task) -> None:
+        if self._summarizing.get(session_id) is task:
+            del self._summarizing[session_id]
+
+    def summarize_later(self, session_id: str) -> asyncio.Task:
+        """Start folding old turns into the summary, unless that is already under way for this session."""
+        task = self._summarizing.get(session_id)
+        if task is None or task.done():
+            task = asyncio.create_task(self._summarize(session_id))
+            self._summarizing[session_id] = task
+            task.add_done_callback(lambda done: self._forget(session_id, done))
+        return task
+
+    async def record(self, session_id: str, question: str, reply: str) -> None:
+        await get_db().run(self.append, session_id, question, reply)
+        self.summarize_later(session_id)
+
+    async def recorded(self, session_id: str, question: str, pieces: AsyncIterator[str]) -> AsyncIterator[str]:
+        """Pass a streamed reply through and record the turn once it is complete."""
+        reply = []
+        async for piece in pieces:
+            reply.append(piece)
+            yield piece
+        await self.record(session_id, question, "".join(reply))
+
+    async def aclose(self) -> None:
+        tasks = list(self._summarizing.values())
+        self._summarizing.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+chat_sessions = ChatSessionStore()
@@ -1,7 +1,8 @@
 import re
-from openai import AsyncOpenAI
+from collections.abc import AsyncIterator, Callable
 
 from pulse_tex.core.config import Config
+from pulse_tex.services.ai_assistant import Completion, ai_service
 
 
 JOURNAL_STYLES = {
@@ -86,21 +87,6 @@ DIAGRAM_TYPES = {
 
 
 class DiagramService:
-    def __init__(self):
-        self._client: AsyncOpenAI | None = None
-
-    @property
-    def client(self) -> AsyncOpenAI:
-        if self._client is None:
-            api_key = Config.AI_API_KEY
-            if not api_key:
-                raise ValueError("AI API key not configured")
-            self._client = AsyncOpenAI(
-                api_key=api_key,
-                base_url=f"{Config.AI_BASE_URL}/v1",
-            )
-        return self._client
-
     @property
     def model(self) -> str:
         return Config.AI_MODEL
@@ -118,14 +104,14 @@ class DiagramService:
     def get_diagram_types(self) -> dict:
         return DIAGRAM_TYPES
 
-    async def refine_sketch(
+    def _refine_prompt(
         self,
         sketch_svg: str,
         description: str,
-        style: str = "nature",
-        context: str | None = None,
-        previous_iterations: list[str] | None = None,
-    ) -> dict:
+        style: str,
+        context: str | None,
+        previous_iterations: list[str] | None,
+    ) -> Completion:
         style_config = JOURNAL_STYLES.get(style, JOURNAL_STYLES["nature"])
 
         system_prompt = f"""You are a scientific illustration expert specializing in creating publication-quality diagrams for top journals like Nature, Science, and IEEE.
@@ -166,31 +152,38 @@ User's description of what they want:
 
 Please create a polished, publication-ready version of this diagram."""
 
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message},
-            ],
-            temperature=0.3,
-        )
-
-        refined_svg = response.choices[0].message.content or ""
-        refined_svg = self._extract_svg(refined_svg)
+        return Completion(system_prompt, user_message, 0.3)
 
+    def _refine_result(self, content: str, style: str) -> dict:
         return {
-            "refined_svg": refined_svg,
+            "refined_svg": self._extract_svg(content),
             "style": style,
-            "style_name": style_config["name"],
+            "style_name": JOURNAL_STYLES.get(style, JOURNAL_STYLES["nature"])["name"],
         }
 
-    async def generate_from_text(
+    async def refine_sketch(
         self,
+        sketch_svg: str,
         description: str,
         style: str = "nature",
-        diagram_type: str = "flowchart",
         context: str | None = None,
+        previous_iterations: list[str] | None = None,
     ) -> dict:
+        prompt = self._refine_prompt(sketch_svg, description, style, context, previous_iterations)
+        return self._refine_result(await ai_service.complete(prompt), style)
+
+    def refine_sketch_stream(
+        self,
+        sketch_svg: str,
+        description: str,
+        style: str = "nature",
+        context: str | None = None,
+        previous_iterations: list[str] | None = None,
+    ) -> AsyncIterator[dict]:
+        prompt = self._refine_prompt(sketch_svg, description, style, context, previous_iterations)
+        return self._stream(prompt, lambda content: self._refine_result(content, style))
+
+    def _generate_prompt(self, description: str, style: str, diagram_type: str, context: str | None) -> Completion:
         style_config = JOURNAL_STYLES.get(style, JOURNAL_STYLES["nature"])
         diagram_desc = DIAGRAM_TYPES.get(diagram_type, DIAGRAM_TYPES["flowchart"])
 
@@ -224,31 +217,37 @@ Output: Return ONLY the SVG code, no explanations."""
 
 Generate a clean, publication-ready SVG diagram."""
 
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message},
-            ],
-            temperature=0.4,
-        )
-
-        svg = response.choices[0].message.content or ""
-        svg = self._extract_svg(svg)
+        return Completion(system_prompt, user_message, 0.4)
 
+    def _generate_result(self, content: str, style: str, diagram_type: str) -> dict:
         return {
-            "svg": svg,
+            "svg": self._extract_svg(content),
             "style": style,
-            "style_name": style_config["name"],
+            "style_name": JOURNAL_STYLES.get(style, JOURNAL_STYLES["nature"])["name"],
             "diagram_type": diagram_type,
         }
 
-    async def iterate_design(
+    async def generate_from_text(
         self,
-        current_svg: str,
-        feedback: str,
+        description: str,
         style: str = "nature",
+        diagram_type: str = "flowchart",
+        context: str | None = None,
     ) -> dict:
+        prompt = self._generate_prompt(description, style, diagram_type, context)
+        return self._generate_result(await ai_service.complete(prompt), style, diagram_type)
+
+    def generate_from_text_stream(
+        self,
+        description: str,
+        style: str = "nature",
+        diagram_type: str = "flowchart",
+        context: str | None = None,
+    ) -> AsyncIterator[dict]:
+        prompt = self._generate_prompt(description, style, diagram_type, context)
+        return self._stream(prompt, lambda content: self._generate_result(content, style, diagram_type))
+
+    def _iterate_prompt(self, current_svg: str, feedback: str, style: str) -> Completion:
         style_config = JOURNAL_STYLES.get(style, JOURNAL_STYLES["nature"])
 
         system_prompt = f"""You are a scientific illustration expert. The user wants to modify their existing diagram.
@@ -270,25 +269,29 @@ User's modification request:
 
 Please modify the diagram accordingly and return the updated SVG."""
 
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message},
-            ],
-            temperature=0.3,
-        )
-
-        svg = response.choices[0].message.content or ""
-        svg = self._extract_svg(svg)
+        return Completion(system_prompt, user_message, 0.3)
 
+    def _iterate_result(self, content: str, feedback: str, style: str) -> dict:
         return {
-            "svg": svg,
+            "svg": self._extract_svg(content),
             "style": style,
             "feedback_addressed": feedback,
         }
 
-    async def svg_to_tikz(self, svg: str, description: str | None = None) -> str:
+    async def iterate_design(
+        self,
+        current_svg: str,
+        feedback: str,
+        style: str = "nature",
+    ) -> dict:
+        prompt = self._iterate_prompt(current_svg, feedback, style)
+        return self._iterate_result(await ai_service.complete(prompt), feedback, style)
+
+    def iterate_design_stream(self, current_svg: str, feedback: str, style: str = "nature") -> AsyncIterator[dict]:
+        prompt = self._iterate_prompt(current_svg, feedback, style)
+        return self._stream(prompt, lambda content: self._iterate_result(content, feedback, style))
+
+    def _tikz_prompt(self, svg: str, description: str | None) -> Completion:
         system_prompt = """You are a LaTeX/TikZ expert. Convert the given SVG diagram to clean, compilable TikZ code.
 
 Requirements:
@@ -309,19 +312,21 @@ Requirements:
 
 TikZ code:"""
 
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message},
-            ],
-            temperature=0.3,
-        )
-
-        tikz = response.choices[0].message.content or ""
-        tikz = self._extract_tikz(tikz)
+        return Completion(system_prompt, user_message, 0.3)
 
-        return tikz
+    async def svg_to_tikz(self, svg: str, description: str | None = None) -> str:
+        return self._extract_tikz(await ai_service.complete(self._tikz_prompt(svg, description)))
+
+    def svg_to_tikz_stream(self, svg: str, description: str | None = None) -> AsyncIterator[dict]:
+        return self._stream(self._tikz_prompt(svg, description), lambda content: {"tikz": self._extract_tikz(content)})
+
+    async def _stream(self, prompt: Completion, finish: Callable[[str], dict]) -> AsyncIterator[dict]:
+        """Stream ``content`` events from ``AIService.stream``, then a ``result`` event with the final output."""
+        parts = []
+        async for chunk in ai_service.stream(prompt):
+            parts.append(chunk)
+            yield {"content": chunk}
+        yield {"result": finish("".join(parts))}
 
     def _extract_svg(self, content: str) -> str:
         svg_match = re.search(r"<svg[^>]*>.*?</svg>", content, re.DOTALL | re.IGNORECASE)
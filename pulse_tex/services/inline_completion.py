@@ -0,0 +1,168 @@
+"""
+Inline (ghost text) completion for the editor.
+
+Built for keystroke latency rather than long answers:
+
+- the prompt is a window of text around the cursor and the answer is capped at
+  ``Config.AI_COMPLETION_MAX_TOKENS``, with no retries;
+- requests are debounced per editor session: each one waits
+  ``Config.AI_COMPLETION_DEBOUNCE_MS`` before calling the provider, and a newer
+  request from the same session cancels it, whether still waiting or in flight.
+  Requests without a session are sent straight away and never cancelled;
+- answers are cached by prefix, and typing the first characters of a suggestion
+  is served from that suggestion without another call;
+- latencies are sampled to report p50/p95.
+"""
+
+import asyncio
+import time
+from collections import Counter, OrderedDict, deque
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from pulse_tex.core.config import Config
+from pulse_tex.services.ai_assistant import ai_service
+
+PREFIX_CHARS = 1500
+SUFFIX_CHARS = 300
+MAX_TYPE_AHEAD = 32
+CACHE_ENTRIES = 512
+LATENCY_SAMPLES = 500
+CURSOR = "<CURSOR>"
+
+
+@dataclass
+class InlineCompletion:
+    text: str
+    source: str
+    latency_ms: float
+
+
+def clean_completion(text: str, prefix: str) -> str:
+    """Undo what models add around a continuation despite the prompt: code fences and an echo of the line."""
+    stripped = text.strip()
+    if stripped.startswith("```"):
+        lines = stripped.splitlines()[1:]
+        if lines and lines[-1].strip().startswith("```"):
+            lines.pop()
+        text = "\n".join(lines)
+    text = text.split(CURSOR, 1)[-1]
+    line = prefix.rsplit("\n", 1)[-1]
+    if line.strip() and text.startswith(line):
+        text = text[len(line) :]
+    return text.rstrip()
+
+
+def percentiles(samples: Iterable[float]) -> dict:
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50": None, "p95": None}
+
+    def at(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+    return {"p50": at(0.5), "p95": at(0.95)}
+
+
+class InlineCompleter:
+    def __init__(self) -> None:
+        self._cache: OrderedDict[tuple[str, str, str], str] = OrderedDict()
+        self._pending: dict[str, asyncio.Task] = {}
+        self._latency: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._upstream_latency: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._counts: Counter[str] = Counter()
+
+    def _store(self, prefix: str, suffix: str, text: str) -> None:
+        key = (ai_service.model, prefix[-PREFIX_CHARS:], suffix)
+        self._cache[key] = text
+        self._cache.move_to_end(key)
+        while len(self._cache) > CACHE_ENTRIES:
+            self._cache.popitem(last=False)
+
+    def _lookup(self, prefix: str, suffix: str) -> str | None:
+        """The cached answer for this prefix, or the rest of one for a shorter prefix the author typed into."""
+        model = ai_service.model
+        for typed in range(min(MAX_TYPE_AHEAD, len(prefix)) + 1):
+            head = prefix[: len(prefix) - typed]
+            text = self._cache.get((model, head[-PREFIX_CHARS:], suffix))
+            if text is None:
+                continue
+            if typed == 0:
+                return text
+            if len(text) > typed and text.startswith(prefix[-typed:]):
+                return text[typed:]
+        return None
+
+    def _finish(self, text: str, source: str, started: float) -> InlineCompletion:
+        latency = (time.perf_counter() - started) * 1000
+        if source != "superseded":
+            self._latency.append(latency)
+        self._counts[source] += 1
+        return InlineCompletion(text, source, round(latency, 1))
+
+    async def _fetch(self, prefix: str, suffix: str, debounce: bool = True) -> str:
+        if debounce:
+            await asyncio.sleep(Config.AI_COMPLETION_DEBOUNCE_MS / 1000)
+        started = time.perf_counter()
+        text = await ai_service.complete_inline(prefix[-PREFIX_CHARS:], suffix)
+        self._upstream_latency.append((time.perf_counter() - started) * 1000)
+        text = clean_completion(text, prefix)
+        self._store(prefix, suffix, text)
+        return text
+
+    def _supersede(self, session_id: str | None) -> None:
+        if session_id is None:
+            return
+        task = self._pending.pop(session_id, None)
+        if task is not None:
+            task.cancel()
+
+    async def complete(
+        self, session_id: str | None, prefix: str, suffix: str = "", use_cache: bool = True
+    ) -> InlineCompletion:
+        """Continuation for the cursor between ``prefix`` and ``suffix``.
+
+        A request overtaken by a newer one from the same ``session_id`` returns an empty
+        completion with source ``superseded``. With ``session_id=None`` there is no debounce
+        and no superseding.
+        """
+        started = time.perf_counter()
+        prefix, suffix = prefix[-(PREFIX_CHARS + MAX_TYPE_AHEAD) :], suffix[:SUFFIX_CHARS]
+        self._supersede(session_id)
+        if use_cache:
+            cached = self._lookup(prefix, suffix)
+            if cached is not None:
+                return self._finish(cached, "cache", started)
+
+        task = asyncio.create_task(self._fetch(prefix, suffix, debounce=session_id is not None))
+        if session_id is not None:
+            self._pending[session_id] = task
+        try:
+            text = await task
+        except asyncio.CancelledError:
+            current = asyncio.current_task()
+            if current is None or current.cancelling():
+                task.cancel()
+                raise
+            return self._finish("", "superseded", started)
+        except Exception:
+            self._counts["error"] += 1
+            raise
+        finally:
+            if session_id is not None and self._pending.get(session_id) is task:
+                del self._pending[session_id]
+        return self._finish(text, "upstream", started)
+
+    def stats(self) -> dict:
+        return {
+            "requests": sum(self._counts.values()),
+            "cache_hits": self._counts["cache"],
+            "superseded": self._counts["superseded"],
+            "errors": self._counts["error"],
+            "cache_entries": len(self._cache),
+            "latency_ms": percentiles(self._latency),
+            "upstream_latency_ms": percentiles(self._upstream_latency),
+        }
+
+
+inline_completer = InlineCompleter()
@@ -0,0 +1,146 @@
+"""
+Shared OpenAI-compatible clients.
+
+Every AI feature (assistant, diagrams, the connection test) takes its client
+from ``llm_clients``, keyed by base URL and API key. Looking the client up on
+each call means a key or URL changed through ``/api/config`` takes effect on
+the next request, while requests with the same settings reuse one keep-alive
+connection pool.
+"""
+
+import asyncio
+from collections import Counter, OrderedDict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from pulse_tex.core.config import Config
+
+MAX_CLIENTS = 4
+MAX_RETIRED = 16
+KEEPALIVE_EXPIRY = 60.0
+CONNECT_TIMEOUT = 10.0
+READ_TIMEOUT = 300.0
+
+
+def normalize_base_url(base_url: str) -> str:
+    if not base_url.endswith("/v1"):
+        base_url = f"{base_url.rstrip('/')}/v1"
+    return base_url
+
+
+async def _close_quietly(client: AsyncOpenAI) -> None:
+    try:
+        await client.close()
+    except Exception as e:
+        print(f"Warning: failed to close AI client: {e}")
+
+
+class LLMClientRegistry:
+    def __init__(self):
+        self._clients: OrderedDict[tuple[str, str], AsyncOpenAI] = OrderedDict()
+        self._retired: list[AsyncOpenAI] = []
+        self._in_use: Counter[int] = Counter()
+        self._closing: set[asyncio.Task] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _http_client(self) -> httpx.AsyncClient:
+        concurrency = Config.AI_UPSTREAM_CONCURRENCY
+        return DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=concurrency + 2,
+                max_keepalive_connections=concurrency,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+
+    def _close_soon(self, client: AsyncOpenAI) -> None:
+        task = asyncio.get_running_loop().create_task(_close_quietly(client))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    def _retire(self, client: AsyncOpenAI) -> None:
+        """Close a client pushed out by newer settings, or once its in-flight requests are done."""
+        if not self._in_use[id(client)]:
+            self._close_soon(client)
+            return
+        self._retired.append(client)
+        # Bound what settings churn (e.g. repeated connection tests) can keep open: past the
+        # cap the oldest retired client is closed even though a request still holds it.
+        while len(self._retired) > MAX_RETIRED:
+            self._close_soon(self._retired.pop(0))
+
+    def _switch_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        old_loop, clients = self._loop, [*self._clients.values(), *self._retired]
+        self._clients.clear()
+        self._retired.clear()
+        self._in_use.clear()
+        self._closing.clear()
+        self._loop = loop
+        for client in clients:
+            if old_loop is not None and old_loop.is_running():
+                asyncio.run_coroutine_threadsafe(_close_quietly(client), old_loop)
+            else:
+                self._close_soon(client)
+
+    def get(self, base_url: str, api_key: str) -> AsyncOpenAI:
+        """The client for these settings, created on first use.
+
+        Clients pushed out by newer settings are retired: closed right away if idle, otherwise
+        when the last request holding them through ``using`` ends. Connection pools belong to
+        the event loop that opened them, so a new loop closes the old clients and starts afresh.
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._switch_loop(loop)
+
+        key = (normalize_base_url(base_url), api_key)
+        client = self._clients.get(key)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=key[0],
+                max_retries=0,
+                timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+                http_client=self._http_client(),
+            )
+            self._clients[key] = client
+            while len(self._clients) > MAX_CLIENTS:
+                self._retire(self._clients.popitem(last=False)[1])
+        else:
+            self._clients.move_to_end(key)
+        return client
+
+    @asynccontextmanager
+    async def using(self, client: AsyncOpenAI) -> AsyncIterator[AsyncOpenAI]:
+        """Hold ``client`` for a request, so retiring it waits until the block is left."""
+        key = id(client)
+        self._in_use[key] += 1
+        try:
+            yield client
+        finally:
+            self._in_use[key] -= 1
+            if self._in_use[key] <= 0:
+                del self._in_use[key]
+                retired = [c for c in self._retired if c is not client]
+                if len(retired) < len(self._retired):
+                    self._retired = retired
+                    self._close_soon(client)
+
+    async def aclose(self) -> None:
+        clients = [*self._clients.values(), *self._retired]
+        closing = list(self._closing)
+        self._clients.clear()
+        self._retired.clear()
+        self._in_use.clear()
+        for client in clients:
+            await client.close()
+        await asyncio.gather(*closing, return_exceptions=True)
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+
+llm_clients = LLMClientRegistry()
@@ -0,0 +1,141 @@
+"""
+Admission control for upstream LLM requests.
+
+Every completion goes through an ``AdmissionController`` that bounds requests
+in flight and enforces requests-per-minute and tokens-per-minute budgets with
+token buckets. Callers are admitted strictly in arrival order and give up after
+a queue timeout. Failed calls with 429/5xx are retried with exponential backoff
+and full jitter, re-entering the queue each time.
+"""
+
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+import openai
+
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 20.0
+
+
+class AIBusyError(Exception):
+    """Raised when a request waited longer than the queue timeout to be admitted."""
+
+
+class TokenBucket:
+    def __init__(self, per_minute: int):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = float(per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: int) -> float:
+        """Seconds until ``amount`` can be taken; requests larger than the bucket only wait for a full one."""
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def consume(self, amount: int) -> None:
+        """Take ``amount``; negative amounts give tokens back. The balance may go into debt."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrency: int,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        queue_timeout: float = 60.0,
+    ):
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._turnstile = asyncio.Lock()
+        self._requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+
+    def _budget_wait(self, tokens: int) -> float:
+        waits = [0.0]
+        if self._requests:
+            waits.append(self._requests.wait_time(1))
+        if self._tokens:
+            waits.append(self._tokens.wait_time(tokens))
+        return max(waits)
+
+    async def _admit(self, tokens: int) -> None:
+        # The turnstile is a FIFO lock: only the head of the queue competes for a slot and budget.
+        async with self._turnstile:
+            await self._slots.acquire()
+            try:
+                while (delay := self._budget_wait(tokens)) > 0:
+                    await asyncio.sleep(delay)
+            except BaseException:
+                self._slots.release()
+                raise
+            if self._requests:
+                self._requests.consume(1)
+            if self._tokens:
+                self._tokens.consume(tokens)
+
+    @asynccontextmanager
+    async def admit(self, tokens: int):
+        """Hold a concurrency slot for the body, after paying ``tokens`` (an estimate) from the budgets."""
+        self.waiting += 1
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await self._admit(tokens)
+        except TimeoutError:
+            raise AIBusyError(f"AI service is busy: not admitted within {self.queue_timeout:g}s") from None
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """Correct the token budget once the real usage of an admitted request is known."""
+        if self._tokens and actual:
+            self._tokens.consume(actual - estimated)
+
+    def stats(self) -> dict:
+        return {"in_flight": self.in_flight, "waiting": self.waiting}
+
+
+def estimate_tokens(messages: list[dict], max_tokens: int | None = None) -> int:
+    """Rough prompt-plus-completion size: about four characters per token.
+
+    The completion is assumed to be as long as the prompt unless ``max_tokens`` caps it.
+    """
+    prompt = max(1, sum(len(m.get("content") or "") for m in messages) // 4)
+    return prompt + (prompt if max_tokens is None else max_tokens)
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, (openai.APIConnectionError, httpx.TransportError))
+
+
+def retry_delay(error: Exception, attempt: int) -> float:
+    """Full-jitter exponential backoff, never shorter than a Retry-After the provider sent."""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt))
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            delay = max(delay, float(response.headers.get("retry-after", 0)))
+        except ValueError:
+            pass
+    return min(delay, BACKOFF_CAP)
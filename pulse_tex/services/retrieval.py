@@ -0,0 +1,229 @@
+"""
+Per-project retrieval of passages relevant to an AI chat question.
+
+Project sources are split into passages: paragraphs of ``.tex`` files, one
+passage per ``\\label`` (with the heading or caption it belongs to) and one per
+``.bib`` entry. Passages are ranked with BM25 over an in-memory inverted index
+kept per project. Before each query the index compares the ``updated_at`` of the
+project's files with what it indexed and re-reads only the files that changed,
+so saving a file costs nothing until the next question and then one file's worth
+of work.
+"""
+
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+
+from pulse_tex.core.config import Config
+from pulse_tex.utils.latex_chunks import split_paragraphs
+
+MAX_PROJECTS = 16
+MAX_PASSAGE_CHARS = 1500
+MAX_BIB_CHARS = 600
+INDEXED_SUFFIXES = (".tex", ".bib", ".sty", ".cls", ".ltx")
+
+_WORD = re.compile(r"[a-z0-9]+|[\u3400-\u9fff]+")
+_LABEL = re.compile(r"\\label\{([^}]+)\}")
+_BIB_ENTRY = re.compile(r"^[ \t]*@", re.MULTILINE)
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in is it of on or that the this to we with was were which "
+    "begin end item textbf textit emph cite ref label".split()
+)
+
+
+@dataclass
+class Passage:
+    path: str
+    line: int
+    kind: str
+    text: str
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase words without stopwords; runs of CJK characters become overlapping bigrams."""
+    tokens = []
+    for word in _WORD.findall(text.lower()):
+        if word[0] >= "\u3400":
+            tokens.extend(word[i : i + 2] for i in range(max(1, len(word) - 1)))
+        elif len(word) > 1 and word not in STOPWORDS:
+            tokens.append(word)
+    return tokens
+
+
+def _split_long(text: str) -> list[str]:
+    """Cut a paragraph longer than ``MAX_PASSAGE_CHARS`` at line breaks."""
+    if len(text) <= MAX_PASSAGE_CHARS:
+        return [text]
+    pieces, current = [], ""
+    for line in text.splitlines(keepends=True):
+        if current and len(current) + len(line) > MAX_PASSAGE_CHARS:
+            pieces.append(current)
+            current = ""
+        current += line[:MAX_PASSAGE_CHARS]
+    return [*pieces, current] if current else pieces
+
+
+def _tex_passages(path: str, content: str) -> list[Passage]:
+    passages = []
+    line = 1
+    for paragraph in split_paragraphs(content):
+        offset = line
+        for piece in _split_long(paragraph):
+            body = piece.lstrip()
+            if body:
+                leading = piece[: len(piece) - len(body)].count("\n")
+                passages.append(Passage(path, offset + leading, "text", body.rstrip()))
+            offset += piece.count("\n")
+        line += paragraph.count("\n")
+
+    lines = content.splitlines()
+    for number, text in enumerate(lines, 1):
+        for key in _LABEL.findall(text):
+            owner = text.strip()
+            if owner == f"\\label{{{key}}}" and number > 1:
+                # A label on its own line belongs to the heading or caption above it.
+                owner = f"{lines[number - 2].strip()} {owner}"
+            passages.append(Passage(path, number, "label", f"{key}: {owner}"))
+    return passages
+
+
+def _bib_passages(path: str, content: str) -> list[Passage]:
+    passages = []
+    starts = [m.start() for m in _BIB_ENTRY.finditer(content)]
+    for start, end in zip(starts, [*starts[1:], len(content)]):
+        entry = content[start:end].strip()
+        if entry:
+            line = content.count("\n", 0, start) + 1
+            passages.append(Passage(path, line, "bib", entry[:MAX_BIB_CHARS]))
+    return passages
+
+
+def split_passages(path: str, content: str) -> list[Passage]:
+    if path.endswith(".bib"):
+        return _bib_passages(path, content)
+    return _tex_passages(path, content)
+
+
+class BM25Index:
+    """Inverted index over passages, updatable one file at a time."""
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.versions: dict[str, datetime | None] = {}
+        self._file_docs: dict[str, list[int]] = {}
+        self._passages: dict[int, Passage] = {}
+        self._lengths: dict[int, int] = {}
+        self._postings: dict[str, dict[int, int]] = {}
+        self._total_length = 0
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._passages)
+
+    def remove_file(self, path: str) -> None:
+        for doc in self._file_docs.pop(path, []):
+            passage = self._passages.pop(doc)
+            self._total_length -= self._lengths.pop(doc)
+            for term in set(tokenize(passage.text)):
+                postings = self._postings[term]
+                del postings[doc]
+                if not postings:
+                    del self._postings[term]
+        self.versions.pop(path, None)
+
+    def add_file(self, path: str, content: str, version: datetime | None = None) -> None:
+        self.remove_file(path)
+        docs = []
+        for passage in split_passages(path, content):
+            tokens = tokenize(passage.text)
+            if not tokens:
+                continue
+            doc = self._next_id
+            self._next_id += 1
+            self._passages[doc] = passage
+            self._lengths[doc] = len(tokens)
+            self._total_length += len(tokens)
+            for term, count in Counter(tokens).items():
+                self._postings.setdefault(term, {})[doc] = count
+            docs.append(doc)
+        self._file_docs[path] = docs
+        self.versions[path] = version
+
+    def search(self, query: str, k: int = 8) -> list[tuple[float, Passage]]:
+        if not self._passages:
+            return []
+        n = len(self._passages)
+        average = self._total_length / n
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, tf in postings.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self._lengths[doc] / average)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / norm
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(score, self._passages[doc]) for doc, score in best]
+
+
+def _indexed(path: str) -> bool:
+    return path.endswith(INDEXED_SUFFIXES)
+
+
+class ProjectRetrieval:
+    """BM25 indexes of the most recently queried projects."""
+
+    def __init__(self):
+        self._indexes: OrderedDict[str, BM25Index] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _index(self, project_id: str) -> BM25Index:
+        with self._lock:
+            index = self._indexes.pop(project_id, None)
+            self._indexes[project_id] = index = index if index is not None else BM25Index()
+            while len(self._indexes) > MAX_PROJECTS:
+                self._indexes.popitem(last=False)
+            return index
+
+    @staticmethod
+    def _refresh(db, project_id: str, index: BM25Index) -> None:
+        versions = {p: v for p, v in db.text_file_versions(project_id).items() if _indexed(p)}
+        for path in set(index.versions) - set(versions):
+            index.remove_file(path)
+        changed = [p for p, v in versions.items() if p not in index.versions or index.versions[p] != v]
+        if changed:
+            for path, content in db.read_text_files(project_id, changed).items():
+                index.add_file(path, content, versions[path])
+
+    def search(self, db, project_id: str, query: str, k: int = 8) -> list[tuple[float, Passage]]:
+        """Best ``k`` passages for ``query``, after re-indexing the files changed since the last query."""
+        index = self._index(project_id)
+        with index.lock:
+            self._refresh(db, project_id, index)
+            return index.search(query, k)
+
+    def context(self, db, project_id: str, query: str, max_tokens: int | None = None) -> str:
+        """The most relevant passages for ``query``, best first, within about ``max_tokens`` tokens."""
+        budget = (max_tokens or Config.AI_CONTEXT_TOKENS) * 4
+        parts = []
+        for _, passage in self.search(db, project_id, query, k=32):
+            part = f"[{passage.path}:{passage.line}]\n{passage.text}"
+            if len(part) > budget:
+                continue
+            parts.append(part)
+            budget -= len(part) + 2
+        return "\n\n".join(parts)
+
+    def drop(self, project_id: str) -> None:
+        with self._lock:
+            self._indexes.pop(project_id, None)
+
+
+project_retrieval = ProjectRetrieval()
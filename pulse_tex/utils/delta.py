@@ -0,0 +1,35 @@
+"""
+Line-based deltas used for compact file revision history.
+
+A delta rebuilds a *target* text from a *base* text. It is stored as a JSON list
+whose items are either ``[start, end]`` (copy base lines ``start:end``) or a
+string (insert literal text).
+"""
+
+import json
+from difflib import SequenceMatcher
+
+
+def make_delta(base: str, target: str) -> str:
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+
+    ops: list[list[int] | str] = []
+    matcher = SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(target_lines[j1:j2]))
+    return json.dumps(ops, ensure_ascii=False, separators=(",", ":"))
+
+
+def apply_delta(base: str, delta: str) -> str:
+    base_lines = base.splitlines(keepends=True)
+    parts = []
+    for op in json.loads(delta):
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            parts.extend(base_lines[op[0] : op[1]])
+    return "".join(parts)
@@ -0,0 +1,106 @@
+"""
+Split LaTeX source into chunks that can be processed independently.
+
+Chunks end at paragraph boundaries (blank lines) that are outside display math,
+math/float/verbatim environments and unbalanced braces, so no chunk cuts an
+equation, a table or a command argument in half. Splitting is lossless:
+``"".join(split_latex(text)) == text``.
+"""
+
+import re
+
+ATOMIC_ENVIRONMENTS = {
+    "equation",
+    "align",
+    "alignat",
+    "gather",
+    "multline",
+    "flalign",
+    "eqnarray",
+    "math",
+    "displaymath",
+    "split",
+    "cases",
+    "array",
+    "matrix",
+    "pmatrix",
+    "bmatrix",
+    "figure",
+    "table",
+    "tabular",
+    "tabularx",
+    "tikzpicture",
+    "algorithm",
+    "algorithmic",
+    "verbatim",
+    "lstlisting",
+    "minted",
+}
+
+_ENVIRONMENT = re.compile(r"\\(begin|end)\{([A-Za-z]+)\*?\}")
+_COMMENT = re.compile(r"(?<!\\)%.*")
+_BRACE = re.compile(r"(?<!\\)[{}]")
+
+
+class _ParagraphScanner:
+    """Tracks whether the text seen so far may end a paragraph."""
+
+    def __init__(self):
+        self.environments = 0
+        self.display_math = 0
+        self.double_dollars = 0
+        self.braces = 0
+
+    def feed(self, line: str) -> None:
+        code = _COMMENT.sub("", line)
+        for kind, name in _ENVIRONMENT.findall(code):
+            if name in ATOMIC_ENVIRONMENTS:
+                self.environments += 1 if kind == "begin" else -1
+        self.display_math += code.count("\\[") - code.count("\\]")
+        self.double_dollars += code.count("$$")
+        for brace in _BRACE.findall(code):
+            self.braces += 1 if brace == "{" else -1
+
+    @property
+    def at_boundary(self) -> bool:
+        return self.environments <= 0 and self.display_math <= 0 and self.double_dollars % 2 == 0 and self.braces <= 0
+
+
+def split_paragraphs(text: str) -> list[str]:
+    """Split into paragraphs, each keeping its trailing blank lines."""
+    paragraphs: list[str] = []
+    current: list[str] = []
+    scanner = _ParagraphScanner()
+    for line in text.splitlines(keepends=True):
+        blank = not line.strip()
+        if not blank and current and not current[-1].strip() and scanner.at_boundary:
+            paragraphs.append("".join(current))
+            current = []
+        current.append(line)
+        scanner.feed(line)
+    if current:
+        paragraphs.append("".join(current))
+    return paragraphs
+
+
+def split_latex(text: str, max_chars: int = 3000) -> list[str]:
+    """Group paragraphs into chunks of at most ``max_chars``; a longer paragraph becomes a chunk of its own."""
+    chunks: list[str] = []
+    current = ""
+    for paragraph in split_paragraphs(text):
+        if current and len(current) + len(paragraph) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_whitespace(chunk: str) -> tuple[str, str, str]:
+    """Return ``(leading, body, trailing)`` so a rewritten body can be put back with the original spacing."""
+    body = chunk.strip()
+    if not body:
+        return chunk, "", ""
+    start = chunk.index(body)
+    return chunk[:start], body, chunk[start + len(body) :]
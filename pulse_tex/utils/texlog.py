@@ -0,0 +1,156 @@
+"""
+Extract the useful part of a TeX compilation log.
+
+A log is mostly package loading noise; what explains a failure is the ``!``
+error block, its ``l.<n>`` line reference and the file that was being read,
+which TeX only reports through the ``(file ... )`` nesting of the log. This
+module recovers those, plus errors in ``file:line: message`` form (tectonic,
+``-file-line-error``) and biber ``ERROR`` lines, so that a prompt can carry a
+few hundred characters of context instead of the head of the log.
+"""
+
+import re
+from dataclasses import dataclass
+
+MAX_PRINT_LINE = 79
+MAX_BLOCK_LINES = 12
+TAIL_LINES = 40
+
+_FILE_LINE_ERROR = re.compile(r"^(?:error: )?(\S+?\.(?:tex|ltx|sty|cls|bib|bbl|dtx)):(\d+): (.+)$")
+_LINE_REFERENCE = re.compile(r"^l\.(\d+)")
+_PAREN = re.compile(r"\(([^()\s]*)|\)")
+_FILE_NAME = re.compile(r"^\"?(\.{0,2}/)?[\w./~-]*\.\w+\"?$")
+
+
+@dataclass
+class LogError:
+    message: str
+    file: str | None = None
+    line: int | None = None
+    block: str = ""
+
+
+def _unwrap(log: str) -> list[str]:
+    """Rejoin lines TeX broke at ``max_print_line``, which would otherwise split file names."""
+    lines: list[str] = []
+    joining = False
+    for line in log.splitlines():
+        if joining:
+            lines[-1] += line
+        else:
+            lines.append(line)
+        joining = len(line) == MAX_PRINT_LINE
+    return lines
+
+
+def _clean_path(name: str) -> str:
+    name = name.strip('"')
+    return name[2:] if name.startswith("./") else name
+
+
+class _FileStack:
+    """Follows ``(file`` and ``)`` in the log to know which file TeX was reading."""
+
+    def __init__(self):
+        self._stack: list[str | None] = []
+
+    def feed(self, line: str) -> None:
+        for match in _PAREN.finditer(line):
+            if match.group(0) == ")":
+                if self._stack:
+                    self._stack.pop()
+            else:
+                name = match.group(1)
+                self._stack.append(_clean_path(name) if name and _FILE_NAME.match(name) else None)
+
+    @property
+    def current(self) -> str | None:
+        return next((name for name in reversed(self._stack) if name), None)
+
+
+def analyze_log(log: str, max_errors: int = 3) -> list[LogError]:
+    """The first ``max_errors`` distinct errors of the log, in order."""
+    lines = _unwrap(log)
+    files = _FileStack()
+    errors: list[LogError] = []
+    seen: set[tuple] = set()
+
+    def add(error: LogError) -> None:
+        key = (error.message, error.file, error.line)
+        if key not in seen:
+            seen.add(key)
+            errors.append(error)
+
+    i = 0
+    while i < len(lines) and len(errors) < max_errors:
+        line = lines[i]
+        if line.startswith("! "):
+            block = [line]
+            number = None
+            j = i + 1
+            while j < len(lines) and len(block) < MAX_BLOCK_LINES:
+                block.append(lines[j])
+                if match := _LINE_REFERENCE.match(lines[j]):
+                    number = int(match.group(1))
+                    if j + 1 < len(lines) and lines[j + 1].startswith(" "):
+                        j += 1
+                        block.append(lines[j])
+                    break
+                if lines[j].startswith("! "):
+                    block.pop()
+                    j -= 1
+                    break
+                j += 1
+            add(LogError(line[2:].strip(), files.current, number, "\n".join(block)))
+            i = j + 1
+            continue
+        if match := _FILE_LINE_ERROR.match(line):
+            add(LogError(match.group(3).strip(), _clean_path(match.group(1)), int(match.group(2)), line))
+        elif line.startswith("ERROR - "):
+            add(LogError(line[8:].strip(), block=line))
+        else:
+            files.feed(line)
+        i += 1
+    return errors
+
+
+def source_window(source: str, line: int, radius: int = 5) -> str:
+    """Numbered source lines around ``line``, which is marked with ``>>``."""
+    lines = source.splitlines()
+    if not 1 <= line <= len(lines):
+        return ""
+    start, end = max(1, line - radius), min(len(lines), line + radius)
+    width = len(str(end))
+    return "\n".join(f"{'>>' if n == line else '  '} {n:>{width}} | {lines[n - 1]}" for n in range(start, end + 1))
+
+
+def error_context(log: str, sources: dict[str, str] | None = None, max_errors: int = 3) -> str:
+    """Compact description of the errors in ``log`` with the source around each of them.
+
+    ``sources`` maps file paths as they appear in the log to their content; errors in
+    other files are described without source. A log without recognizable errors is
+    reduced to its last lines, where a failing run stops.
+    """
+    sources = sources or {}
+    errors = analyze_log(log, max_errors)
+    if not errors:
+        return "\n".join(_unwrap(log)[-TAIL_LINES:]).strip()
+
+    parts = []
+    for n, error in enumerate(errors, 1):
+        where = error.file or "unknown file"
+        if error.line is not None:
+            where += f", line {error.line}"
+        part = f"Error {n}: {error.message}\nLocation: {where}\nLog:\n{error.block}"
+        source = sources.get(error.file) if error.file else None
+        if source is not None and error.line is not None:
+            window = source_window(source, error.line)
+            if window:
+                part += f"\nSource ({error.file}):\n{window}"
+        parts.append(part)
+    return "\n\n".join(parts)
+
+
+def error_files(log: str, max_errors: int = 3) -> list[str]:
+    """Files the errors of ``log`` point to, to look up their sources."""
+    return list(dict.fromkeys(error.file for error in analyze_log(log, max_errors) if error.file))
@@ -0,0 +1,64 @@
+"""
+Streaming ZIP writer.
+
+``zipfile`` can write to a non-seekable stream: it then emits a data descriptor
+after each member instead of seeking back to patch the local header. This module
+feeds ``ZipFile`` a write-only sink and yields whatever it has written after
+every chunk, so an archive can be sent while its members are still being read.
+"""
+
+import time
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from zipfile import ZIP64_LIMIT, ZIP_DEFLATED, ZipFile, ZipInfo
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _ChunkSink:
+    """Write-only file object that collects bytes until they are taken."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._offset = 0
+
+    def write(self, data: bytes) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+            self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries: Iterable[tuple[str, str | bytes | Path]]) -> Iterator[bytes]:
+    """Yield a ZIP archive of ``(arcname, source)`` entries, where a source is text, bytes or a file path."""
+    sink = _ChunkSink()
+    date_time = time.localtime()[:6]
+    with ZipFile(sink, "w", ZIP_DEFLATED) as zf:
+        for arcname, source in entries:
+            info = ZipInfo(arcname, date_time=date_time)
+            info.compress_type = ZIP_DEFLATED
+            large = isinstance(source, Path) and source.stat().st_size >= ZIP64_LIMIT
+            with zf.open(info, "w", force_zip64=large) as member:
+                if isinstance(source, Path):
+                    with open(source, "rb") as f:
+                        while chunk := f.read(CHUNK_SIZE):
+                            member.write(chunk)
+                            if data := sink.take():
+                                yield data
+                else:
+                    member.write(source.encode("utf-8") if isinstance(source, str) else source)
+            if data := sink.take():
+                yield data
+    if data := sink.take():
+        yield data
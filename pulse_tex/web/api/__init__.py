@@ -1,3 +1,3 @@
-from pulse_tex.web.api import ai, compile, config, files, literature, projects
+from pulse_tex.web.api import ai, compile, config, files, literature, projects, revisions, search
 
-__all__ = ["projects", "files", "compile", "config", "ai", "literature"]
+__all__ = ["projects", "files", "revisions", "search", "compile", "config", "ai", "literature"]
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
-import json
 
 from pulse_tex.services.ai_assistant import ai_service
+from pulse_tex.services.ai_cache import ai_cache
+from pulse_tex.services.chat_sessions import chat_sessions
+from pulse_tex.services.inline_completion import inline_completer
+from pulse_tex.utils.texlog import error_files
+from pulse_tex.web.dependencies import get_database
+from pulse_tex.web.streaming import content_events, event_stream, streams
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 
@@ -12,25 +16,53 @@ class ChatRequest(BaseModel):
     message: str
     context: str | None = None
     system_prompt: str | None = None
+    project_id: str | None = None
+    session_id: str | None = None
+
+
+class CreateSessionRequest(BaseModel):
+    project_id: str | None = None
+    title: str = ""
+
+
+class CompleteRequest(BaseModel):
+    prefix: str
+    suffix: str = ""
+    session_id: str | None = None
+    use_cache: bool = True
+
+
+class CompleteResponse(BaseModel):
+    success: bool
+    completion: str
+    source: str = ""
+    latency_ms: float = 0.0
+    error: str | None = None
 
 
 class PolishRequest(BaseModel):
     text: str
     style: str = "academic"
+    use_cache: bool = True
 
 
 class TranslateRequest(BaseModel):
     text: str
     direction: str = "en"
+    use_cache: bool = True
 
 
 class ExplainErrorRequest(BaseModel):
     log_content: str
     source_code: str | None = None
+    source_path: str | None = None
+    project_id: str | None = None
+    use_cache: bool = True
 
 
 class GenerateTikZRequest(BaseModel):
     description: str
+    use_cache: bool = True
 
 
 class GeneratePlotRequest(BaseModel):
@@ -44,47 +76,104 @@ class AIResponse(BaseModel):
     error: str | None = None
 
 
+async def _session_history(request: ChatRequest) -> list[dict] | None:
+    if not request.session_id:
+        return None
+    db = get_database()
+    history = await db.run(chat_sessions.history, request.session_id)
+    if history is None:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return history
+
+
 @router.post("/chat", response_model=AIResponse)
 async def chat(request: ChatRequest):
     if not ai_service.is_configured:
         raise HTTPException(status_code=503, detail="AI service not configured")
+    history = await _session_history(request)
     try:
         result = await ai_service.chat(
             message=request.message,
             context=request.context,
             system_prompt=request.system_prompt,
+            project_id=request.project_id,
+            history=history,
         )
+        if request.session_id:
+            await chat_sessions.record(request.session_id, request.message, result)
         return AIResponse(success=True, content=result)
     except Exception as e:
         return AIResponse(success=False, content="", error=str(e))
 
 
 @router.post("/chat/stream")
-async def chat_stream(request: ChatRequest):
+async def chat_stream(request: ChatRequest, http_request: Request):
     if not ai_service.is_configured:
         raise HTTPException(status_code=503, detail="AI service not configured")
 
-    async def generate():
-        try:
-            async for chunk in ai_service.chat_stream(
-                message=request.message,
-                context=request.context,
-                system_prompt=request.system_prompt,
-            ):
-                yield f"data: {json.dumps({'content': chunk})}\n\n"
-            yield "data: [DONE]\n\n"
-        except Exception as e:
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
-
-    return StreamingResponse(
-        generate(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
+    history = await _session_history(request)
+    pieces = ai_service.chat_stream(
+        message=request.message,
+        context=request.context,
+        system_prompt=request.system_prompt,
+        project_id=request.project_id,
+        history=history,
     )
+    if request.session_id:
+        pieces = chat_sessions.recorded(request.session_id, request.message, pieces)
+    return event_stream(content_events(pieces), http_request)
+
+
+@router.post("/sessions")
+async def create_session(request: CreateSessionRequest):
+    db = get_database()
+    session = await db.run(chat_sessions.create, request.project_id, request.title)
+    return session.to_dict()
+
+
+@router.get("/sessions")
+async def list_sessions(project_id: str | None = None):
+    db = get_database()
+    sessions = await db.run(chat_sessions.list_sessions, project_id)
+    return [session.to_dict() for session in sessions]
+
+
+@router.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    db = get_database()
+    session = await db.run(chat_sessions.get, session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    messages = await db.run(chat_sessions.messages, session_id)
+    return {**session.to_dict(), "messages": [message.to_dict() for message in messages]}
+
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    db = get_database()
+    if not await db.run(chat_sessions.delete, session_id):
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return {"success": True}
+
+
+@router.post("/complete", response_model=CompleteResponse)
+async def complete(request: CompleteRequest):
+    """Ghost-text continuation at the cursor.
+
+    ``session_id`` identifies the editor whose older requests this one replaces; without it the
+    request is neither debounced nor superseded.
+    """
+    if not ai_service.is_configured:
+        raise HTTPException(status_code=503, detail="AI service not configured")
+    try:
+        result = await inline_completer.complete(
+            request.session_id, request.prefix, request.suffix, use_cache=request.use_cache
+        )
+        return CompleteResponse(
+            success=True, completion=result.text, source=result.source, latency_ms=result.latency_ms
+        )
+    except Exception as e:
+        return CompleteResponse(success=False, completion="", error=str(e))
 
 
 @router.post("/polish", response_model=AIResponse)
@@ -92,23 +181,91 @@ async def polish(request: PolishRequest):
     if not ai_service.is_configured:
         raise HTTPException(status_code=503, detail="AI service not configured")
     try:
-        result = await ai_service.polish(text=request.text, style=request.style)
+        result = await ai_service.polish(text=request.text, style=request.style, use_cache=request.use_cache)
         return AIResponse(success=True, content=result)
     except Exception as e:
         return AIResponse(success=False, content="", error=str(e))
 
 
+@router.post("/polish/stream")
+async def polish_stream(request: PolishRequest, http_request: Request):
+    if not ai_service.is_configured:
+        raise HTTPException(status_code=503, detail="AI service not configured")
+    return event_stream(
+        content_events(ai_service.polish_stream(text=request.text, style=request.style, use_cache=request.use_cache)),
+        http_request,
+    )
+
+
 @router.post("/translate", response_model=AIResponse)
 async def translate(request: TranslateRequest):
     if not ai_service.is_configured:
         raise HTTPException(status_code=503, detail="AI service not configured")
     try:
-        result = await ai_service.translate(text=request.text, direction=request.direction)
+        result = await ai_service.translate(text=request.text, direction=request.direction, use_cache=request.use_cache)
         return AIResponse(success=True, content=result)
     except Exception as e:
         return AIResponse(success=False, content="", error=str(e))
 
 
+@router.post("/translate/stream")
+async def translate_stream(request: TranslateRequest, http_request: Request):
+    if not ai_service.is_configured:
+        raise HTTPException(status_code=503, detail="AI service not configured")
+    return event_stream(
+        content_events(
+            ai_service.translate_stream(text=request.text, direction=request.direction, use_cache=request.use_cache)
+        ),
+        http_request,
+    )
+
+
+@router.post("/polish/document")
+async def polish_document(request: PolishRequest, http_request: Request):
+    """Polish a long text chunk by chunk in parallel, streaming each chunk as it completes."""
+    if not ai_service.is_configured:
+        raise HTTPException(status_code=503, detail="AI service not configured")
+    return event_stream(
+        ai_service.polish_document(request.text, style=request.style, use_cache=request.use_cache), http_request
+    )
+
+
+@router.post("/translate/document")
+async def translate_document(request: TranslateRequest, http_request: Request):
+    """Translate a long text chunk by chunk in parallel, streaming each chunk as it completes."""
+    if not ai_service.is_configured:
+        raise HTTPException(status_code=503, detail="AI service not configured")
+    return event_stream(
+        ai_service.translate_document(request.text, direction=request.direction, use_cache=request.use_cache),
+        http_request,
+    )
+
+
+async def _error_sources(request: ExplainErrorRequest) -> dict[str, str]:
+    """Contents of the project files the log's errors point to."""
+    if not request.project_id:
+        return {}
+    db = get_database()
+    sources = {}
+    for path in error_files(request.log_content):
+        file = await db.run(db.get_file, request.project_id, path)
+        if file and not file.is_binary:
+            sources[path] = file.content or ""
+    return sources
+
+
+async def _source_path(request: ExplainErrorRequest) -> str:
+    """The file ``source_code`` was taken from: the given path, else the project's main file."""
+    if request.source_path:
+        return request.source_path
+    if request.project_id:
+        db = get_database()
+        project = await db.run(db.get_project, request.project_id)
+        if project:
+            return project.main_file
+    return "main.tex"
+
+
 @router.post("/explain-error", response_model=AIResponse)
 async def explain_error(request: ExplainErrorRequest):
     if not ai_service.is_configured:
@@ -117,23 +274,54 @@ async def explain_error(request: ExplainErrorRequest):
         result = await ai_service.explain_error(
             log_content=request.log_content,
             source_code=request.source_code,
+            use_cache=request.use_cache,
+            sources=await _error_sources(request),
+            source_path=await _source_path(request),
         )
         return AIResponse(success=True, content=result)
     except Exception as e:
         return AIResponse(success=False, content="", error=str(e))
 
 
+@router.post("/explain-error/stream")
+async def explain_error_stream(request: ExplainErrorRequest, http_request: Request):
+    if not ai_service.is_configured:
+        raise HTTPException(status_code=503, detail="AI service not configured")
+    return event_stream(
+        content_events(
+            ai_service.explain_error_stream(
+                log_content=request.log_content,
+                source_code=request.source_code,
+                use_cache=request.use_cache,
+                sources=await _error_sources(request),
+                source_path=await _source_path(request),
+            )
+        ),
+        http_request,
+    )
+
+
 @router.post("/generate-tikz", response_model=AIResponse)
 async def generate_tikz(request: GenerateTikZRequest):
     if not ai_service.is_configured:
         raise HTTPException(status_code=503, detail="AI service not configured")
     try:
-        result = await ai_service.generate_tikz(description=request.description)
+        result = await ai_service.generate_tikz(description=request.description, use_cache=request.use_cache)
         return AIResponse(success=True, content=result)
     except Exception as e:
         return AIResponse(success=False, content="", error=str(e))
 
 
+@router.post("/generate-tikz/stream")
+async def generate_tikz_stream(request: GenerateTikZRequest, http_request: Request):
+    if not ai_service.is_configured:
+        raise HTTPException(status_code=503, detail="AI service not configured")
+    return event_stream(
+        content_events(ai_service.generate_tikz_stream(description=request.description, use_cache=request.use_cache)),
+        http_request,
+    )
+
+
 @router.post("/generate-plot", response_model=AIResponse)
 async def generate_plot(request: GeneratePlotRequest):
     if not ai_service.is_configured:
@@ -148,9 +336,43 @@ async def generate_plot(request: GeneratePlotRequest):
         return AIResponse(success=False, content="", error=str(e))
 
 
+@router.post("/generate-plot/stream")
+async def generate_plot_stream(request: GeneratePlotRequest, http_request: Request):
+    if not ai_service.is_configured:
+        raise HTTPException(status_code=503, detail="AI service not configured")
+    return event_stream(
+        content_events(ai_service.generate_plot_stream(description=request.description, data=request.data)),
+        http_request,
+    )
+
+
 @router.get("/status")
 async def ai_status():
     return {
         "configured": ai_service.is_configured,
         "model": ai_service.model if ai_service.is_configured else None,
+        "queue": ai_service.limiter.stats(),
+        "streams": len(streams),
+        "completion": inline_completer.stats(),
     }
+
+
+@router.post("/streams/{stream_id}/cancel")
+async def cancel_stream(stream_id: str):
+    """Stop the stream that was sent this ``X-Stream-ID`` and release its upstream connection."""
+    if not streams.cancel(stream_id):
+        raise HTTPException(status_code=404, detail="Stream not found")
+    return {"success": True}
+
+
+@router.get("/cache")
+async def cache_stats():
+    db = get_database()
+    return await db.run(ai_cache.stats)
+
+
+@router.delete("/cache")
+async def clear_cache():
+    db = get_database()
+    removed = await db.run(ai_cache.clear)
+    return {"success": True, "removed": removed}
@@ -1,17 +1,35 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
 import subprocess
 import tempfile
+from datetime import UTC, datetime
 from pathlib import Path
 
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
 
 from pulse_tex.core import Config
+from pulse_tex.core.disk import BUILD_DIR_PREFIX
+from pulse_tex.core.storage import fs_storage
+from pulse_tex.services.blob_store import blob_store
 from pulse_tex.utils.synctex import SyncTeXParser
 from pulse_tex.web.dependencies import get_database
 
 router = APIRouter()
 
+BUILD_ID_LENGTH = 16
+BUILD_INFO_NAME = "build.json"
+
+# Newest build id requested per project; older builds that finish later do not overwrite its output.
+_latest_builds: dict[str, str] = {}
+# Builds in progress by (project_id, build_id), so identical concurrent requests share one run.
+_inflight_builds: dict[tuple[str, str], asyncio.Task] = {}
+
 
 class CompileResult(BaseModel):
     success: bool
@@ -19,6 +37,9 @@ class CompileResult(BaseModel):
     pdf_path: str | None = None
     synctex_path: str | None = None
     error_message: str | None = None
+    build_id: str | None = None
+    cached: bool = False
+    superseded: bool = False
 
 
 class SyncTeXRequest(BaseModel):
@@ -119,85 +140,192 @@ def _check_aux_for_citations(aux_file: Path) -> bool:
         return False
 
 
+def snapshot_inputs(db, project, target: Path) -> dict[str, str]:
+    """Materialize one consistent version of a project's inputs into ``target``.
+
+    Returns the content-hash manifest (path -> sha256) of what was written. SQLite projects are read
+    in a single statement; filesystem projects are copied, and since every write replaces files
+    atomically each copied file is one complete version.
+    """
+    manifest = {}
+    if project.storage == "fs":
+        db.sync_project_files(project.id)
+        fs_storage.copy_tree(project.id, target)
+        for file_path in sorted(p for p in target.rglob("*") if p.is_file()):
+            digest = hashlib.sha256()
+            with open(file_path, "rb") as f:
+                while chunk := f.read(1024 * 1024):
+                    digest.update(chunk)
+            manifest[file_path.relative_to(target).as_posix()] = digest.hexdigest()
+        return manifest
+
+    for f in db.snapshot_files(project.id):
+        file_path = target / f.path
+        if f.is_binary:
+            blob_store.link_into(f.blob_hash, file_path)
+            manifest[f.path] = f.blob_hash
+            continue
+        data = (f.content or "").encode("utf-8")
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_bytes(data)
+        manifest[f.path] = hashlib.sha256(data).hexdigest()
+    return manifest
+
+
+def build_identity(manifest: dict[str, str], main_file: str, engine: str, bibtex_engine: str) -> str:
+    """A build is identified by its inputs and toolchain settings: same id, same PDF."""
+    payload = json.dumps(
+        {"main_file": main_file, "engine": engine, "bibtex_engine": bibtex_engine, "files": sorted(manifest.items())},
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:BUILD_ID_LENGTH]
+
+
+def read_build_info(project_id: str) -> dict | None:
+    try:
+        return json.loads((_output_dir(project_id) / BUILD_INFO_NAME).read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _output_dir(project_id: str) -> Path:
+    return Path(Config.PROJECTS_DIR) / str(project_id)
+
+
+def _publish(src: Path, dst: Path) -> None:
+    tmp = dst.with_name(f".{dst.name}.tmp")
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def _run_build(
+    project_id: str, build_dir: Path, build_id: str, manifest: dict[str, str], settings: dict
+) -> CompileResult:
+    main_file, engine = settings["main_file"], settings["engine"]
+    if engine == "tectonic":
+        success, log_output = compile_with_tectonic(main_file, str(build_dir))
+    else:
+        success, log_output = compile_with_latex(engine, main_file, str(build_dir), settings["bibtex_engine"])
+
+    pdf_file = build_dir / main_file.replace(".tex", ".pdf")
+    synctex_file = build_dir / main_file.replace(".tex", ".synctex.gz")
+    if not pdf_file.exists():
+        return CompileResult(success=False, log=log_output, build_id=build_id, error_message="PDF not generated")
+    if _latest_builds.get(project_id) != build_id:
+        return CompileResult(
+            success=False,
+            log=log_output,
+            build_id=build_id,
+            superseded=True,
+            error_message="Superseded by a newer build",
+        )
+
+    output_dir = _output_dir(project_id)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_pdf = output_dir / "output.pdf"
+    output_synctex = output_dir / "output.synctex.gz"
+    _publish(pdf_file, output_pdf)
+    synctex_path = None
+    if synctex_file.exists():
+        _publish(synctex_file, output_synctex)
+        synctex_path = str(output_synctex)
+
+    info = {
+        "build_id": build_id,
+        **settings,
+        "files": manifest,
+        "created_at": datetime.now(UTC).isoformat(),
+        "log": log_output,
+    }
+    (output_dir / BUILD_INFO_NAME).write_text(json.dumps(info))
+    return CompileResult(
+        success=True, log=log_output, pdf_path=str(output_pdf), synctex_path=synctex_path, build_id=build_id
+    )
+
+
+async def _build(
+    project_id: str, build_dir: Path, build_id: str, manifest: dict[str, str], settings: dict
+) -> CompileResult:
+    try:
+        return await run_in_threadpool(_run_build, project_id, build_dir, build_id, manifest, settings)
+    except Exception as e:
+        return CompileResult(success=False, log="", build_id=build_id, error_message=str(e))
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+
 @router.post("/{project_id}")
-async def compile_project(project_id: str) -> CompileResult:
+async def compile_project(project_id: str, force: bool = False) -> CompileResult:
     db = get_database()
-    project = db.get_project(project_id)
+    project = await db.run(db.get_project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    files = db.get_files(project_id)
-    if not files:
-        raise HTTPException(status_code=400, detail="No files in project")
-
-    main_file = project.main_file or "main.tex"
-    main_content = None
-    for f in files:
-        if f.path == main_file:
-            main_content = f.content
-            break
-
-    if not main_content:
-        raise HTTPException(status_code=400, detail=f"Main file '{main_file}' not found")
-
-    engine = db.get_config("latex_engine") or "tectonic"
-    bibtex_engine = db.get_config("bibtex_engine") or "biber"
-
-    with tempfile.TemporaryDirectory() as tmpdir:
-        tmpdir_path = Path(tmpdir)
-
-        for f in files:
-            file_path = tmpdir_path / f.path
-            file_path.parent.mkdir(parents=True, exist_ok=True)
-            file_path.write_text(f.content or "")
-
-        try:
-            if engine == "tectonic":
-                success, log_output = compile_with_tectonic(main_file, tmpdir)
-            else:
-                success, log_output = compile_with_latex(engine, main_file, tmpdir, bibtex_engine)
-
-            pdf_file = tmpdir_path / main_file.replace(".tex", ".pdf")
-            synctex_file = tmpdir_path / main_file.replace(".tex", ".synctex.gz")
-
-            if pdf_file.exists():
-                output_dir = Path(Config.PROJECTS_DIR) / str(project_id)
-                output_dir.mkdir(parents=True, exist_ok=True)
-                output_pdf = output_dir / "output.pdf"
-                output_synctex = output_dir / "output.synctex.gz"
-
-                output_pdf.write_bytes(pdf_file.read_bytes())
-
-                synctex_path = None
-                if synctex_file.exists():
-                    output_synctex.write_bytes(synctex_file.read_bytes())
-                    synctex_path = str(output_synctex)
-
-                return CompileResult(
-                    success=True,
-                    log=log_output,
-                    pdf_path=str(output_pdf),
-                    synctex_path=synctex_path,
-                )
-            else:
-                return CompileResult(
-                    success=False,
-                    log=log_output,
-                    error_message="PDF not generated",
-                )
-
-        except Exception as e:
+    settings = {
+        "main_file": project.main_file or "main.tex",
+        "engine": db.get_config("latex_engine") or "tectonic",
+        "bibtex_engine": db.get_config("bibtex_engine") or "biber",
+    }
+    build_dir = Path(tempfile.mkdtemp(prefix=BUILD_DIR_PREFIX))
+    try:
+        manifest = await db.run(snapshot_inputs, db, project, build_dir)
+        if not manifest:
+            raise HTTPException(status_code=400, detail="No files in project")
+        if settings["main_file"] not in manifest:
+            raise HTTPException(status_code=400, detail=f"Main file '{settings['main_file']}' not found")
+
+        build_id = build_identity(manifest, **settings)
+        # Whether this request starts a build, joins one or is served from cache, its inputs are
+        # now the current ones: builds of anything else must not publish over them.
+        _latest_builds[project_id] = build_id
+        info = read_build_info(project_id)
+        if not force and info and info["build_id"] == build_id and (_output_dir(project_id) / "output.pdf").exists():
+            synctex = _output_dir(project_id) / "output.synctex.gz"
             return CompileResult(
-                success=False,
-                log="",
-                error_message=str(e),
+                success=True,
+                log=info.get("log", ""),
+                pdf_path=str(_output_dir(project_id) / "output.pdf"),
+                synctex_path=str(synctex) if synctex.exists() else None,
+                build_id=build_id,
+                cached=True,
             )
 
+        key = (project_id, build_id)
+        task = _inflight_builds.get(key)
+        if task is None:
+            task = asyncio.create_task(_build(project_id, build_dir, build_id, manifest, settings))
+            _inflight_builds[key] = task
+            task.add_done_callback(lambda _: _inflight_builds.pop(key, None))
+            build_dir = None
+    finally:
+        if build_dir is not None:
+            shutil.rmtree(build_dir, ignore_errors=True)
+
+    result = await asyncio.shield(task)
+    if not result.superseded:
+        await db.run(db.record_compile, project_id, result.success)
+    return result
+
+
+@router.get("/{project_id}/build")
+async def get_build(project_id: str):
+    """Describe the build the current PDF was produced from."""
+    db = get_database()
+    project = await db.run(db.get_project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    info = read_build_info(project_id)
+    if not info:
+        raise HTTPException(status_code=404, detail="No build found. Compile the project first.")
+    info.pop("log", None)
+    return info
+
 
 @router.post("/{project_id}/synctex/forward", response_model=SyncTeXResponse)
 async def synctex_forward(project_id: str, request: SyncTeXRequest):
     db = get_database()
-    project = db.get_project(project_id)
+    project = await db.run(db.get_project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
@@ -218,7 +346,7 @@ async def synctex_forward(project_id: str, request: SyncTeXRequest):
 @router.get("/{project_id}/synctex", response_model=SyncTeXResponse)
 async def synctex_forward_get(project_id: str, line: int, file: str = "main.tex"):
     db = get_database()
-    project = db.get_project(project_id)
+    project = await db.run(db.get_project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
@@ -239,7 +367,7 @@ async def synctex_forward_get(project_id: str, line: int, file: str = "main.tex"
 @router.post("/{project_id}/synctex/reverse", response_model=ReverseSyncTeXResponse)
 async def synctex_reverse(project_id: str, request: ReverseSyncTeXRequest):
     db = get_database()
-    project = db.get_project(project_id)
+    project = await db.run(db.get_project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
@@ -258,7 +386,7 @@ async def synctex_reverse(project_id: str, request: ReverseSyncTeXRequest):
 @router.get("/{project_id}/pdf")
 async def get_pdf(project_id: str):
     db = get_database()
-    project = db.get_project(project_id)
+    project = await db.run(db.get_project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
@@ -266,8 +394,10 @@ async def get_pdf(project_id: str):
     if not pdf_path.exists():
         raise HTTPException(status_code=404, detail="PDF not found. Compile the project first.")
 
+    info = read_build_info(project_id)
     return FileResponse(
         path=pdf_path,
         media_type="application/pdf",
         filename=f"{project.name}.pdf",
+        headers={"X-Build-Id": info["build_id"]} if info else None,
     )
@@ -4,6 +4,7 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
 from pulse_tex.core import Config
+from pulse_tex.services.llm_clients import llm_clients
 from pulse_tex.web.dependencies import get_database
 
 router = APIRouter()
@@ -23,6 +24,7 @@ BIBTEX_ENGINES = {
 
 DEFAULT_AI_BASE_URL = "https://llmapi.paratera.com"
 DEFAULT_AI_MODEL = "DeepSeek-V3.2"
+TEST_AI_TIMEOUT = 30.0
 
 
 class UpdateConfigRequest(BaseModel):
@@ -110,22 +112,24 @@ async def initialize_system(data: InitConfigRequest):
     if db.is_initialized():
         raise HTTPException(status_code=400, detail="系统已初始化")
 
-    db.set_config("ai_api_key", data.ai_api_key)
-    db.set_config("ai_model", data.ai_model)
-    db.set_config("ai_base_url", data.ai_base_url)
-    db.set_config("latex_engine", data.latex_engine)
-    db.set_config("bibtex_engine", data.bibtex_engine)
-    db.set_config("arxiv_pulse_url", data.arxiv_pulse_url)
-    db.set_config("ui_language", data.ui_language)
-
-    db.set_initialized(True)
+    await db.run(
+        db.update_config,
+        {
+            "ai_api_key": data.ai_api_key,
+            "ai_model": data.ai_model,
+            "ai_base_url": data.ai_base_url,
+            "latex_engine": data.latex_engine,
+            "bibtex_engine": data.bibtex_engine,
+            "arxiv_pulse_url": data.arxiv_pulse_url,
+            "ui_language": data.ui_language,
+            "is_initialized": "true",
+        },
+    )
     return {"success": True, "message": "配置已保存"}
 
 
 @router.post("/test-ai")
 async def test_ai_connection(request: TestAIRequest):
-    import openai
-
     db = get_database()
     api_key = request.ai_api_key or db.get_config("ai_api_key", "")
     base_url = request.ai_base_url or db.get_config("ai_base_url", DEFAULT_AI_BASE_URL)
@@ -135,12 +139,13 @@ async def test_ai_connection(request: TestAIRequest):
         raise HTTPException(status_code=400, detail="未设置 API Key")
 
     try:
-        client = openai.OpenAI(api_key=api_key, base_url=base_url)
-        response = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": "Hello"}],
-            max_tokens=10,
-        )
+        async with llm_clients.using(llm_clients.get(base_url, api_key)) as client:
+            await client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": "Hello"}],
+                max_tokens=10,
+                timeout=TEST_AI_TIMEOUT,
+            )
         return {"success": True, "message": f"连接成功，模型: {model}"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"连接失败: {str(e)[:100]}")
@@ -153,8 +158,7 @@ async def update_config(data: UpdateConfigRequest):
         return {"success": True, "message": "No updates provided"}
 
     db = get_database()
-    for key, value in updates.items():
-        if key == "ai_api_key" and value == "***":
-            continue
-        db.set_config(key, value)
+    values = {k: v for k, v in updates.items() if not (k == "ai_api_key" and v == "***")}
+    if values:
+        await db.run(db.update_config, values)
     return {"success": True, "updated": list(updates.keys())}
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 
 from pulse_tex.services.diagram_service import diagram_service
+from pulse_tex.web.streaming import event_stream
 
 router = APIRouter(prefix="/diagram", tags=["diagram"])
 
@@ -63,6 +64,22 @@ async def refine_sketch(request: RefineSketchRequest):
         return DiagramResponse(success=False, error=str(e))
 
 
+@router.post("/refine/stream")
+async def refine_sketch_stream(request: RefineSketchRequest, http_request: Request):
+    if not diagram_service.is_configured:
+        raise HTTPException(status_code=503, detail="AI service not configured")
+    return event_stream(
+        diagram_service.refine_sketch_stream(
+            sketch_svg=request.sketch_svg,
+            description=request.description,
+            style=request.style,
+            context=request.context,
+            previous_iterations=request.previous_iterations,
+        ),
+        http_request,
+    )
+
+
 @router.post("/generate", response_model=DiagramResponse)
 async def generate_from_text(request: GenerateFromTextRequest):
     if not diagram_service.is_configured:
@@ -79,6 +96,21 @@ async def generate_from_text(request: GenerateFromTextRequest):
         return DiagramResponse(success=False, error=str(e))
 
 
+@router.post("/generate/stream")
+async def generate_from_text_stream(request: GenerateFromTextRequest, http_request: Request):
+    if not diagram_service.is_configured:
+        raise HTTPException(status_code=503, detail="AI service not configured")
+    return event_stream(
+        diagram_service.generate_from_text_stream(
+            description=request.description,
+            style=request.style,
+            diagram_type=request.diagram_type,
+            context=request.context,
+        ),
+        http_request,
+    )
+
+
 @router.post("/iterate", response_model=DiagramResponse)
 async def iterate_design(request: IterateDesignRequest):
     if not diagram_service.is_configured:
@@ -94,6 +126,20 @@ async def iterate_design(request: IterateDesignRequest):
         return DiagramResponse(success=False, error=str(e))
 
 
+@router.post("/iterate/stream")
+async def iterate_design_stream(request: IterateDesignRequest, http_request: Request):
+    if not diagram_service.is_configured:
+        raise HTTPException(status_code=503, detail="AI service not configured")
+    return event_stream(
+        diagram_service.iterate_design_stream(
+            current_svg=request.current_svg,
+            feedback=request.feedback,
+            style=request.style,
+        ),
+        http_request,
+    )
+
+
 @router.post("/svg-to-tikz", response_model=DiagramResponse)
 async def svg_to_tikz(request: SvgToTikzRequest):
     if not diagram_service.is_configured:
@@ -106,3 +152,12 @@ async def svg_to_tikz(request: SvgToTikzRequest):
         return DiagramResponse(success=True, data={"tikz": tikz})
     except Exception as e:
         return DiagramResponse(success=False, error=str(e))
+
+
+@router.post("/svg-to-tikz/stream")
+async def svg_to_tikz_stream(request: SvgToTikzRequest, http_request: Request):
+    if not diagram_service.is_configured:
+        raise HTTPException(status_code=503, detail="AI service not configured")
+    return event_stream(
+        diagram_service.svg_to_tikz_stream(svg=request.svg, description=request.description), http_request
+    )
@@ -1,6 +1,13 @@
-from fastapi import APIRouter, HTTPException
+import mimetypes
+from typing import Literal
+
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel
 
+from pulse_tex.core.storage import invalid_path
+from pulse_tex.services.blob_store import blob_store, is_text_path
 from pulse_tex.web.dependencies import get_database
 
 router = APIRouter()
@@ -15,56 +22,108 @@ class UpdateFileRequest(BaseModel):
     content: str
 
 
+class FileOperation(BaseModel):
+    op: Literal["create", "update", "delete", "rename"]
+    path: str
+    content: str | None = None
+    new_path: str | None = None
+
+
+class BatchFilesRequest(BaseModel):
+    operations: list[FileOperation]
+    atomic: bool = False
+
+
 @router.get("/{project_id}")
 async def list_files(project_id: str):
     db = get_database()
-    project = db.get_project(project_id)
+    project = await db.run(db.get_project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    files = db.get_files(project_id)
+    files = await db.run(db.get_files, project_id)
     return [f.to_dict() for f in files]
 
 
 @router.post("/{project_id}")
 async def create_file(project_id: str, data: CreateFileRequest):
+    if invalid_path(data.path):
+        raise HTTPException(status_code=400, detail="Invalid file path")
     db = get_database()
-    project = db.get_project(project_id)
-    if not project:
+    file = await db.run(db.create_file, project_id, data.path, data.content)
+    if not file:
+        project = await db.run(db.get_project, project_id)
+        if not project:
+            raise HTTPException(status_code=404, detail="Project not found")
+        raise HTTPException(status_code=400, detail="File already exists")
+    return file.to_dict()
+
+
+@router.post("/{project_id}/batch")
+async def batch_files(project_id: str, data: BatchFilesRequest):
+    db = get_database()
+    operations = [op.model_dump() for op in data.operations]
+    results = await db.run(db.apply_file_operations, project_id, operations, atomic=data.atomic)
+    if results is None:
         raise HTTPException(status_code=404, detail="Project not found")
+    return {"success": all(r["success"] for r in results), "results": results}
 
-    existing = db.get_file(project_id, data.path)
-    if existing:
-        raise HTTPException(status_code=400, detail="File already exists")
 
-    file = db.create_file(project_id, data.path, data.content)
-    return file.to_dict()
+@router.post("/{project_id}/upload")
+async def upload_file(project_id: str, file: UploadFile = File(...), path: str | None = Form(None)):
+    db = get_database()
+    target = path or file.filename
+    if not target or invalid_path(target):
+        raise HTTPException(status_code=400, detail="Invalid file path")
+
+    content = None
+    if is_text_path(target):
+        raw = await file.read()
+        try:
+            content = raw.decode("utf-8")
+        except UnicodeDecodeError:
+            await file.seek(0)
+
+    if content is not None:
+        stored = await db.run(db.put_file, project_id, target, content)
+    else:
+        digest, size = await run_in_threadpool(blob_store.save_file, file.file)
+        stored = await db.run(db.put_file, project_id, target, "", blob_hash=digest, blob_size=size)
+    if not stored:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return stored.to_dict()
 
 
 @router.get("/{project_id}/{path:path}")
-async def get_file(project_id: str, path: str):
+async def get_file(project_id: str, path: str, raw: bool = False):
     db = get_database()
-    file = db.get_file(project_id, path)
+    file = await db.run(db.get_file, project_id, path)
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
+
+    if raw:
+        media_type = mimetypes.guess_type(file.path)[0] or "application/octet-stream"
+        if file.is_binary:
+            return FileResponse(blob_store.path_for(file.blob_hash), media_type=media_type)
+        return Response(content=file.content or "", media_type=media_type)
     return file.to_dict()
 
 
 @router.patch("/{project_id}/{path:path}")
 async def update_file(project_id: str, path: str, data: UpdateFileRequest):
+    if invalid_path(path):
+        raise HTTPException(status_code=400, detail="Invalid file path")
     db = get_database()
-    success = db.update_file(project_id, path, data.content)
-    if not success:
+    file = await db.run(db.update_file, project_id, path, data.content, buffered=True)
+    if not file:
         raise HTTPException(status_code=404, detail="File not found")
-
-    file = db.get_file(project_id, path)
     return file.to_dict()
 
 
 @router.delete("/{project_id}/{path:path}")
 async def delete_file(project_id: str, path: str):
     db = get_database()
-    success = db.delete_file(project_id, path)
+    success = await db.run(db.delete_file, project_id, path)
     if not success:
         raise HTTPException(status_code=404, detail="File not found")
     return {"success": True}
@@ -1,18 +1,40 @@
-from io import BytesIO
-from zipfile import ZIP_DEFLATED, ZipFile
+from itertools import chain
+from pathlib import Path, PurePosixPath
+from typing import Literal
+from zipfile import BadZipFile, ZipFile, ZipInfo
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, File, Form, HTTPException, Query, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
+from pulse_tex.core import Config
+from pulse_tex.core.storage import invalid_path
+from pulse_tex.services.blob_store import blob_store, is_text_path
+from pulse_tex.services.retrieval import project_retrieval
+from pulse_tex.utils.zipstream import stream_zip
 from pulse_tex.web.dependencies import get_database
 
+IMPORT_BATCH_SIZE = 100
+OUTPUT_ARTIFACTS = ("output.pdf", "output.synctex.gz")
+
 router = APIRouter()
 
 
 class CreateProjectRequest(BaseModel):
     name: str
     description: str = ""
+    template: str | None = None
+    storage: Literal["db", "fs"] | None = None
+
+
+class CloneProjectRequest(BaseModel):
+    name: str
+    description: str | None = None
+
+
+class RegisterTemplateRequest(BaseModel):
+    project_id: str
 
 
 class UpdateProjectRequest(BaseModel):
@@ -22,16 +44,42 @@ class UpdateProjectRequest(BaseModel):
 
 
 @router.get("")
-async def list_projects():
+async def list_projects(
+    response: Response,
+    q: str | None = None,
+    limit: int | None = Query(None, ge=1, le=200),
+    cursor: str | None = None,
+    stats: bool = False,
+):
+    """List projects newest first. With ``limit`` the next page's cursor is sent in X-Next-Cursor."""
     db = get_database()
-    projects = db.get_projects()
-    return [p.to_dict() for p in projects]
+    try:
+        projects, next_cursor = await db.run(db.list_projects, q, limit, cursor, with_stats=stats)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return projects
 
 
 @router.post("")
 async def create_project(data: CreateProjectRequest):
     db = get_database()
-    project = db.create_project(name=data.name, description=data.description)
+    if data.template:
+        template_id = Config.PROJECT_TEMPLATES.get(data.template)
+        if not template_id:
+            raise HTTPException(status_code=404, detail="Template not found")
+        project = await db.run(db.clone_project, template_id, data.name, data.description)
+        if not project:
+            raise HTTPException(status_code=404, detail="Template project not found")
+        return project.to_dict()
+
+    project = await db.run(
+        db.create_project,
+        name=data.name,
+        description=data.description,
+        storage=data.storage or Config.DEFAULT_STORAGE,
+    )
 
     default_content = r"""\documentclass{article}
 \usepackage{amsmath}
@@ -50,15 +98,45 @@ Your content here.
 
 \end{document}
 """
-    db.create_file(project.id, "main.tex", default_content)
+    await db.run(db.create_file, project.id, "main.tex", default_content)
 
     return project.to_dict()
 
 
+@router.get("/templates")
+async def list_templates():
+    return [{"name": name, "project_id": project_id} for name, project_id in Config.PROJECT_TEMPLATES.items()]
+
+
+@router.put("/templates/{name}")
+async def register_template(name: str, data: RegisterTemplateRequest):
+    db = get_database()
+    project = await db.run(db.get_project, data.project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    await db.run(db.edit_json_config, "project_templates", lambda templates: templates.update({name: data.project_id}))
+    return {"name": name, "project_id": data.project_id}
+
+
+@router.delete("/templates/{name}")
+async def delete_template(name: str):
+    db = get_database()
+
+    def remove(templates: dict) -> None:
+        del templates[name]
+
+    try:
+        await db.run(db.edit_json_config, "project_templates", remove)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return {"success": True}
+
+
 @router.get("/{project_id}")
 async def get_project(project_id: str):
     db = get_database()
-    project = db.get_project(project_id)
+    project = await db.run(db.get_project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     return project.to_dict()
@@ -71,43 +149,128 @@ async def update_project(project_id: str, data: UpdateProjectRequest):
     if not updates:
         raise HTTPException(status_code=400, detail="No updates provided")
 
-    success = db.update_project(project_id, **updates)
-    if not success:
+    project = await db.run(db.update_project, project_id, **updates)
+    if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-
-    project = db.get_project(project_id)
     return project.to_dict()
 
 
 @router.delete("/{project_id}")
 async def delete_project(project_id: str):
     db = get_database()
-    success = db.delete_project(project_id)
+    success = await db.run(db.delete_project, project_id)
     if not success:
         raise HTTPException(status_code=404, detail="Project not found")
+    project_retrieval.drop(project_id)
     return {"success": True}
 
 
+@router.post("/{project_id}/clone")
+async def clone_project(project_id: str, data: CloneProjectRequest):
+    db = get_database()
+    project = await db.run(db.clone_project, project_id, data.name, data.description)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project.to_dict()
+
+
 @router.get("/{project_id}/export")
-async def export_project(project_id: str):
+async def export_project(project_id: str, include_output: bool = False):
     db = get_database()
-    project = db.get_project(project_id)
+    project = await db.run(db.get_project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    files = db.get_files(project_id)
-    if not files:
+    files = db.iter_files(project_id)
+    first = await db.run(next, files, None)
+    if first is None:
         raise HTTPException(status_code=400, detail="No files in project")
 
-    zip_buffer = BytesIO()
-    with ZipFile(zip_buffer, "w", ZIP_DEFLATED) as zf:
-        for f in files:
-            zf.writestr(f.path, f.content or "")
-
-    zip_buffer.seek(0)
+    def entries():
+        for f in chain([first], files):
+            yield f.path, blob_store.path_for(f.blob_hash) if f.is_binary else (f.content or "")
+        if include_output:
+            output_dir = Path(Config.PROJECTS_DIR) / str(project_id)
+            for name in OUTPUT_ARTIFACTS:
+                if (output_dir / name).exists():
+                    yield f"output/{name}", output_dir / name
 
     return StreamingResponse(
-        zip_buffer,
+        stream_zip(entries()),
         media_type="application/zip",
         headers={"Content-Disposition": f'attachment; filename="{project.name}.zip"'},
     )
+
+
+def _archive_members(fileobj) -> tuple[list[ZipInfo], str]:
+    """Validate an uploaded archive. Returns its file members and the shared top-level folder to strip."""
+    with ZipFile(fileobj) as zf:
+        members = [i for i in zf.infolist() if not i.is_dir() and not i.filename.startswith("__MACOSX/")]
+    if not members:
+        raise ValueError("Archive contains no files")
+    if sum(i.file_size for i in members) > Config.IMPORT_MAX_BYTES:
+        raise OverflowError("Archive is too large")
+
+    for info in members:
+        if invalid_path(info.filename):
+            raise ValueError(f"Invalid file path in archive: {info.filename}")
+
+    tops = {PurePosixPath(i.filename).parts[0] for i in members}
+    nested = all(len(PurePosixPath(i.filename).parts) > 1 for i in members)
+    prefix = f"{tops.pop()}/" if len(tops) == 1 and nested else ""
+    return members, prefix
+
+
+def _import_members(db, project_id: str, fileobj, members: list[ZipInfo], prefix: str) -> tuple[int, str | None]:
+    """Unpack archive members into project files, one bulk insert per batch. Returns (count, main file)."""
+    count = 0
+    main_file = None
+    batch: list[dict] = []
+    with ZipFile(fileobj) as zf:
+        for info in members:
+            path = info.filename[len(prefix) :]
+            entry = None
+            if is_text_path(path):
+                try:
+                    entry = {"path": path, "content": zf.read(info).decode("utf-8")}
+                except UnicodeDecodeError:
+                    pass
+            if entry is None:
+                with zf.open(info) as src:
+                    digest, size = blob_store.save_file(src)
+                entry = {"path": path, "blob_hash": digest, "blob_size": size}
+            elif path.endswith(".tex") and "\\documentclass" in entry["content"]:
+                if main_file is None or path == "main.tex" or path.count("/") < main_file.count("/"):
+                    main_file = path
+
+            batch.append(entry)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                count += db.insert_files(project_id, batch)
+                batch = []
+        count += db.insert_files(project_id, batch)
+    return count, main_file
+
+
+@router.post("/import")
+async def import_project(file: UploadFile = File(...), name: str | None = Form(None)):
+    db = get_database()
+    try:
+        members, prefix = await run_in_threadpool(_archive_members, file.file)
+    except BadZipFile:
+        raise HTTPException(status_code=400, detail="Invalid ZIP archive")
+    except OverflowError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    project_name = name or PurePosixPath(file.filename or "").stem or "Imported Project"
+    project = await db.run(db.create_project, name=project_name, storage=Config.DEFAULT_STORAGE)
+    try:
+        count, main_file = await run_in_threadpool(_import_members, db, project.id, file.file, members, prefix)
+    except Exception:
+        await db.run(db.delete_project, project.id)
+        raise
+
+    if main_file and main_file != project.main_file:
+        project = await db.run(db.update_project, project.id, main_file=main_file)
+    return {**project.to_dict(), "imported_files": count}
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, HTTPException, Query
+
+from pulse_tex.web.dependencies import get_database
+
+router = APIRouter()
+
+
+@router.get("/{project_id}")
+async def list_revisions(project_id: str, path: str = Query(..., min_length=1)):
+    db = get_database()
+    revisions = await db.run(db.list_revisions, project_id, path)
+    return [r.to_dict() for r in revisions]
+
+
+@router.get("/{project_id}/{rev}")
+async def get_revision(project_id: str, rev: int, path: str = Query(..., min_length=1)):
+    db = get_database()
+    content = await db.run(db.get_revision, project_id, path, rev)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return {"rev": rev, "path": path, "content": content}
+
+
+@router.post("/{project_id}/{rev}/restore")
+async def restore_revision(project_id: str, rev: int, path: str = Query(..., min_length=1)):
+    db = get_database()
+    content = await db.run(db.get_revision, project_id, path, rev)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+
+    file = await db.run(db.put_file, project_id, path, content)
+    if not file:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return file.to_dict()
@@ -0,0 +1,38 @@
+import re
+
+from fastapi import APIRouter, HTTPException, Query
+
+from pulse_tex.web.dependencies import get_database
+
+router = APIRouter()
+
+
+@router.get("")
+async def search(
+    q: str = Query(..., min_length=1, description="Search terms; a trailing * matches prefixes"),
+    project_id: str | None = Query(None, description="Limit the search to one project"),
+    regex: str | None = Query(
+        None, description="Regular expression that matching files must also contain; requires project_id"
+    ),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+):
+    pattern = None
+    if regex:
+        if not project_id:
+            raise HTTPException(status_code=400, detail="project_id is required for regex search")
+        try:
+            pattern = re.compile(regex)
+        except re.error as e:
+            raise HTTPException(status_code=400, detail=f"Invalid regex: {e}")
+
+    db = get_database()
+    results, has_more = await db.run(
+        db.search_files,
+        q,
+        project_id=project_id,
+        limit=page_size,
+        offset=(page - 1) * page_size,
+        regex=pattern,
+    )
+    return {"results": results, "page": page, "page_size": page_size, "has_more": has_more}
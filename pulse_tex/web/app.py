@@ -2,6 +2,8 @@
 FastAPI Application Entry Point
 """
 
+import asyncio
+import contextlib
 import os
 from contextlib import asynccontextmanager
 from pathlib import Path
@@ -10,9 +12,44 @@ from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy import create_engine
 
-from pulse_tex.core import Database
+from pulse_tex.core import Config, Database
+from pulse_tex.core.disk import collect_garbage
 from pulse_tex.models import Base
-from pulse_tex.web.api import ai, compile, config, diagram, files, literature, projects
+from pulse_tex.services.ai_cache import ai_cache
+from pulse_tex.services.chat_sessions import chat_sessions
+from pulse_tex.services.llm_clients import llm_clients
+from pulse_tex.web.api import ai, compile, config, diagram, files, literature, projects, revisions, search
+
+
+async def _flush_buffered_writes_periodically(db: Database, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await db.run(db.flush_file_writes)
+        except Exception as e:
+            print(f"Warning: failed to flush buffered file writes: {e}")
+        try:
+            await db.run(ai_cache.flush_hits)
+        except Exception as e:
+            print(f"Warning: failed to record AI cache hits: {e}")
+
+
+async def _maintain_database_periodically(db: Database, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await db.run(db.maintain, vacuum=None)
+        except Exception as e:
+            print(f"Warning: database maintenance failed: {e}")
+
+
+async def _collect_garbage_periodically(db: Database, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await db.run(collect_garbage, db, Config.DISK_QUOTA_BYTES)
+        except Exception as e:
+            print(f"Warning: garbage collection failed: {e}")
 
 
 @asynccontextmanager
@@ -22,7 +59,23 @@ async def lifespan(app: FastAPI):
     Base.metadata.create_all(engine)
     db = Database(db_url)
     db.init_default_config()
-    yield
+
+    tasks = [asyncio.create_task(_flush_buffered_writes_periodically(db, Config.FILE_FLUSH_INTERVAL))]
+    if Config.DB_MAINTENANCE_INTERVAL:
+        tasks.append(asyncio.create_task(_maintain_database_periodically(db, Config.DB_MAINTENANCE_INTERVAL)))
+    if Config.GC_INTERVAL:
+        tasks.append(asyncio.create_task(_collect_garbage_periodically(db, Config.GC_INTERVAL)))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        await chat_sessions.aclose()
+        await llm_clients.aclose()
+        db.flush_file_writes()
+        ai_cache.flush_hits()
 
 
 def create_app() -> FastAPI:
@@ -40,6 +93,8 @@ def create_app() -> FastAPI:
     api_router = FastAPI(prefix="/api")
     api_router.include_router(projects.router, prefix="/projects", tags=["projects"])
     api_router.include_router(files.router, prefix="/files", tags=["files"])
+    api_router.include_router(revisions.router, prefix="/revisions", tags=["revisions"])
+    api_router.include_router(search.router, prefix="/search", tags=["search"])
     api_router.include_router(compile.router, prefix="/compile", tags=["compile"])
     api_router.include_router(config.router, prefix="/config", tags=["config"])
     api_router.include_router(ai.router, tags=["ai"])
@@ -6,6 +6,10 @@ let currentPage = 1;
 let zoom = 1;
 let openPanel = null;
 let aiMode = 'chat';
+let aiChatController = null;
+let aiSessionId = null;
+let aiInlineCompletion = false;
+const AI_COMPLETION_SESSION = Math.random().toString(36).slice(2);
 let autoSaveTimer = null;
 let hasUnsavedChanges = false;
 let lastSaveTime = null;
@@ -163,7 +167,13 @@ function initMonaco() {
             minimap: { enabled: false },
             lineNumbers: 'on',
             wordWrap: 'on',
-            tabSize: 2
+            tabSize: 2,
+            inlineSuggest: { enabled: true }
+        });
+        
+        monaco.languages.registerInlineCompletionsProvider('latex', {
+            provideInlineCompletions: provideAICompletions,
+            freeInlineCompletions() {}
         });
         
         editor.onDidChangeModelContent(() => {
@@ -184,6 +194,41 @@ function initMonaco() {
     });
 }
 
+// Ghost text from /api/ai/complete. The server debounces per editor session and drops
+// requests overtaken by newer keystrokes; Monaco's cancellation aborts the fetch as well.
+async function provideAICompletions(model, position, context, token) {
+    if (!aiInlineCompletion) return { items: [] };
+    const start = Math.max(1, position.lineNumber - 40);
+    const end = Math.min(model.getLineCount(), position.lineNumber + 10);
+    const prefix = model.getValueInRange(new monaco.Range(start, 1, position.lineNumber, position.column));
+    const suffix = model.getValueInRange(new monaco.Range(position.lineNumber, position.column, end, model.getLineMaxColumn(end)));
+    
+    const controller = new AbortController();
+    token.onCancellationRequested(() => controller.abort());
+    try {
+        const res = await fetch('/api/ai/complete', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            signal: controller.signal,
+            body: JSON.stringify({ prefix, suffix, session_id: AI_COMPLETION_SESSION })
+        });
+        if (res.status === 503) {
+            aiInlineCompletion = false;
+            return { items: [] };
+        }
+        const data = await res.json();
+        if (!data.completion || token.isCancellationRequested) return { items: [] };
+        return {
+            items: [{
+                insertText: data.completion,
+                range: new monaco.Range(position.lineNumber, position.column, position.lineNumber, position.column)
+            }]
+        };
+    } catch (e) {
+        return { items: [] };
+    }
+}
+
 async function saveCurrentFile() {
     if (!editor || !currentFile) return;
     
@@ -317,7 +362,9 @@ async function explainErrorWithAI() {
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
                 log_content: log,
-                source_code: sourceCode
+                source_code: sourceCode,
+                source_path: currentFile,
+                project_id: projectId
             })
         });
         const data = await res.json();
@@ -446,6 +493,33 @@ function setAIMode(mode) {
     });
 }
 
+// The conversation is kept server-side, so each message only carries the new question.
+async function ensureAISession() {
+    if (!aiSessionId) {
+        const res = await fetch('/api/ai/sessions', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ project_id: projectId })
+        });
+        aiSessionId = (await res.json()).id;
+    }
+    return aiSessionId;
+}
+
+// The server retrieves the rest of the project, so only the part being worked on is sent.
+function editorFocusText(radius = 15) {
+    if (!editor) return '';
+    const model = editor.getModel();
+    const selection = editor.getSelection();
+    if (selection && !selection.isEmpty()) {
+        return model.getValueInRange(selection);
+    }
+    const line = editor.getPosition()?.lineNumber || 1;
+    const start = Math.max(1, line - radius);
+    const end = Math.min(model.getLineCount(), line + radius);
+    return model.getValueInRange(new monaco.Range(start, 1, end, model.getLineMaxColumn(end)));
+}
+
 async function sendAIMessage() {
     const input = document.getElementById('ai-input');
     const chat = document.getElementById('ai-chat');
@@ -474,14 +548,22 @@ Rules:
 - Add brief comments if helpful`;
     }
     
+    // A new question supersedes the previous answer; aborting closes the stream server-side too.
+    aiChatController?.abort();
+    const controller = new AbortController();
+    aiChatController = controller;
+    
     try {
         const res = await fetch('/api/ai/chat/stream', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
+            signal: controller.signal,
             body: JSON.stringify({
                 message: message,
-                context: editor?.getValue() || '',
-                system_prompt: systemPrompt
+                context: editorFocusText(),
+                system_prompt: systemPrompt,
+                project_id: projectId,
+                session_id: await ensureAISession()
             })
         });
         
@@ -531,8 +613,14 @@ Rules:
             assistantMsg.appendChild(copyBtn);
         }
     } catch (e) {
-        assistantMsg.className = 'ai-message error';
-        assistantMsg.textContent = e.message;
+        if (e.name === 'AbortError') {
+            assistantMsg.querySelector('.typing-indicator')?.remove();
+        } else {
+            assistantMsg.className = 'ai-message error';
+            assistantMsg.textContent = e.message;
+        }
+    } finally {
+        if (aiChatController === controller) aiChatController = null;
     }
     chat.scrollTop = chat.scrollHeight;
 }
@@ -1051,6 +1139,7 @@ async function loadSettings() {
         document.getElementById('setting-ai-model').value = config.ai_model || '';
         document.getElementById('setting-latex-engine').value = config.latex_engine || 'tectonic';
         document.getElementById('setting-bibtex-engine').value = config.bibtex_engine || 'biber';
+        aiInlineCompletion = Boolean(config.ai_api_key);
     } catch (e) {
         console.error('Failed to load settings:', e);
     }
@@ -1074,6 +1163,7 @@ async function saveSettings() {
             body: JSON.stringify(config)
         });
         
+        aiInlineCompletion = Boolean(config.ai_api_key);
         setLanguage(config.ui_language);
         setTheme(config.theme);
         updateLangLabel();
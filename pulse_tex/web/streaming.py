@@ -0,0 +1,121 @@
+"""
+Server-sent event responses shared by the AI and diagram endpoints.
+
+Each stream is produced by its own task, so it can be stopped independently of
+the response: when the client disconnects, or when it asks for it through
+``POST /api/ai/streams/{stream_id}/cancel``. Cancelling the task unwinds the
+upstream completion and closes its connection instead of reading the rest of
+the answer into a closed socket. Stream ids are generated by the server and only
+sent to the client that started the stream, so one client cannot stop another's.
+"""
+
+import asyncio
+import json
+import uuid
+from collections.abc import AsyncIterator
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+REQUEST_ID_HEADER = "X-Request-ID"
+STREAM_ID_HEADER = "X-Stream-ID"
+DONE = "data: [DONE]\n\n"
+
+
+def _message(event: dict) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+
+class StreamRegistry:
+    """Producer tasks of the streams in progress, by stream id."""
+
+    def __init__(self):
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def register(self, stream_id: str, task: asyncio.Task) -> None:
+        """Track ``task``; an id that is already in use is refused rather than taken over from its stream."""
+        if stream_id in self._tasks:
+            raise ValueError(f"Stream id already in use: {stream_id}")
+        self._tasks[stream_id] = task
+
+    def unregister(self, stream_id: str, task: asyncio.Task) -> None:
+        if self._tasks.get(stream_id) is task:
+            del self._tasks[stream_id]
+
+    def cancel(self, stream_id: str) -> bool:
+        task = self._tasks.get(stream_id)
+        if task is None or task.done():
+            return False
+        return task.cancel()
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+
+streams = StreamRegistry()
+
+
+async def _produce(events: AsyncIterator[dict], queue: asyncio.Queue) -> None:
+    try:
+        async for event in events:
+            queue.put_nowait(_message(event))
+        queue.put_nowait(DONE)
+    except asyncio.CancelledError:
+        queue.put_nowait(_message({"cancelled": True}))
+        queue.put_nowait(DONE)
+        raise
+    except Exception as e:
+        queue.put_nowait(_message({"error": str(e)}))
+    finally:
+        queue.put_nowait(None)
+
+
+async def _cancel_on_disconnect(request: Request, task: asyncio.Task) -> None:
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+    task.cancel()
+
+
+def event_stream(events: AsyncIterator[dict], request: Request | None = None) -> StreamingResponse:
+    """Send events as server-sent events, ending with ``[DONE]``; an exception becomes an ``error`` event.
+
+    With ``request``, the stream stops as soon as the client disconnects, and it can be cancelled
+    by the server-generated id sent back in its ``X-Stream-ID`` header. The ``X-Request-ID`` header
+    is echoed (or generated) for tracing only. A cancelled stream ends with a ``cancelled`` event.
+    """
+    request_id = (request.headers.get(REQUEST_ID_HEADER) if request else None) or uuid.uuid4().hex
+    stream_id = uuid.uuid4().hex
+
+    async def generate():
+        queue: asyncio.Queue[str | None] = asyncio.Queue()
+        producer = asyncio.create_task(_produce(events, queue))
+        tasks = [producer]
+        if request is not None:
+            streams.register(stream_id, producer)
+            tasks.append(asyncio.create_task(_cancel_on_disconnect(request, producer)))
+        try:
+            while (message := await queue.get()) is not None:
+                yield message
+        finally:
+            for task in tasks:
+                task.cancel()
+            streams.unregister(stream_id, producer)
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    headers = (
+        {**SSE_HEADERS, REQUEST_ID_HEADER: request_id, STREAM_ID_HEADER: stream_id}
+        if request is not None
+        else SSE_HEADERS
+    )
+    return StreamingResponse(generate(), media_type="text/event-stream", headers=headers)
+
+
+async def content_events(chunks: AsyncIterator[str]) -> AsyncIterator[dict]:
+    async for chunk in chunks:
+        yield {"content": chunk}
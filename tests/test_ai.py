@@ -1,6 +1,11 @@
+import asyncio
+import json
 import os
 import sys
+import time
+from contextlib import AsyncExitStack
 from pathlib import Path
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, patch
 
 import pytest
@@ -20,10 +25,8 @@ def client():
     from fastapi.testclient import TestClient
     from pulse_tex.web.app import create_app
     import pulse_tex.core.config as config_module
-    from pulse_tex.services.ai_assistant import ai_service
 
     config_module._db_instance = None
-    ai_service._client = None
 
     app = create_app()
 
@@ -32,7 +35,6 @@ def client():
         yield c
 
     config_module._db_instance = None
-    ai_service._client = None
 
 
 class TestAIStatus:
@@ -138,3 +140,1021 @@ class TestAIExplainError:
         assert response.status_code == 200
         data = response.json()
         assert data["success"] is True
+
+
+def _fake_openai(reply: str):
+    completion = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+    create = AsyncMock(return_value=completion)
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))), create
+
+
+@pytest.fixture
+def use_client(monkeypatch):
+    """Send upstream calls to a fake client for the rest of the test: ``use_client(fake)``."""
+    from pulse_tex.services.ai_assistant import AIService
+
+    return lambda fake: monkeypatch.setattr(AIService, "client", fake)
+
+
+@pytest.fixture
+def upstream(client, use_client):
+    client.patch("/api/config", json={"ai_api_key": "test-key"})
+    client.delete("/api/ai/cache")
+    fake, create = _fake_openai("Polished text")
+    use_client(fake)
+    return create
+
+
+class TestAIResponseCache:
+    def test_repeated_polish_is_served_from_cache(self, client, upstream):
+        first = client.post("/api/ai/polish", json={"text": "Some  text.\r\nMore text.  "}).json()
+        second = client.post("/api/ai/polish", json={"text": "\nSome  text.\nMore text."}).json()
+
+        assert first["content"] == second["content"] == "Polished text"
+        assert upstream.await_count == 1
+        stats = client.get("/api/ai/cache").json()
+        assert stats["entries"] == 1
+        assert stats["hits"] == 1
+
+    def test_parameters_and_operation_are_part_of_the_key(self, client, upstream):
+        client.post("/api/ai/polish", json={"text": "text"})
+        client.post("/api/ai/polish", json={"text": "text", "style": "concise"})
+        client.post("/api/ai/translate", json={"text": "text"})
+        client.post("/api/ai/generate-tikz", json={"description": "text"})
+        client.post("/api/ai/explain-error", json={"log_content": "text", "source_code": "a"})
+        client.post("/api/ai/explain-error", json={"log_content": "text", "source_code": "b"})
+
+        assert upstream.await_count == 6
+
+    def test_bypass_refreshes_the_entry(self, client, upstream, use_client):
+        client.post("/api/ai/polish", json={"text": "text"})
+        fake, fresh = _fake_openai("Better text")
+        use_client(fake)
+
+        bypassed = client.post("/api/ai/polish", json={"text": "text", "use_cache": False}).json()
+        cached = client.post("/api/ai/polish", json={"text": "text"}).json()
+
+        assert bypassed["content"] == cached["content"] == "Better text"
+        assert fresh.await_count == 1
+
+    def test_expired_entries_are_recomputed(self, client, upstream, monkeypatch):
+        client.post("/api/ai/polish", json={"text": "text"})
+        monkeypatch.setenv("PULSE_TEX_AI_CACHE_TTL_HOURS", "0")
+        client.post("/api/ai/polish", json={"text": "text"})
+        assert upstream.await_count == 2
+
+        from datetime import timedelta
+
+        from pulse_tex.services import ai_cache as cache_module
+
+        monkeypatch.delenv("PULSE_TEX_AI_CACHE_TTL_HOURS")
+        later = cache_module._now() + timedelta(days=8)
+        monkeypatch.setattr(cache_module, "_now", lambda: later)
+        client.post("/api/ai/polish", json={"text": "text"})
+        assert upstream.await_count == 3
+
+    def test_hits_are_served_from_memory_and_recorded_later(self, client, upstream, monkeypatch):
+        from pulse_tex.core import get_db
+
+        client.post("/api/ai/polish", json={"text": "text"})
+        db = get_db()
+        sessions = []
+        get_session = db.get_session
+        monkeypatch.setattr(db, "get_session", lambda: sessions.append(1) or get_session())
+
+        for _ in range(3):
+            assert client.post("/api/ai/polish", json={"text": "text"}).json()["content"] == "Polished text"
+        assert sessions == []
+        assert upstream.await_count == 1
+
+        assert client.get("/api/ai/cache").json()["hits"] == 3
+
+    def test_least_recently_used_entries_are_evicted(self, client, upstream, monkeypatch):
+        monkeypatch.setenv("PULSE_TEX_AI_CACHE_MAX_ENTRIES", "2")
+        for text in ("one", "two", "three"):
+            client.post("/api/ai/polish", json={"text": text})
+        assert client.get("/api/ai/cache").json()["entries"] == 2
+
+        client.post("/api/ai/polish", json={"text": "one"})
+        assert upstream.await_count == 4
+
+
+DOCUMENT = """\\section{Intro}
+First paragraph with $x^2$ inline math.
+
+\\begin{equation}
+a = b
+
+c = d
+\\end{equation}
+
+Second paragraph.\\footnote{A note
+
+spanning a blank line.}
+
+% \\begin{equation} in a comment does not open anything
+
+\\[
+x
+
+y
+\\]
+Last paragraph.
+"""
+
+
+def _sse_events(response) -> list[dict]:
+    events = []
+    for line in response.text.splitlines():
+        if line.startswith("data: ") and line != "data: [DONE]":
+            events.append(json.loads(line[len("data: ") :]))
+    return events
+
+
+class TestDocumentChunks:
+    def test_split_is_lossless_and_respects_latex_structure(self):
+        from pulse_tex.utils.latex_chunks import split_latex, split_paragraphs
+
+        paragraphs = split_paragraphs(DOCUMENT)
+        assert "".join(paragraphs) == DOCUMENT
+        assert [p.split("\n")[0] for p in paragraphs] == [
+            "\\section{Intro}",
+            "\\begin{equation}",
+            "Second paragraph.\\footnote{A note",
+            "% \\begin{equation} in a comment does not open anything",
+            "\\[",
+        ]
+        assert "".join(split_latex(DOCUMENT, max_chars=1)) == DOCUMENT
+        assert split_latex(DOCUMENT, max_chars=10_000) == [DOCUMENT]
+
+    def test_small_paragraphs_are_grouped_up_to_the_limit(self):
+        from pulse_tex.utils.latex_chunks import split_latex
+
+        text = "".join(f"Paragraph {i} text.\n\n" for i in range(10))
+        chunks = split_latex(text, max_chars=60)
+        assert "".join(chunks) == text
+        assert all(len(chunk) <= 60 for chunk in chunks)
+        assert len(chunks) == 4
+
+
+class TestDocumentStreaming:
+    def test_polish_document_streams_chunks_and_reassembles_in_order(self, client, monkeypatch):
+        client.patch("/api/config", json={"ai_api_key": "test-key"})
+        monkeypatch.setenv("PULSE_TEX_AI_CONCURRENCY", "2")
+        text = "".join(f"paragraph {i}\n\n" for i in range(6))
+        running = {"now": 0, "max": 0}
+
+        async def fake_polish(body, style="academic", use_cache=True):
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            await asyncio.sleep(0.01 * (6 - int(body.split()[-1])))
+            running["now"] -= 1
+            return f"  {body.upper()}  "
+
+        from pulse_tex.utils import latex_chunks
+
+        monkeypatch.setattr(
+            "pulse_tex.services.ai_assistant.split_latex", lambda t, n: latex_chunks.split_latex(t, max_chars=1)
+        )
+        with patch("pulse_tex.services.ai_assistant.AIService.polish", side_effect=fake_polish):
+            response = client.post("/api/ai/polish/document", json={"text": text})
+
+        events = _sse_events(response)
+        assert events[0] == {"type": "start", "chunks": 6}
+        chunk_events = [e for e in events if e["type"] == "chunk"]
+        assert sorted(e["index"] for e in chunk_events) == list(range(6))
+        assert [e["index"] for e in chunk_events] != list(range(6))
+        assert events[-1]["content"] == text.upper()
+        assert events[-1]["failed"] == []
+        assert running["max"] == 2
+
+    def test_failed_chunk_keeps_original_text(self, client, monkeypatch):
+        client.patch("/api/config", json={"ai_api_key": "test-key"})
+        monkeypatch.setattr(
+            "pulse_tex.services.ai_assistant.split_latex", lambda t, n: ["one\n\n", "two\n\n", "three\n"]
+        )
+
+        async def fake_translate(body, direction="en", use_cache=True):
+            if body == "two":
+                raise RuntimeError("upstream failed")
+            return body.upper()
+
+        with patch("pulse_tex.services.ai_assistant.AIService.translate", side_effect=fake_translate):
+            response = client.post("/api/ai/translate/document", json={"text": "ignored"})
+
+        done = _sse_events(response)[-1]
+        assert done["content"] == "ONE\n\ntwo\n\nTHREE\n"
+        assert done["failed"] == [1]
+
+    def test_document_mode_requires_config(self, client):
+        assert client.post("/api/ai/polish/document", json={"text": "x"}).status_code == 503
+
+
+class _FakeStream:
+    """Stands in for the SDK's ``AsyncStream``: yields delta chunks, ``delay`` seconds apart, and can be closed."""
+
+    def __init__(self, pieces: list[str], delay: float = 0.0):
+        self.pieces = pieces
+        self.delay = delay
+        self.closed = False
+
+    async def __aiter__(self):
+        for piece in self.pieces:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+            await asyncio.sleep(self.delay)
+
+    async def close(self):
+        self.closed = True
+
+
+def _fake_streaming_openai(pieces: list[str]):
+    async def create(**kwargs):
+        return _FakeStream(pieces)
+
+    create_mock = AsyncMock(side_effect=create)
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create_mock))), create_mock
+
+
+class TestAIOperationStreaming:
+    @pytest.fixture
+    def streaming(self, client, use_client):
+        client.patch("/api/config", json={"ai_api_key": "test-key"})
+        client.delete("/api/ai/cache")
+        fake, create = _fake_streaming_openai(["Pol", "ished", " text"])
+        use_client(fake)
+        return create
+
+    def test_polish_stream_yields_tokens_and_caches_the_result(self, client, streaming):
+        first = _sse_events(client.post("/api/ai/polish/stream", json={"text": "text"}))
+        second = _sse_events(client.post("/api/ai/polish/stream", json={"text": "text"}))
+        blocking = client.post("/api/ai/polish", json={"text": "text"}).json()
+
+        assert [e["content"] for e in first] == ["Pol", "ished", " text"]
+        assert [e["content"] for e in second] == ["Polished text"]
+        assert blocking["content"] == "Polished text"
+        assert streaming.await_count == 1
+        assert streaming.await_args.kwargs["stream"] is True
+
+    @pytest.mark.parametrize(
+        "path,payload",
+        [
+            ("/api/ai/translate/stream", {"text": "text"}),
+            ("/api/ai/explain-error/stream", {"log_content": "! Undefined control sequence."}),
+            ("/api/ai/generate-tikz/stream", {"description": "a circle"}),
+            ("/api/ai/generate-plot/stream", {"description": "a sine wave"}),
+        ],
+    )
+    def test_every_operation_streams(self, client, streaming, path, payload):
+        response = client.post(path, json=payload)
+        assert "text/event-stream" in response.headers["content-type"]
+        assert "".join(e["content"] for e in _sse_events(response)) == "Polished text"
+        assert response.text.endswith("data: [DONE]\n\n")
+
+    def test_stream_requires_config(self, client):
+        assert client.post("/api/ai/translate/stream", json={"text": "x"}).status_code == 503
+
+
+def _api_error(status: int, headers: dict | None = None):
+    import httpx
+    import openai
+
+    response = httpx.Response(status, headers=headers, request=httpx.Request("POST", "http://upstream/v1/chat"))
+    error_class = {429: openai.RateLimitError, 400: openai.BadRequestError}.get(status, openai.InternalServerError)
+    return error_class("upstream error", response=response, body=None)
+
+
+class TestAdmissionControl:
+    def test_concurrency_is_bounded_and_admission_is_fifo(self):
+        from pulse_tex.services.rate_limit import AdmissionController
+
+        async def scenario():
+            limiter = AdmissionController(max_concurrency=2)
+            admitted, running = [], {"now": 0, "max": 0}
+
+            async def call(i):
+                async with limiter.admit(10):
+                    admitted.append(i)
+                    running["now"] += 1
+                    running["max"] = max(running["max"], running["now"])
+                    await asyncio.sleep(0.01)
+                    running["now"] -= 1
+
+            tasks = []
+            for i in range(6):
+                tasks.append(asyncio.create_task(call(i)))
+                await asyncio.sleep(0)
+            await asyncio.gather(*tasks)
+            return admitted, running["max"], limiter.stats()
+
+        admitted, peak, stats = asyncio.run(scenario())
+        assert admitted == list(range(6))
+        assert peak == 2
+        assert stats == {"in_flight": 0, "waiting": 0}
+
+    def test_queue_timeout_raises_busy(self):
+        from pulse_tex.services.rate_limit import AdmissionController, AIBusyError
+
+        async def scenario():
+            limiter = AdmissionController(max_concurrency=1, queue_timeout=0.05)
+            async with limiter.admit(1):
+                with pytest.raises(AIBusyError):
+                    async with limiter.admit(1):
+                        pass
+            async with limiter.admit(1):
+                return limiter.stats()
+
+        assert asyncio.run(scenario()) == {"in_flight": 1, "waiting": 0}
+
+    def test_token_buckets_pace_requests(self):
+        from pulse_tex.services.rate_limit import AdmissionController, TokenBucket
+
+        bucket = TokenBucket(per_minute=600)
+        bucket.consume(600)
+        assert 0.05 < bucket.wait_time(1) <= 0.1
+        assert bucket.wait_time(10_000) <= 60
+
+        async def scenario():
+            limiter = AdmissionController(max_concurrency=10, tokens_per_minute=6000)
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            async with limiter.admit(6000):
+                pass
+            async with limiter.admit(10):
+                pass
+            return loop.time() - start
+
+        assert asyncio.run(scenario()) >= 0.09
+
+    def test_retry_delay_honours_retry_after(self):
+        from pulse_tex.services.rate_limit import BACKOFF_CAP, is_retryable, retry_delay
+
+        assert is_retryable(_api_error(429))
+        assert is_retryable(_api_error(503))
+        assert not is_retryable(_api_error(400))
+        assert retry_delay(_api_error(429, {"retry-after": "3"}), attempt=0) >= 3
+        assert all(0 <= retry_delay(_api_error(500), attempt=10) <= BACKOFF_CAP for _ in range(20))
+
+    def test_rate_limited_calls_are_retried(self, client, monkeypatch, use_client):
+        client.patch("/api/config", json={"ai_api_key": "test-key"})
+        monkeypatch.setattr("pulse_tex.services.ai_assistant.retry_delay", lambda error, attempt: 0)
+        fake, create = _fake_openai("Answer")
+        create.side_effect = [_api_error(429), _api_error(502), create.return_value]
+        use_client(fake)
+
+        response = client.post("/api/ai/chat", json={"message": "Hello"}).json()
+
+        assert response == {"success": True, "content": "Answer", "error": None}
+        assert create.await_count == 3
+
+    def test_client_errors_and_exhausted_retries_fail(self, client, monkeypatch, use_client):
+        client.patch("/api/config", json={"ai_api_key": "test-key"})
+        monkeypatch.setenv("PULSE_TEX_AI_MAX_RETRIES", "1")
+        monkeypatch.setattr("pulse_tex.services.ai_assistant.retry_delay", lambda error, attempt: 0)
+        fake, create = _fake_openai("Answer")
+        use_client(fake)
+
+        create.side_effect = _api_error(400)
+        assert client.post("/api/ai/chat", json={"message": "Hi"}).json()["success"] is False
+        assert create.await_count == 1
+
+        create.side_effect = _api_error(429)
+        assert client.post("/api/ai/chat", json={"message": "Hi"}).json()["success"] is False
+        assert create.await_count == 3
+
+    def test_status_reports_queue(self, client):
+        assert client.get("/api/ai/status").json()["queue"] == {"in_flight": 0, "waiting": 0}
+
+
+async def _drive_stream(app, path: str, body: dict, request_id: str, spec_version: str):
+    """Run one streaming request against the ASGI app.
+
+    Returns the app task, a disconnect switch, the sent bytes and the response headers.
+    """
+    disconnected = asyncio.Event()
+    first_body = asyncio.Event()
+    received = []
+    headers = {}
+    pending = [{"type": "http.request", "body": json.dumps(body).encode(), "more_body": False}]
+
+    async def receive():
+        if pending:
+            return pending.pop()
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            headers.update((k.decode(), v.decode()) for k, v in message["headers"])
+        if message["type"] == "http.response.body" and message.get("body"):
+            received.append(message["body"].decode())
+            first_body.set()
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": spec_version},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"x-request-id", request_id.encode())],
+        "client": ("127.0.0.1", 5000),
+        "server": ("testserver", 80),
+    }
+    task = asyncio.create_task(app(scope, receive, send))
+    await asyncio.wait_for(first_body.wait(), 5)
+    return task, disconnected, received, headers
+
+
+class TestStreamCancellation:
+    @pytest.fixture
+    def hanging_upstream(self, client, use_client):
+        """An upstream that sends one piece and then stalls, like a model thinking for a long time."""
+        client.patch("/api/config", json={"ai_api_key": "test-key"})
+        opened = []
+
+        async def create(**kwargs):
+            opened.append(_FakeStream(["Hel"], delay=30))
+            return opened[-1]
+
+        use_client(SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+        return client.app, opened
+
+    @pytest.mark.parametrize("spec_version", ["2.3", "2.4"])
+    def test_disconnect_closes_upstream(self, hanging_upstream, spec_version):
+        from pulse_tex.services.ai_assistant import ai_service
+        from pulse_tex.web.streaming import streams
+
+        app, opened = hanging_upstream
+
+        async def scenario():
+            task, disconnected, received, _ = await _drive_stream(
+                app, "/api/ai/chat/stream", {"message": "Hi"}, "disconnect-test", spec_version
+            )
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            disconnected.set()
+            await asyncio.wait_for(task, 5)
+            return loop.time() - start, received, ai_service.limiter.stats()
+
+        elapsed, received, queue = asyncio.run(scenario())
+
+        assert elapsed < 0.5
+        assert '"content": "Hel"' in received[0]
+        assert opened[0].closed
+        assert queue == {"in_flight": 0, "waiting": 0}
+        assert len(streams) == 0
+
+    def test_cancel_endpoint_stops_stream(self, hanging_upstream):
+        import httpx
+
+        app, opened = hanging_upstream
+
+        async def scenario():
+            task, _, received, headers = await _drive_stream(
+                app, "/api/ai/polish/stream", {"text": "Hi", "use_cache": False}, "cancel-test", "2.3"
+            )
+            stream_id = headers["x-stream-id"]
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+                guessed = await http.post("/api/ai/streams/cancel-test/cancel")
+                cancelled = await http.post(f"/api/ai/streams/{stream_id}/cancel")
+                await asyncio.wait_for(task, 1)
+                again = await http.post(f"/api/ai/streams/{stream_id}/cancel")
+            return guessed.status_code, cancelled.status_code, again.status_code, "".join(received)
+
+        guessed, cancelled, again, body = asyncio.run(scenario())
+
+        assert guessed == 404
+        assert cancelled == 200
+        assert again == 404
+        assert body.endswith('data: {"cancelled": true}\n\ndata: [DONE]\n\n')
+        assert opened[0].closed
+
+    def test_stream_reuses_request_id(self, client, use_client):
+        client.patch("/api/config", json={"ai_api_key": "test-key"})
+        use_client(_fake_streaming_openai(["Hi"])[0])
+
+        generated = client.post("/api/ai/chat/stream", json={"message": "Hi"})
+        given = client.post("/api/ai/chat/stream", json={"message": "Hi"}, headers={"X-Request-ID": "mine"})
+
+        assert len(generated.headers["x-request-id"]) == 32
+        assert given.headers["x-request-id"] == "mine"
+        assert len({generated.headers["x-stream-id"], given.headers["x-stream-id"], "mine"}) == 3
+        assert client.get("/api/ai/status").json()["streams"] == 0
+
+    def test_registry_refuses_ids_in_use(self):
+        from pulse_tex.web.streaming import StreamRegistry
+
+        async def scenario():
+            registry = StreamRegistry()
+            first = asyncio.create_task(asyncio.sleep(30))
+            second = asyncio.create_task(asyncio.sleep(30))
+            registry.register("abc", first)
+            with pytest.raises(ValueError):
+                registry.register("abc", second)
+            await asyncio.sleep(0)
+            running = not first.done()
+            for task in (first, second):
+                task.cancel()
+            return running
+
+        assert asyncio.run(scenario())
+
+
+class TestClientRegistry:
+    def test_clients_are_shared_per_settings(self):
+        from pulse_tex.services.llm_clients import MAX_CLIENTS, LLMClientRegistry
+
+        async def scenario():
+            registry = LLMClientRegistry()
+            first = registry.get("http://a.example", "key")
+            same = registry.get("http://a.example/v1", "key")
+            other_key = registry.get("http://a.example", "other")
+            for i in range(MAX_CLIENTS):
+                registry.get(f"http://b{i}.example", "key")
+            evicted_len = len(registry)
+            await registry.aclose()
+            return first, same, other_key, evicted_len
+
+        first, same, other_key, size = asyncio.run(scenario())
+
+        assert first is same
+        assert first is not other_key
+        assert str(first.base_url).startswith("http://a.example/v1")
+        assert first.max_retries == 0
+        assert size == MAX_CLIENTS
+        assert first.is_closed() and other_key.is_closed()
+
+    def test_retired_clients_close_once_idle(self):
+        from pulse_tex.services.llm_clients import MAX_CLIENTS, MAX_RETIRED, LLMClientRegistry
+
+        async def scenario():
+            registry = LLMClientRegistry()
+            busy = registry.get("http://busy.example", "key")
+            idle = registry.get("http://idle.example", "key")
+            async with registry.using(busy):
+                for i in range(MAX_CLIENTS):
+                    registry.get(f"http://new{i}.example", "key")
+                await asyncio.sleep(0)
+                states = {"idle": idle.is_closed(), "busy": busy.is_closed()}
+            await asyncio.sleep(0)
+            states["busy after"] = busy.is_closed()
+
+            held = []
+            async with AsyncExitStack() as stack:
+                for i in range(MAX_RETIRED + MAX_CLIENTS + 1):
+                    held.append(registry.get(f"http://held{i}.example", "key"))
+                    await stack.enter_async_context(registry.using(held[-1]))
+                registry.get("http://last.example", "key")
+                await asyncio.sleep(0)
+                states["oldest held"] = held[0].is_closed()
+                states["retired"] = len(registry._retired)
+            await registry.aclose()
+            return states
+
+        states = asyncio.run(scenario())
+        assert states == {
+            "idle": True,
+            "busy": False,
+            "busy after": True,
+            "oldest held": True,
+            "retired": MAX_RETIRED,
+        }
+
+    def test_clients_of_a_finished_loop_are_closed(self):
+        from pulse_tex.services.llm_clients import LLMClientRegistry
+
+        registry = LLMClientRegistry()
+
+        async def get(base_url):
+            return registry.get(base_url, "key")
+
+        async def switch():
+            client = registry.get("http://b.example", "key")
+            await asyncio.sleep(0)
+            return client
+
+        old = asyncio.run(get("http://a.example"))
+        new = asyncio.run(switch())
+        assert old.is_closed()
+        assert not new.is_closed()
+
+    def test_config_change_applies_without_restart(self, client):
+        from pulse_tex.services.ai_assistant import ai_service
+
+        client.patch("/api/config", json={"ai_api_key": "old-key", "ai_base_url": "http://old.example"})
+
+        async def scenario():
+            before = ai_service.client
+            unchanged = ai_service.client
+            client.patch("/api/config", json={"ai_api_key": "new-key", "ai_base_url": "http://new.example"})
+            return before, unchanged, ai_service.client
+
+        before, unchanged, after = asyncio.run(scenario())
+
+        assert before is unchanged
+        assert before.api_key == "old-key"
+        assert after.api_key == "new-key"
+        assert str(after.base_url).startswith("http://new.example/v1")
+
+    def test_connection_test_uses_shared_async_client(self, client, monkeypatch):
+        fake, create = _fake_openai("Hi")
+        requested = []
+        monkeypatch.setattr(
+            "pulse_tex.web.api.config.llm_clients.get", lambda base_url, api_key: requested.append(api_key) or fake
+        )
+
+        ok = client.post("/api/config/test-ai", json={"ai_api_key": "candidate", "ai_model": "m"})
+        create.side_effect = RuntimeError("refused")
+        failed = client.post("/api/config/test-ai", json={"ai_api_key": "candidate"})
+
+        assert ok.status_code == 200 and ok.json()["success"] is True
+        assert failed.status_code == 400
+        assert requested == ["candidate", "candidate"]
+        assert create.await_args.kwargs["max_tokens"] == 10
+
+
+PACKAGE_NOISE = "".join(
+    f"(/usr/share/texlive/texmf-dist/tex/latex/pkg{i}/pkg{i}.sty\nPackage: pkg{i} 2023/01/01 v1.0 (loaded)\n)\n"
+    for i in range(80)
+)
+
+PDFLATEX_LOG = f"""This is pdfTeX, Version 3.141592653-2.6-1.40.25 (TeX Live 2023) (preloaded format=pdflatex)
+entering extended mode
+(./main.tex
+LaTeX2e <2022-11-01> patch level 1
+(/usr/share/texlive/texmf-dist/tex/latex/base/article.cls
+Document Class: article 2022/07/02 v1.4n Standard LaTeX document class
+(/usr/share/texlive/texmf-dist/tex/latex/base/size10.clo))
+{PACKAGE_NOISE}(./main.aux) (./chapters/intro.tex
+! Undefined control sequence.
+l.3 Some text \\foo
+                   {{bar}}
+) (./chapters/results.tex (see the transcript file for details)
+! Missing $ inserted.
+<inserted text>
+                $
+l.7 x^
+      2
+)
+! Emergency stop.
+l.12 \\end{{document}}
+"""
+
+
+class TestErrorLogAnalysis:
+    def test_errors_are_attributed_to_the_file_being_read(self):
+        from pulse_tex.utils.texlog import analyze_log
+
+        errors = analyze_log(PDFLATEX_LOG)
+
+        assert [(e.message, e.file, e.line) for e in errors] == [
+            ("Undefined control sequence.", "chapters/intro.tex", 3),
+            ("Missing $ inserted.", "chapters/results.tex", 7),
+            ("Emergency stop.", "main.tex", 12),
+        ]
+        assert errors[0].block.endswith("{bar}")
+
+    def test_wrapped_file_names_and_file_line_errors(self):
+        from pulse_tex.utils.texlog import MAX_PRINT_LINE, analyze_log
+
+        path = "./chapters/" + "a-very-long-directory-name/" * 3 + "section.tex"
+        line = f"(/usr/share/texlive/texmf-dist/tex/latex/base/article.cls) ({path}"
+        wrapped = "\n".join(line[i : i + MAX_PRINT_LINE] for i in range(0, len(line), MAX_PRINT_LINE))
+        log = f"{wrapped}\n! Undefined control sequence.\nl.4 \\oops\n"
+        tectonic = "note: Running TeX ...\nerror: chapters/intro.tex:9: Undefined control sequence\n"
+
+        assert analyze_log(log)[0].file == path[2:]
+        assert [(e.file, e.line) for e in analyze_log(tectonic)] == [("chapters/intro.tex", 9)]
+
+    def test_context_is_compact_with_source_window(self):
+        from pulse_tex.utils.texlog import error_context
+
+        intro = "\\section{Intro}\n\nSome text \\foo{bar}\nMore text.\n"
+        context = error_context(PDFLATEX_LOG, {"chapters/intro.tex": intro})
+
+        assert ">> 3 | Some text \\foo{bar}" in context
+        assert "pkg1" not in context
+        assert len(context) * 4 < min(len(PDFLATEX_LOG), 4000)
+
+    def test_log_without_errors_keeps_its_tail(self):
+        from pulse_tex.utils.texlog import TAIL_LINES, error_context
+
+        log = "\n".join(f"line {i}" for i in range(200))
+
+        assert error_context(log) == "\n".join(f"line {i}" for i in range(200 - TAIL_LINES, 200))
+
+    def test_explain_error_reads_sources_from_project(self, client, upstream):
+        project = client.post("/api/projects", json={"name": "Broken"}).json()
+        client.post(
+            f"/api/files/{project['id']}",
+            json={"path": "chapters/intro.tex", "content": "\\section{Intro}\n\nSome text \\foo{bar}\n"},
+        )
+
+        response = client.post(
+            "/api/ai/explain-error",
+            json={"log_content": PDFLATEX_LOG, "project_id": project["id"], "use_cache": False},
+        ).json()
+
+        assert response["success"] is True
+        prompt = upstream.await_args.kwargs["messages"][-1]["content"]
+        assert ">> 3 | Some text \\foo{bar}" in prompt
+        assert "texlive" not in prompt
+        assert len(prompt) < 2000
+
+    def test_editor_buffer_is_not_shown_as_a_package_source(self, client, upstream):
+        log = (
+            "(./main.tex (/usr/share/texlive/texmf-dist/tex/latex/tools/array.sty\n"
+            "! Package array Error: Illegal pream-token (x): `c' used.\n"
+            "l.3 \\begin{tabular}{x}\n"
+            ")\n"
+            "! Undefined control sequence.\n"
+            "l.2 \\foo\n"
+            ")\n"
+        )
+        buffer = "\\documentclass{article}\n\\foo\n\\begin{tabular}{x}\n"
+
+        client.post("/api/ai/explain-error", json={"log_content": log, "source_code": buffer, "use_cache": False})
+
+        prompt = upstream.await_args.kwargs["messages"][-1]["content"]
+        assert "Source (/usr/share" not in prompt
+        assert ">> 2 | \\foo" in prompt
+
+
+INTRO_TEX = """\\section{Introduction}
+\\label{sec:intro}
+
+Diffusion models generate images by reversing a noising process.
+
+We compare against generative adversarial networks on standard benchmarks.
+"""
+
+METHOD_TEX = """\\section{Method}
+\\label{sec:method}
+
+Our sampler uses a second order solver for the reverse diffusion equation.
+
+\\begin{figure}
+\\caption{Sample quality against solver steps}
+\\label{fig:steps}
+\\end{figure}
+"""
+
+REFS_BIB = """@article{ho2020,
+  title={Denoising Diffusion Probabilistic Models},
+  author={Ho, Jonathan and Jain, Ajay and Abbeel, Pieter},
+  year={2020}
+}
+
+@inproceedings{goodfellow2014,
+  title={Generative Adversarial Nets},
+  author={Goodfellow, Ian},
+  year={2014}
+}
+"""
+
+
+class TestProjectRetrieval:
+    @pytest.fixture
+    def project(self, client):
+        project = client.post("/api/projects", json={"name": "Retrieval"}).json()
+        for path, content in (
+            ("intro.tex", INTRO_TEX),
+            ("method.tex", METHOD_TEX),
+            ("refs.bib", REFS_BIB),
+        ):
+            client.post(f"/api/files/{project['id']}", json={"path": path, "content": content})
+        return project["id"]
+
+    def test_passages_cover_paragraphs_labels_and_bib_entries(self):
+        from pulse_tex.services.retrieval import split_passages
+
+        tex = split_passages("method.tex", METHOD_TEX)
+        assert ("text", 4) in {(p.kind, p.line) for p in tex}
+        labels = {p.text for p in tex if p.kind == "label"}
+        assert "fig:steps: \\caption{Sample quality against solver steps} \\label{fig:steps}" in labels
+
+        bib = split_passages("refs.bib", REFS_BIB)
+        assert [(p.kind, p.line) for p in bib] == [("bib", 1), ("bib", 7)]
+
+    def test_search_ranks_relevant_passages(self, client, project):
+        from pulse_tex.services.retrieval import project_retrieval
+        from pulse_tex.web.dependencies import get_database
+
+        db = get_database()
+        results = project_retrieval.search(db, project, "which solver does the reverse diffusion sampler use", k=3)
+        assert results[0][1].path == "method.tex"
+        assert "second order solver" in results[0][1].text
+
+        results = project_retrieval.search(db, project, "adversarial nets Goodfellow", k=1)
+        assert results[0][1].kind == "bib"
+
+    def test_changed_files_are_reindexed(self, client, project):
+        from pulse_tex.services.retrieval import project_retrieval
+        from pulse_tex.web.dependencies import get_database
+
+        db = get_database()
+        assert project_retrieval.search(db, project, "transformer backbone") == []
+
+        client.patch(
+            f"/api/files/{project}/method.tex",
+            json={"content": "\\section{Method}\n\nA transformer backbone replaces the convolutional network.\n"},
+        )
+        client.delete(f"/api/files/{project}/refs.bib")
+
+        results = project_retrieval.search(db, project, "transformer backbone")
+        assert results and "transformer backbone" in results[0][1].text
+        assert project_retrieval.search(db, project, "Goodfellow") == []
+
+    def test_cjk_text_is_searchable(self):
+        from pulse_tex.services.retrieval import BM25Index, tokenize
+
+        assert tokenize("扩散模型") == ["扩散", "散模", "模型"]
+        index = BM25Index()
+        index.add_file("zh.tex", "我们提出一种新的扩散模型。\n\n实验部分使用公开数据集。\n")
+        assert "扩散模型" in index.search("扩散模型的原理", k=1)[0][1].text
+
+    def test_chat_includes_retrieved_passages_within_budget(self, client, project, upstream, monkeypatch):
+        monkeypatch.setenv("PULSE_TEX_AI_CONTEXT_TOKENS", "200")
+        client.post(f"/api/files/{project}", json={"path": "appendix.tex", "content": "Filler text. " * 400})
+
+        response = client.post(
+            "/api/ai/chat",
+            json={"message": "How does the sampler solve the reverse diffusion?", "project_id": project},
+        ).json()
+
+        assert response["success"] is True
+        prompt = upstream.await_args.kwargs["messages"][-1]["content"]
+        assert "[method.tex:4]\nOur sampler uses a second order solver" in prompt
+        assert "Filler text" not in prompt
+        assert prompt.endswith("My question: How does the sampler solve the reverse diffusion?")
+        assert len(prompt) < 200 * 4 + 200
+
+
+class TestChatSessions:
+    def _wait_for_summary(self, client, session_id: str) -> dict:
+        for _ in range(200):
+            session = client.get(f"/api/ai/sessions/{session_id}").json()
+            if session["summary"]:
+                return session
+            time.sleep(0.01)
+        raise AssertionError("session was not summarized")
+
+    def test_turns_are_stored_and_replayed(self, client, upstream):
+        session = client.post("/api/ai/sessions", json={}).json()
+
+        client.post("/api/ai/chat", json={"message": "Call the method FastSolve.", "session_id": session["id"]})
+        client.post("/api/ai/chat", json={"message": "What is the method called?", "session_id": session["id"]})
+
+        messages = upstream.await_args.kwargs["messages"]
+        assert [m["role"] for m in messages] == ["user", "assistant", "user"]
+        assert messages[0]["content"] == "Call the method FastSolve."
+        assert messages[-1]["content"] == "What is the method called?"
+
+        stored = client.get(f"/api/ai/sessions/{session['id']}").json()
+        assert stored["title"] == "Call the method FastSolve."
+        assert [m["role"] for m in stored["messages"]] == ["user", "assistant", "user", "assistant"]
+
+    def test_streamed_reply_is_recorded(self, client, use_client):
+        client.patch("/api/config", json={"ai_api_key": "test-key"})
+        fake, _ = _fake_streaming_openai(["Fast", "Solve"])
+        use_client(fake)
+        session = client.post("/api/ai/sessions", json={}).json()
+
+        response = client.post("/api/ai/chat/stream", json={"message": "Name it", "session_id": session["id"]})
+        assert response.status_code == 200
+
+        stored = client.get(f"/api/ai/sessions/{session['id']}").json()
+        assert [m["content"] for m in stored["messages"]] == ["Name it", "FastSolve"]
+
+    def test_unknown_and_deleted_sessions(self, client, upstream):
+        response = client.post("/api/ai/chat", json={"message": "Hi", "session_id": "missing"})
+        assert response.status_code == 404
+
+        project = client.post("/api/projects", json={"name": "Chats"}).json()
+        session = client.post("/api/ai/sessions", json={"project_id": project["id"]}).json()
+        assert [s["id"] for s in client.get(f"/api/ai/sessions?project_id={project['id']}").json()] == [session["id"]]
+
+        client.delete(f"/api/projects/{project['id']}")
+        assert client.get(f"/api/ai/sessions/{session['id']}").status_code == 404
+        assert client.delete(f"/api/ai/sessions/{session['id']}").status_code == 404
+
+    def test_old_turns_are_summarized_in_the_background(self, client, upstream, monkeypatch):
+        monkeypatch.setenv("PULSE_TEX_AI_HISTORY_TOKENS", "500")
+        session = client.post("/api/ai/sessions", json={}).json()
+        for n in range(4):
+            client.post("/api/ai/chat", json={"message": f"Turn {n}: " + "x" * 600, "session_id": session["id"]})
+
+        stored = self._wait_for_summary(client, session["id"])
+        assert stored["summary"] == "Polished text"
+        summary_prompt = next(
+            call.kwargs["messages"]
+            for call in upstream.await_args_list
+            if "running summary" in call.kwargs["messages"][0]["content"]
+        )
+        assert "Turn 0:" in summary_prompt[1]["content"]
+        assert "Turn 3:" not in summary_prompt[1]["content"]
+
+        client.post("/api/ai/chat", json={"message": "And now?", "session_id": session["id"]})
+        messages = upstream.await_args.kwargs["messages"]
+        assert messages[0] == {"role": "system", "content": "Summary of the earlier conversation:\nPolished text"}
+        assert not any("Turn 0:" in m["content"] for m in messages)
+        assert sum(len(m["content"]) for m in messages) < 500 * 4 + 200
+
+
+class TestInlineCompletion:
+    @pytest.fixture
+    def completion(self, client, use_client, monkeypatch):
+        monkeypatch.setenv("PULSE_TEX_AI_COMPLETION_DEBOUNCE_MS", "0")
+        client.patch("/api/config", json={"ai_api_key": "test-key"})
+        fake, create = _fake_openai("{equation}\n")
+        use_client(fake)
+        return create
+
+    def test_clean_completion(self):
+        from pulse_tex.services.inline_completion import clean_completion
+
+        assert clean_completion(" models are", "Diffusion") == " models are"
+        assert clean_completion("```latex\n\\end{itemize}\n```", "\\item b\n") == "\\end{itemize}"
+        assert clean_completion("\\begin{figure}", "x\n\\begin") == "{figure}"
+
+    def test_completion_is_short_and_cached_by_prefix(self, client, completion):
+        payload = {"prefix": "Energy:\n\\begin", "suffix": "\nE = mc^2", "session_id": "cached"}
+
+        first = client.post("/api/ai/complete", json=payload).json()
+        assert first == {**first, "success": True, "completion": "{equation}", "source": "upstream"}
+        kwargs = completion.await_args.kwargs
+        assert kwargs["max_tokens"] == 48
+        assert kwargs["stop"] == ["\n\n"]
+        assert kwargs["messages"][-1]["content"] == "Energy:\n\\begin<CURSOR>\nE = mc^2"
+
+        again = client.post("/api/ai/complete", json=payload).json()
+        typed = client.post("/api/ai/complete", json={**payload, "prefix": payload["prefix"] + "{eq"}).json()
+        assert (again["source"], again["completion"]) == ("cache", "{equation}")
+        assert (typed["source"], typed["completion"]) == ("cache", "uation}")
+        assert completion.await_count == 1
+
+        stats = client.get("/api/ai/status").json()["completion"]
+        assert stats["cache_hits"] >= 2
+        assert stats["latency_ms"]["p50"] is not None
+        assert stats["upstream_latency_ms"]["p95"] is not None
+
+    def test_newer_request_supersedes_pending_one(self, client, monkeypatch):
+        from pulse_tex.services.ai_assistant import ai_service
+        from pulse_tex.services.inline_completion import InlineCompleter
+
+        monkeypatch.setenv("PULSE_TEX_AI_COMPLETION_DEBOUNCE_MS", "50")
+        calls = []
+
+        async def complete_inline(prefix, suffix=""):
+            calls.append(prefix)
+            await asyncio.sleep(0.05)
+            return " done"
+
+        monkeypatch.setattr(ai_service, "complete_inline", complete_inline)
+        completer = InlineCompleter()
+
+        async def run():
+            first = asyncio.create_task(completer.complete("editor", "Typing"))
+            await asyncio.sleep(0.01)
+            second = asyncio.create_task(completer.complete("editor", "Typing mo"))
+            other = asyncio.create_task(completer.complete("other", "Elsewhere"))
+            return await asyncio.gather(first, second, other)
+
+        first, second, other = asyncio.run(run())
+        assert (first.source, first.text) == ("superseded", "")
+        assert (second.source, second.text) == ("upstream", " done")
+        assert other.source == "upstream"
+        assert sorted(calls) == ["Elsewhere", "Typing mo"]
+        assert completer.stats()["superseded"] == 1
+
+    def test_requests_without_session_are_independent(self, client, monkeypatch):
+        from pulse_tex.services.ai_assistant import ai_service
+        from pulse_tex.services.inline_completion import InlineCompleter
+
+        monkeypatch.setenv("PULSE_TEX_AI_COMPLETION_DEBOUNCE_MS", "5000")
+        calls = []
+
+        async def complete_inline(prefix, suffix=""):
+            calls.append(prefix)
+            await asyncio.sleep(0.05)
+            return " done"
+
+        monkeypatch.setattr(ai_service, "complete_inline", complete_inline)
+        completer = InlineCompleter()
+
+        async def run():
+            first = asyncio.create_task(completer.complete(None, "Client A"))
+            await asyncio.sleep(0.01)
+            second = asyncio.create_task(completer.complete(None, "Client B"))
+            return await asyncio.wait_for(asyncio.gather(first, second), timeout=2)
+
+        results = asyncio.run(run())
+        assert [r.source for r in results] == ["upstream", "upstream"]
+        assert sorted(calls) == ["Client A", "Client B"]
+
+    def test_completion_requires_config(self, client):
+        response = client.post("/api/ai/complete", json={"prefix": "x"})
+        assert response.status_code == 503
@@ -6,6 +6,10 @@ import pytest
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+db_path = Path("tests/test.db")
+if db_path.exists():
+    db_path.unlink()
+
 os.environ["PULSE_TEX_DATABASE_URL"] = "sqlite:///tests/test.db"
 os.environ["PULSE_TEX_PROJECTS_DIR"] = "tests/projects"
 
@@ -18,10 +22,6 @@ def db():
     db.init_default_config()
     yield db
 
-    db_path = Path("tests/test.db")
-    if db_path.exists():
-        db_path.unlink()
-
 
 @pytest.fixture
 def client():
@@ -73,6 +73,40 @@ class TestProjects:
         assert get_resp.status_code == 404
 
 
+class TestProjectListing:
+    def test_keyset_pagination_with_name_filter(self, client):
+        created = [client.post("/api/projects", json={"name": f"Paged_{i}"}).json()["id"] for i in range(5)]
+        client.post("/api/projects", json={"name": "Unrelated"})
+
+        seen, cursor = [], None
+        while True:
+            params = {"q": "paged_", "limit": 2, **({"cursor": cursor} if cursor else {})}
+            response = client.get("/api/projects", params=params)
+            seen += [p["id"] for p in response.json()]
+            cursor = response.headers.get("x-next-cursor")
+            if not cursor:
+                break
+
+        assert seen == list(reversed(created))
+
+    def test_stats_and_compile_status(self, client, db):
+        project_id = client.post("/api/projects", json={"name": "Stats"}).json()["id"]
+        client.post(f"/api/files/{project_id}", json={"path": "b.tex", "content": "é"})
+        before = client.get(f"/api/projects/{project_id}").json()
+
+        db.record_compile(project_id, False)
+
+        project = client.get("/api/projects", params={"q": "Stats", "stats": True}).json()[0]
+        main_size = len(client.get(f"/api/files/{project_id}/main.tex").json()["content"].encode())
+        assert project["file_count"] == 2
+        assert project["total_size"] == main_size + 2
+        assert project["last_compile_status"] == "failed"
+        assert project["updated_at"] == before["updated_at"]
+
+    def test_invalid_cursor(self, client):
+        assert client.get("/api/projects", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
 class TestFiles:
     def test_create_file(self, client):
         create_resp = client.post("/api/projects", json={"name": "Test"})
@@ -107,6 +141,212 @@ class TestFiles:
         assert get_resp.json()["content"] == "new"
 
 
+class TestFileConstraints:
+    def test_create_duplicate_file(self, client):
+        project_id = client.post("/api/projects", json={"name": "Dup"}).json()["id"]
+
+        response = client.post(f"/api/files/{project_id}", json={"path": "main.tex", "content": "again"})
+        assert response.status_code == 400
+
+    def test_create_file_missing_project(self, client):
+        response = client.post("/api/files/missing-project", json={"path": "a.tex"})
+        assert response.status_code == 404
+
+    def test_delete_missing_file(self, client):
+        project_id = client.post("/api/projects", json={"name": "Missing"}).json()["id"]
+        assert client.delete(f"/api/files/{project_id}/nope.tex").status_code == 404
+
+    def test_migration_dedupes_and_adds_unique_index(self, tmp_path):
+        from sqlalchemy import create_engine
+
+        from pulse_tex.core.migrations import MIGRATIONS, run_migrations
+
+        engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                "CREATE TABLE projects (id VARCHAR(26) PRIMARY KEY, name VARCHAR NOT NULL, description TEXT, "
+                "main_file VARCHAR, created_at DATETIME, updated_at DATETIME)"
+            )
+            conn.exec_driver_sql(
+                "CREATE TABLE project_files (id INTEGER PRIMARY KEY, project_id VARCHAR(26) NOT NULL, "
+                "path VARCHAR NOT NULL, content TEXT, created_at DATETIME, updated_at DATETIME)"
+            )
+            conn.exec_driver_sql("CREATE INDEX ix_project_files_project_id ON project_files (project_id)")
+            conn.exec_driver_sql(
+                "INSERT INTO project_files (project_id, path, content) "
+                "VALUES ('p', 'a.tex', 'old'), ('p', 'a.tex', 'new')"
+            )
+
+        run_migrations(engine)
+
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql("SELECT content FROM project_files").all()
+            indexes = {row[1]: row[2] for row in conn.exec_driver_sql("PRAGMA index_list(project_files)")}
+            version = conn.exec_driver_sql("PRAGMA user_version").scalar()
+        assert rows == [("new",)]
+        assert indexes == {"ix_project_files_project_path": 1}
+        assert version == len(MIGRATIONS)
+
+
+class TestBatchFiles:
+    def _batch(self, client, project_id, operations, **kwargs):
+        return client.post(f"/api/files/{project_id}/batch", json={"operations": operations, **kwargs})
+
+    def _contents(self, client, project_id):
+        return {f["path"]: f["content"] for f in client.get(f"/api/files/{project_id}").json()}
+
+    def test_mixed_operations(self, client):
+        project_id = client.post("/api/projects", json={"name": "Batch"}).json()["id"]
+        client.post(f"/api/files/{project_id}", json={"path": "old.tex", "content": "old"})
+
+        operations = [{"op": "create", "path": f"ch/{i}.tex", "content": str(i)} for i in range(50)]
+        operations += [
+            {"op": "update", "path": "main.tex", "content": "\\input{ch/0}"},
+            {"op": "rename", "path": "old.tex", "new_path": "legacy.tex"},
+            {"op": "delete", "path": "ch/49.tex"},
+            {"op": "update", "path": "missing.tex", "content": "x"},
+        ]
+        data = self._batch(client, project_id, operations).json()
+
+        assert data["success"] is False
+        assert [r["success"] for r in data["results"]] == [True] * 53 + [False]
+        assert data["results"][-1]["error"] == "File not found"
+
+        files = self._contents(client, project_id)
+        assert len(files) == 51
+        assert files["main.tex"] == "\\input{ch/0}"
+        assert files["legacy.tex"] == "old"
+        assert "old.tex" not in files and "ch/49.tex" not in files
+
+    def test_swap_paths_in_one_batch(self, client):
+        project_id = client.post("/api/projects", json={"name": "Swap"}).json()["id"]
+        client.post(f"/api/files/{project_id}", json={"path": "a.tex", "content": "A"})
+        client.post(f"/api/files/{project_id}", json={"path": "b.tex", "content": "B"})
+
+        operations = [
+            {"op": "rename", "path": "a.tex", "new_path": "tmp.tex"},
+            {"op": "rename", "path": "b.tex", "new_path": "a.tex"},
+            {"op": "rename", "path": "tmp.tex", "new_path": "b.tex"},
+        ]
+        assert self._batch(client, project_id, operations).json()["success"] is True
+
+        files = self._contents(client, project_id)
+        assert (files["a.tex"], files["b.tex"]) == ("B", "A")
+        revisions = client.get(f"/api/revisions/{project_id}", params={"path": "a.tex"}).json()
+        assert client.get(f"/api/revisions/{project_id}/{revisions[0]['rev']}", params={"path": "a.tex"}).json()[
+            "content"
+        ] == "B"
+
+    def test_atomic_batch_applies_nothing_on_failure(self, client):
+        project_id = client.post("/api/projects", json={"name": "Atomic"}).json()["id"]
+        operations = [
+            {"op": "create", "path": "new.tex", "content": "x"},
+            {"op": "create", "path": "main.tex", "content": "dup"},
+        ]
+        data = self._batch(client, project_id, operations, atomic=True).json()
+
+        assert [r["error"] for r in data["results"]] == ["Batch aborted", "File already exists"]
+        assert "new.tex" not in self._contents(client, project_id)
+
+    def test_missing_project(self, client):
+        assert self._batch(client, "missing", [{"op": "delete", "path": "a.tex"}]).status_code == 404
+
+
+class TestDatabaseExecutor:
+    async def test_run_executes_off_event_loop_thread(self, db):
+        import threading
+
+        assert await db.run(threading.current_thread) is not threading.current_thread()
+        assert await db.run(db.get_config, "missing-key", default="fallback") == "fallback"
+
+
+class TestFileWriteBuffer:
+    def test_buffered_update_is_read_back_before_flush(self, client):
+        from pulse_tex.core import get_db
+        from pulse_tex.models import ProjectFile
+
+        project_id = client.post("/api/projects", json={"name": "Buffered"}).json()["id"]
+        client.post(f"/api/files/{project_id}", json={"path": "a.tex", "content": "v1"})
+
+        client.patch(f"/api/files/{project_id}/a.tex", json={"content": "v2"})
+        client.patch(f"/api/files/{project_id}/a.tex", json={"content": "v3"})
+
+        db = get_db()
+        with db.get_session() as session:
+            stored = session.query(ProjectFile).filter_by(project_id=project_id, path="a.tex").one()
+            assert stored.content == "v1"
+
+        assert client.get(f"/api/files/{project_id}/a.tex").json()["content"] == "v3"
+        assert [f["content"] for f in client.get(f"/api/files/{project_id}").json() if f["path"] == "a.tex"] == ["v3"]
+
+        assert db.flush_file_writes(project_id) == 1
+        with db.get_session() as session:
+            stored = session.query(ProjectFile).filter_by(project_id=project_id, path="a.tex").one()
+            assert stored.content == "v3"
+
+    def test_buffered_update_missing_file(self, client):
+        project_id = client.post("/api/projects", json={"name": "Buffered"}).json()["id"]
+        response = client.patch(f"/api/files/{project_id}/missing.tex", json={"content": "x"})
+        assert response.status_code == 404
+
+    def test_delete_discards_pending_write(self, client):
+        from pulse_tex.core import get_db
+
+        project_id = client.post("/api/projects", json={"name": "Buffered"}).json()["id"]
+        client.post(f"/api/files/{project_id}", json={"path": "b.tex", "content": "v1"})
+        client.patch(f"/api/files/{project_id}/b.tex", json={"content": "v2"})
+        client.delete(f"/api/files/{project_id}/b.tex")
+
+        assert get_db().flush_file_writes(project_id) == 0
+        assert client.get(f"/api/files/{project_id}/b.tex").status_code == 404
+
+    def test_pending_write_is_readable_while_flushing(self, client, monkeypatch):
+        from pulse_tex.core import get_db
+
+        project_id = client.post("/api/projects", json={"name": "Buffered"}).json()["id"]
+        client.post(f"/api/files/{project_id}", json={"path": "c.tex", "content": "v1"})
+        client.patch(f"/api/files/{project_id}/c.tex", json={"content": "v2"})
+
+        db = get_db()
+        seen = []
+        stored = db._stored
+
+        def reading_stored(fs, content):
+            seen.append(db.get_file(project_id, "c.tex").content)
+            return stored(fs, content)
+
+        monkeypatch.setattr(db, "_stored", reading_stored)
+        assert db.flush_file_writes(project_id) == 1
+        assert seen == ["v2"]
+        assert db.flush_file_writes(project_id) == 0
+
+    def test_flush_does_not_overwrite_direct_write(self, client, monkeypatch):
+        import threading
+
+        from pulse_tex.core import get_db
+
+        project_id = client.post("/api/projects", json={"name": "Buffered"}).json()["id"]
+        client.post(f"/api/files/{project_id}", json={"path": "d.tex", "content": "v1"})
+        client.patch(f"/api/files/{project_id}/d.tex", json={"content": "buffered"})
+
+        db = get_db()
+        stored = db._stored
+        writers = []
+
+        def racing_stored(fs, content):
+            if not writers:
+                writer = threading.Thread(target=db.update_file, args=(project_id, "d.tex", "direct"))
+                writers.append(writer)
+                writer.start()
+                writer.join(timeout=0.2)
+            return stored(fs, content)
+
+        monkeypatch.setattr(db, "_stored", racing_stored)
+        assert db.flush_file_writes(project_id) == 1
+        writers[0].join(timeout=10)
+        assert db.get_file(project_id, "d.tex").content == "direct"
+
+
 class TestConfig:
     def test_get_config(self, client):
         response = client.get("/api/config")
@@ -122,6 +362,39 @@ class TestConfig:
         assert get_resp.json()["ai_model"] == "TestModel"
 
 
+class TestConfigCache:
+    def test_reads_served_from_snapshot(self, db):
+        from pulse_tex.models import SystemConfig
+
+        db.set_config("cache_probe", "a")
+        assert db.get_config("cache_probe") == "a"
+
+        with db.get_session() as session:
+            session.query(SystemConfig).filter_by(key="cache_probe").update({"value": "b"})
+            session.commit()
+        assert db.get_config("cache_probe") == "a"
+
+        db.update_config({"cache_probe": "c", "other_probe": "d"})
+        assert db.get_config("cache_probe") == "c"
+        assert db.get_config("other_probe") == "d"
+
+    def test_version_bump_from_other_process_invalidates(self, db, monkeypatch):
+        from pulse_tex.core.database import CONFIG_VERSION_KEY, Database
+        from pulse_tex.models import SystemConfig
+
+        db.set_config("cache_probe", "a")
+        assert db.get_config("cache_probe") == "a"
+
+        with db.get_session() as session:
+            session.query(SystemConfig).filter_by(key="cache_probe").update({"value": "b"})
+            session.query(SystemConfig).filter_by(key=CONFIG_VERSION_KEY).update({"value": "external"})
+            session.commit()
+
+        monkeypatch.setattr(Database, "_config_check_interval", 0.0)
+        assert db.get_config("cache_probe") == "b"
+        assert CONFIG_VERSION_KEY not in db.get_all_config()
+
+
 class TestConfigStatus:
     def test_get_status(self, client):
         response = client.get("/api/config/status")
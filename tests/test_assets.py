@@ -0,0 +1,223 @@
+import os
+import sys
+from io import BytesIO
+from pathlib import Path
+from zipfile import ZipFile
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+os.environ["PULSE_TEX_DATABASE_URL"] = "sqlite:///tests/test.db"
+os.environ["PULSE_TEX_PROJECTS_DIR"] = "tests/projects"
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 8
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from pulse_tex.web.app import create_app
+
+    monkeypatch.setenv("PULSE_TEX_PROJECTS_DIR", str(tmp_path))
+    app = create_app()
+    with TestClient(app) as c:
+        yield c
+
+
+def _upload(client, project_id, path, data):
+    return client.post(
+        f"/api/files/{project_id}/upload",
+        files={"file": (Path(path).name, data, "application/octet-stream")},
+        data={"path": path},
+    )
+
+
+class TestAssetUpload:
+    def test_binary_upload_is_deduplicated(self, client, tmp_path):
+        first = client.post("/api/projects", json={"name": "A"}).json()["id"]
+        second = client.post("/api/projects", json={"name": "B"}).json()["id"]
+
+        a = _upload(client, first, "figures/plot.png", PNG_BYTES).json()
+        b = _upload(client, second, "fig.png", PNG_BYTES).json()
+
+        assert a["is_binary"] and b["is_binary"]
+        assert a["blob_hash"] == b["blob_hash"]
+        assert a["blob_size"] == len(PNG_BYTES)
+        assert len([p for p in (tmp_path / "_blobs").rglob("*") if p.is_file()]) == 1
+
+        raw = client.get(f"/api/files/{second}/fig.png", params={"raw": True})
+        assert raw.status_code == 200
+        assert raw.content == PNG_BYTES
+
+    def test_text_upload_stays_editable(self, client):
+        project_id = client.post("/api/projects", json={"name": "Text"}).json()["id"]
+
+        data = _upload(client, project_id, "refs.bib", b"@article{a, title={T}}").json()
+        assert data["is_binary"] is False
+        assert data["content"] == "@article{a, title={T}}"
+
+    def test_upload_missing_project(self, client):
+        assert _upload(client, "missing", "fig.png", PNG_BYTES).status_code == 404
+
+    def test_export_includes_binary_assets(self, client):
+        project_id = client.post("/api/projects", json={"name": "Export"}).json()["id"]
+        _upload(client, project_id, "fig.png", PNG_BYTES)
+
+        response = client.get(f"/api/projects/{project_id}/export")
+        with ZipFile(BytesIO(response.content)) as zf:
+            assert zf.read("fig.png") == PNG_BYTES
+
+
+class TestArchiveImportExport:
+    def _archive(self, files):
+        buffer = BytesIO()
+        with ZipFile(buffer, "w") as zf:
+            for name, data in files.items():
+                zf.writestr(name, data)
+        return buffer.getvalue()
+
+    def test_export_includes_compiled_output(self, client, tmp_path):
+        project_id = client.post("/api/projects", json={"name": "Out"}).json()["id"]
+        (tmp_path / project_id).mkdir()
+        (tmp_path / project_id / "output.pdf").write_bytes(b"%PDF-1.5")
+
+        plain = client.get(f"/api/projects/{project_id}/export")
+        with ZipFile(BytesIO(plain.content)) as zf:
+            assert zf.namelist() == ["main.tex"]
+
+        full = client.get(f"/api/projects/{project_id}/export", params={"include_output": True})
+        with ZipFile(BytesIO(full.content)) as zf:
+            assert zf.read("output/output.pdf") == b"%PDF-1.5"
+
+    def test_import_roundtrip(self, client):
+        archive = self._archive(
+            {
+                "paper/thesis.tex": "\\documentclass{book}\n\\input{chapters/one}",
+                "paper/chapters/one.tex": "\\chapter{One}",
+                "paper/figures/plot.png": PNG_BYTES,
+            }
+        )
+        response = client.post("/api/projects/import", files={"file": ("paper.zip", archive, "application/zip")})
+        assert response.status_code == 200
+        project = response.json()
+        assert project["name"] == "paper"
+        assert project["main_file"] == "thesis.tex"
+        assert project["imported_files"] == 3
+
+        files = {f["path"]: f for f in client.get(f"/api/files/{project['id']}").json()}
+        assert files["chapters/one.tex"]["content"] == "\\chapter{One}"
+        assert files["figures/plot.png"]["is_binary"]
+
+        exported = client.get(f"/api/projects/{project['id']}/export")
+        with ZipFile(BytesIO(exported.content)) as zf:
+            assert zf.read("figures/plot.png") == PNG_BYTES
+
+    def test_import_uses_default_storage(self, client, tmp_path, monkeypatch):
+        monkeypatch.setenv("PULSE_TEX_STORAGE", "fs")
+        archive = self._archive({"main.tex": "\\documentclass{article}", "figures/plot.png": PNG_BYTES})
+        project = client.post("/api/projects/import", files={"file": ("x.zip", archive, "application/zip")}).json()
+
+        assert project["storage"] == "fs"
+        src = tmp_path / project["id"] / "src"
+        assert (src / "main.tex").read_text() == "\\documentclass{article}"
+        assert (src / "figures/plot.png").read_bytes() == PNG_BYTES
+
+    def test_import_rejects_bad_archives(self, client):
+        bad = client.post("/api/projects/import", files={"file": ("x.zip", b"not a zip", "application/zip")})
+        assert bad.status_code == 400
+
+        for name in ("../evil.tex", "/abs.tex", "a/../../evil.tex"):
+            escape = self._archive({name: "x"})
+            response = client.post("/api/projects/import", files={"file": ("x.zip", escape, "application/zip")})
+            assert response.status_code == 400
+
+
+class TestCloneAndTemplates:
+    def test_clone_copies_files_and_shares_blobs(self, client, tmp_path):
+        source = client.post("/api/projects", json={"name": "Course", "description": "Week 1"}).json()["id"]
+        client.post(f"/api/files/{source}", json={"path": "chapters/a.tex", "content": "A"})
+        client.patch(f"/api/files/{source}/main.tex", json={"content": "buffered edit"})
+        _upload(client, source, "fig.png", PNG_BYTES)
+
+        response = client.post(f"/api/projects/{source}/clone", json={"name": "Student"})
+        assert response.status_code == 200
+        clone = response.json()
+        assert clone["id"] != source
+        assert clone["description"] == "Week 1"
+
+        files = {f["path"]: f for f in client.get(f"/api/files/{clone['id']}").json()}
+        assert files["main.tex"]["content"] == "buffered edit"
+        assert files["chapters/a.tex"]["content"] == "A"
+        assert files["fig.png"]["blob_hash"] == _upload(client, source, "fig.png", PNG_BYTES).json()["blob_hash"]
+        assert len([p for p in (tmp_path / "_blobs").rglob("*") if p.is_file()]) == 1
+
+        revisions = client.get(f"/api/revisions/{clone['id']}", params={"path": "chapters/a.tex"}).json()
+        assert [r["rev"] for r in revisions] == [1]
+
+    def test_clone_missing_project(self, client):
+        assert client.post("/api/projects/missing/clone", json={"name": "X"}).status_code == 404
+
+    def test_create_project_from_template(self, client):
+        source = client.post("/api/projects", json={"name": "Template"}).json()["id"]
+        client.post(f"/api/files/{source}", json={"path": "refs.bib", "content": "@book{b}"})
+
+        assert client.put("/api/projects/templates/thesis", json={"project_id": source}).status_code == 200
+        assert {"name": "thesis", "project_id": source} in client.get("/api/projects/templates").json()
+
+        project = client.post("/api/projects", json={"name": "Mine", "template": "thesis"}).json()
+        paths = {f["path"] for f in client.get(f"/api/files/{project['id']}").json()}
+        assert paths == {"main.tex", "refs.bib"}
+
+        assert client.delete("/api/projects/templates/thesis").status_code == 200
+        response = client.post("/api/projects", json={"name": "Mine", "template": "thesis"})
+        assert response.status_code == 404
+
+        assert client.delete("/api/projects/templates/thesis").status_code == 404
+
+    def test_concurrent_template_edits_are_not_lost(self, client):
+        from concurrent.futures import ThreadPoolExecutor
+
+        from pulse_tex.core import get_db
+
+        source = client.post("/api/projects", json={"name": "Template"}).json()["id"]
+        names = [f"t{i}" for i in range(16)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            responses = list(
+                pool.map(lambda n: client.put(f"/api/projects/templates/{n}", json={"project_id": source}), names)
+            )
+        assert all(r.status_code == 200 for r in responses)
+        registered = {t["name"] for t in client.get("/api/projects/templates").json()}
+        assert set(names) <= registered
+
+        get_db().edit_json_config("project_templates", lambda templates: templates.clear())
+        assert client.get("/api/projects/templates").json() == []
+
+
+class TestBlobStore:
+    def test_link_into_hardlinks_blob(self, tmp_path):
+        from pulse_tex.services.blob_store import BlobStore
+
+        store = BlobStore(tmp_path / "blobs")
+        digest, size = store.save_bytes(PNG_BYTES)
+        assert size == len(PNG_BYTES)
+
+        target = tmp_path / "build" / "fig.png"
+        store.link_into(digest, target)
+        assert target.read_bytes() == PNG_BYTES
+        assert os.stat(target).st_ino == os.stat(store.path_for(digest)).st_ino
+
+
+class TestStreamZip:
+    def test_stream_is_a_valid_archive(self, tmp_path):
+        from pulse_tex.utils.zipstream import stream_zip
+
+        big = tmp_path / "big.bin"
+        big.write_bytes(os.urandom(300 * 1024))
+        chunks = list(stream_zip([("a.tex", "hello"), ("big.bin", big), ("raw.dat", b"\x00\x01")]))
+
+        assert len(chunks) > 3
+        with ZipFile(BytesIO(b"".join(chunks))) as zf:
+            assert zf.testzip() is None
+            assert zf.read("a.tex") == b"hello"
+            assert zf.read("big.bin") == big.read_bytes()
@@ -1,6 +1,8 @@
+import json
 import os
 import sys
 from pathlib import Path
+from types import SimpleNamespace
 from unittest.mock import patch
 
 import pytest
@@ -169,3 +171,62 @@ class TestDiagramPage:
         assert response.status_code == 200
         assert "Diagram Workbench" in response.text
         assert "excalidraw" in response.text.lower()
+
+
+class TestDiagramStreaming:
+    @pytest.fixture
+    def upstream(self, client, monkeypatch):
+        from pulse_tex.services.ai_assistant import AIService
+
+        pieces = ["Here you go:\n```xml\n<svg viewBox='0 0 10 10'>", "<rect/>", "</svg>\n```"]
+
+        class Stream:
+            async def __aiter__(self):
+                for piece in pieces:
+                    yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+            async def close(self):
+                pass
+
+        async def create(**kwargs):
+            return Stream()
+
+        monkeypatch.setattr(
+            AIService, "client", SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        )
+
+    def _events(self, response):
+        return [json.loads(line[6:]) for line in response.text.splitlines() if line.startswith("data: {")]
+
+    def test_generate_stream_ends_with_extracted_svg(self, client, upstream):
+        response = client.post("/api/diagram/generate/stream", json={"description": "A flowchart"})
+
+        events = self._events(response)
+        assert [e["content"] for e in events[:-1]] == [
+            "Here you go:\n```xml\n<svg viewBox='0 0 10 10'>",
+            "<rect/>",
+            "</svg>\n```",
+        ]
+        assert events[-1]["result"] == {
+            "svg": "<svg viewBox='0 0 10 10'><rect/></svg>",
+            "style": "nature",
+            "style_name": "Nature",
+            "diagram_type": "flowchart",
+        }
+
+    def test_refine_iterate_and_tikz_stream(self, client, upstream):
+        refine = self._events(
+            client.post("/api/diagram/refine/stream", json={"sketch_svg": "<svg/>", "description": "tidy"})
+        )
+        iterate = self._events(
+            client.post("/api/diagram/iterate/stream", json={"current_svg": "<svg/>", "feedback": "bigger"})
+        )
+        tikz = self._events(client.post("/api/diagram/svg-to-tikz/stream", json={"svg": "<svg/>"}))
+
+        assert refine[-1]["result"]["refined_svg"] == "<svg viewBox='0 0 10 10'><rect/></svg>"
+        assert iterate[-1]["result"]["feedback_addressed"] == "bigger"
+        assert "tikz" in tikz[-1]["result"]
+
+    def test_stream_requires_config(self, client_no_ai):
+        response = client_no_ai.post("/api/diagram/generate/stream", json={"description": "x"})
+        assert response.status_code == 503
@@ -50,6 +50,135 @@ class TestCompile:
         assert response.status_code == 404
 
 
+class TestCompileSnapshots:
+    @pytest.fixture
+    def builds(self, tmp_path, monkeypatch):
+        from pulse_tex.web.api import compile as compile_api
+
+        monkeypatch.setenv("PULSE_TEX_PROJECTS_DIR", str(tmp_path))
+        runs = []
+
+        def fake_tectonic(main_file, tmpdir):
+            source = (Path(tmpdir) / main_file).read_bytes()
+            runs.append(source)
+            (Path(tmpdir) / main_file.replace(".tex", ".pdf")).write_bytes(b"%PDF " + source)
+            return True, "fake build"
+
+        monkeypatch.setattr(compile_api, "compile_with_tectonic", fake_tectonic)
+        return runs
+
+    def _project(self, client):
+        project_id = client.post("/api/projects", json={"name": "Snapshot"}).json()["id"]
+        client.patch(f"/api/files/{project_id}/main.tex", json={"content": "version one"})
+        return project_id
+
+    def test_build_id_caches_identical_inputs(self, client, builds):
+        project_id = self._project(client)
+
+        first = client.post(f"/api/compile/{project_id}").json()
+        again = client.post(f"/api/compile/{project_id}").json()
+        assert first["success"] and not first["cached"]
+        assert again["cached"] and again["build_id"] == first["build_id"]
+        assert builds == [b"version one"]
+
+        client.patch(f"/api/files/{project_id}/main.tex", json={"content": "version two"})
+        second = client.post(f"/api/compile/{project_id}").json()
+        assert second["build_id"] != first["build_id"]
+        assert builds[-1] == b"version two"
+
+        forced = client.post(f"/api/compile/{project_id}", params={"force": True}).json()
+        assert not forced["cached"] and len(builds) == 3
+
+    def test_build_info_describes_current_pdf(self, client, builds):
+        import hashlib
+
+        project_id = self._project(client)
+        result = client.post(f"/api/compile/{project_id}").json()
+
+        info = client.get(f"/api/compile/{project_id}/build").json()
+        assert info["build_id"] == result["build_id"]
+        assert info["files"]["main.tex"] == hashlib.sha256(b"version one").hexdigest()
+        assert "log" not in info
+
+        pdf = client.get(f"/api/compile/{project_id}/pdf")
+        assert pdf.headers["x-build-id"] == result["build_id"]
+        assert pdf.content == b"%PDF version one"
+
+    def test_superseded_build_does_not_publish(self, client, builds, monkeypatch):
+        from pulse_tex.web.api import compile as compile_api
+
+        project_id = self._project(client)
+        client.post(f"/api/compile/{project_id}")
+        client.patch(f"/api/files/{project_id}/main.tex", json={"content": "stale"})
+
+        real_tectonic = compile_api.compile_with_tectonic
+
+        def newer_build_starts(main_file, tmpdir):
+            compile_api._latest_builds[project_id] = "newer"
+            return real_tectonic(main_file, tmpdir)
+
+        monkeypatch.setattr(compile_api, "compile_with_tectonic", newer_build_starts)
+        result = client.post(f"/api/compile/{project_id}").json()
+
+        assert result["superseded"] and not result["success"]
+        assert client.get(f"/api/compile/{project_id}/pdf").content == b"%PDF version one"
+
+    def test_revert_during_build_keeps_the_current_inputs(self, client, builds, monkeypatch):
+        import threading
+        import time
+
+        from pulse_tex.web.api import compile as compile_api
+
+        project_id = self._project(client)
+        real_tectonic = compile_api.compile_with_tectonic
+        gates = {b"version one": threading.Event(), b"version two": threading.Event()}
+
+        def gated_tectonic(main_file, tmpdir):
+            gates[(Path(tmpdir) / main_file).read_bytes()].wait(10)
+            return real_tectonic(main_file, tmpdir)
+
+        def wait_for(condition):
+            deadline = time.monotonic() + 5
+            while not condition() and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        monkeypatch.setattr(compile_api, "compile_with_tectonic", gated_tectonic)
+        results = {}
+
+        def compile_in_background(name):
+            def run():
+                try:
+                    results[name] = client.post(f"/api/compile/{project_id}").json()
+                except Exception as e:
+                    results[name] = {"error": repr(e)}
+
+            thread = threading.Thread(target=run)
+            thread.start()
+            return thread
+
+        first = compile_in_background("first")
+        wait_for(lambda: len(compile_api._inflight_builds) == 1)
+        client.patch(f"/api/files/{project_id}/main.tex", json={"content": "version two"})
+        second = compile_in_background("second")
+        wait_for(lambda: len(compile_api._inflight_builds) == 2)
+        newer = compile_api._latest_builds[project_id]
+
+        client.patch(f"/api/files/{project_id}/main.tex", json={"content": "version one"})
+        reverted = compile_in_background("reverted")
+        wait_for(lambda: compile_api._latest_builds[project_id] != newer)
+
+        gates[b"version two"].set()
+        second.join(10)
+        gates[b"version one"].set()
+        first.join(10)
+        reverted.join(10)
+
+        assert results["second"]["superseded"], results
+        assert results["reverted"]["success"] and results["first"]["success"]
+        assert results["reverted"]["build_id"] == results["first"]["build_id"]
+        assert client.get(f"/api/compile/{project_id}/pdf").content == b"%PDF version one"
+
+
 class TestEditorPage:
     def test_editor_page_loads(self, client):
         create_resp = client.post("/api/projects", json={"name": "EditorTest"})
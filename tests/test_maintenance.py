@@ -0,0 +1,273 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+os.environ["PULSE_TEX_DATABASE_URL"] = "sqlite:///tests/test.db"
+os.environ["PULSE_TEX_PROJECTS_DIR"] = "tests/projects"
+
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + bytes(range(256))
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from pulse_tex.web.app import create_app
+
+    monkeypatch.setenv("PULSE_TEX_PROJECTS_DIR", str(tmp_path / "projects"))
+    app = create_app()
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def bloated_engine(tmp_path):
+    """A WAL-mode database whose rows were mostly deleted, leaving free pages and a large WAL."""
+    from sqlalchemy import create_engine, event
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'bloated.db'}")
+
+    @event.listens_for(engine, "connect")
+    def set_wal(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE blobs (id INTEGER PRIMARY KEY, data BLOB)")
+        conn.exec_driver_sql(
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 500) "
+            "INSERT INTO blobs (data) SELECT randomblob(4096) FROM n"
+        )
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM blobs WHERE id > 10")
+    yield engine
+    engine.dispose()
+
+
+class TestRunMaintenance:
+    def test_vacuum_reclaims_free_pages_and_truncates_wal(self, bloated_engine):
+        from pulse_tex.core.maintenance import database_sizes, run_maintenance
+
+        assert database_sizes(bloated_engine)["wal_bytes"] > 0
+
+        report = run_maintenance(bloated_engine)
+
+        assert report["vacuumed"] is True
+        assert report["checkpoint"]["busy"] is False
+        assert report["after"]["wal_bytes"] == 0
+        assert report["after"]["free_pages"] == 0
+        assert report["after"]["db_bytes"] < report["before"]["db_bytes"] + report["before"]["wal_bytes"]
+        with bloated_engine.connect() as conn:
+            assert conn.exec_driver_sql("SELECT count(*) FROM blobs").scalar() == 10
+
+    def test_auto_vacuum_depends_on_free_ratio(self, bloated_engine):
+        from pulse_tex.core.maintenance import run_maintenance
+
+        run_maintenance(bloated_engine, vacuum=False)
+        assert run_maintenance(bloated_engine, vacuum=None)["vacuumed"] is True
+        assert run_maintenance(bloated_engine, vacuum=None)["vacuumed"] is False
+
+    def test_in_memory_database_is_skipped(self):
+        from sqlalchemy import create_engine
+
+        from pulse_tex.core.maintenance import run_maintenance
+
+        report = run_maintenance(create_engine("sqlite://"))
+        assert report["vacuumed"] is False
+        assert report["checkpoint"] is None
+
+
+class TestDatabaseMaintain:
+    def test_reports_project_sizes(self, client):
+        from pulse_tex.core import get_db
+
+        project = client.post("/api/projects", json={"name": "Maintained"}).json()
+        client.post(f"/api/files/{project['id']}", json={"path": "big.tex", "content": "x" * 5000})
+
+        report = get_db().maintain(vacuum=False)
+
+        sizes = {p["id"]: p for p in report["projects"]}
+        assert sizes[project["id"]]["file_bytes"] >= 5000
+        assert sizes[project["id"]]["revision_bytes"] >= 5000
+        assert report["vacuumed"] is False
+        assert report["after"]["db_bytes"] > 0
+
+    def test_compacts_old_revisions(self, client, monkeypatch):
+        from datetime import datetime
+
+        from sqlalchemy import update
+
+        from pulse_tex.core import get_db
+        from pulse_tex.models import FileRevision
+
+        monkeypatch.setenv("PULSE_TEX_REVISION_MIN_INTERVAL", "0")
+        project = client.post("/api/projects", json={"name": "History"}).json()
+        client.post(f"/api/files/{project['id']}", json={"path": "notes.tex", "content": "v0"})
+        db = get_db()
+        for n in range(1, 5):
+            db.update_file(project["id"], "notes.tex", f"v{n}")
+        with db.get_session() as session:
+            session.execute(
+                update(FileRevision)
+                .where(FileRevision.project_id == project["id"])
+                .values(created_at=datetime(2020, 1, 1))
+            )
+            session.commit()
+
+        assert db.maintain(vacuum=False, compact_days=0)["revisions_removed"] == 0
+        assert db.maintain(vacuum=False, compact_days=30)["revisions_removed"] == 4
+        assert [r.rev for r in db.list_revisions(project["id"], "notes.tex")] == [5]
+
+    def test_cli_maintain(self, client, tmp_path, monkeypatch):
+        from click.testing import CliRunner
+
+        from pulse_tex.cli import cli
+
+        monkeypatch.setenv("PULSE_TEX_DATABASE_URL", os.environ["PULSE_TEX_DATABASE_URL"])
+        monkeypatch.setenv("PULSE_TEX_PROJECTS_DIR", os.environ["PULSE_TEX_PROJECTS_DIR"])
+        (tmp_path / "data").mkdir(exist_ok=True)
+        (tmp_path / "data" / "pulse_tex.db").touch()
+
+        result = CliRunner().invoke(cli, ["db", "maintain", str(tmp_path), "--no-vacuum", "--top", "3"])
+
+        assert result.exit_code == 0, result.output
+        assert "VACUUM: skipped" in result.output
+        assert "Revisions compacted:" in result.output
+        assert "Maintenance complete" in result.output
+
+    def test_cli_maintain_requires_init(self, tmp_path):
+        from click.testing import CliRunner
+
+        from pulse_tex.cli import cli
+
+        result = CliRunner().invoke(cli, ["db", "maintain", str(tmp_path)])
+        assert "tex-serve init" in result.output
+
+
+def _age(path: Path, seconds: float = 7 * 3600) -> None:
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def _fake_outputs(projects_dir: Path, project_id: str, size: int) -> Path:
+    output_dir = projects_dir / project_id
+    output_dir.mkdir(parents=True, exist_ok=True)
+    (output_dir / "output.pdf").write_bytes(b"%PDF" + b"0" * size)
+    (output_dir / "build.json").write_text("{}")
+    return output_dir
+
+
+class TestGarbageCollection:
+    def test_delete_project_removes_its_directory(self, client, tmp_path):
+        project = client.post("/api/projects", json={"name": "Doomed"}).json()
+        output_dir = _fake_outputs(tmp_path / "projects", project["id"], 100)
+
+        client.delete(f"/api/projects/{project['id']}")
+
+        assert not output_dir.exists()
+
+    def test_removes_orphans_and_unreferenced_blobs(self, client, tmp_path):
+        from pulse_tex.core import get_db
+        from pulse_tex.core.disk import collect_garbage
+        from pulse_tex.services.blob_store import blob_store
+
+        projects_dir = tmp_path / "projects"
+        project = client.post("/api/projects", json={"name": "Kept"}).json()
+        client.post(
+            f"/api/files/{project['id']}/upload",
+            files={"file": ("fig.png", PNG_BYTES, "image/png")},
+            data={"path": "fig.png"},
+        )
+        kept_outputs = _fake_outputs(projects_dir, project["id"], 100)
+        stale_orphan = _fake_outputs(projects_dir, "01STALEORPHAN0000000000000", 100)
+        fresh_orphan = _fake_outputs(projects_dir, "01FRESHORPHAN0000000000000", 100)
+        _age(stale_orphan)
+        digest, _ = blob_store.save_bytes(b"nobody references me")
+        referenced = [p for p in blob_store.root.rglob("*") if p.is_file() and p != blob_store.path_for(digest)]
+        for path in [blob_store.path_for(digest), *referenced]:
+            _age(path)
+
+        dry = collect_garbage(get_db(), dry_run=True)
+        assert dry["removed_projects"] == [stale_orphan.name]
+        assert dry["removed_blobs"] == 1
+        assert stale_orphan.exists() and blob_store.exists(digest)
+
+        report = collect_garbage(get_db())
+
+        assert report["removed_projects"] == [stale_orphan.name]
+        assert report["removed_blobs"] == 1
+        assert report["freed_bytes"] == dry["freed_bytes"]
+        assert not stale_orphan.exists()
+        assert fresh_orphan.exists()
+        assert kept_outputs.exists()
+        assert not blob_store.exists(digest)
+        assert all(path.exists() for path in referenced)
+        assert client.get(f"/api/files/{project['id']}/fig.png", params={"raw": True}).content == PNG_BYTES
+
+    def test_quota_evicts_least_recently_used_outputs(self, client, tmp_path):
+        from pulse_tex.core import get_db
+        from pulse_tex.core.disk import collect_garbage, disk_usage
+
+        projects_dir = tmp_path / "projects"
+        old = client.post("/api/projects", json={"name": "Old"}).json()
+        new = client.post("/api/projects", json={"name": "New"}).json()
+        time.sleep(0.01)
+        assert client.patch(f"/api/projects/{new['id']}", json={"description": "touched"}).status_code == 200
+        _fake_outputs(projects_dir, old["id"], 10_000)
+        _fake_outputs(projects_dir, new["id"], 10_000)
+
+        usage = disk_usage(get_db())
+        sizes = {p["id"]: p["output_bytes"] for p in usage["projects"]}
+        assert sizes[old["id"]] > 10_000
+        quota = usage["total_bytes"] - 5_000
+
+        report = collect_garbage(get_db(), quota_bytes=quota)
+
+        assert report["evicted_outputs"] == [old["id"]]
+        assert not report["over_quota"]
+        assert not (projects_dir / old["id"] / "output.pdf").exists()
+        assert (projects_dir / new["id"] / "output.pdf").exists()
+
+    def test_temp_named_sources_are_kept(self, client, tmp_path):
+        from pulse_tex.core import get_db
+        from pulse_tex.core.disk import collect_garbage
+        from pulse_tex.core.storage import TEMP_PREFIX
+
+        project = client.post("/api/projects", json={"name": "Data", "storage": "fs"}).json()
+        project_dir = tmp_path / "projects" / project["id"]
+        source = project_dir / "src" / "data.tmp"
+        source.write_text("1 2 3\n")
+        assert "data.tmp" in [f["path"] for f in client.get(f"/api/files/{project['id']}").json()]
+        write_temp = project_dir / "src" / f"{TEMP_PREFIX}abc"
+        write_temp.write_text("partial")
+        publish_temp = project_dir / ".output.pdf.tmp"
+        publish_temp.write_bytes(b"%PDF")
+        for path in (source, write_temp, publish_temp):
+            _age(path)
+
+        collect_garbage(get_db(), 0)
+
+        assert source.read_text() == "1 2 3\n"
+        assert not write_temp.exists() and not publish_temp.exists()
+        assert "data.tmp" in [f["path"] for f in client.get(f"/api/files/{project['id']}").json()]
+
+    def test_cli_gc_dry_run(self, client, tmp_path, monkeypatch):
+        from click.testing import CliRunner
+
+        from pulse_tex.cli import cli
+
+        monkeypatch.setenv("PULSE_TEX_DATABASE_URL", os.environ["PULSE_TEX_DATABASE_URL"])
+        (tmp_path / "data").mkdir(exist_ok=True)
+        (tmp_path / "data" / "pulse_tex.db").touch()
+        orphan = _fake_outputs(tmp_path / "projects", "01ORPHAN000000000000000000", 100)
+        _age(orphan)
+
+        result = CliRunner().invoke(cli, ["gc", str(tmp_path), "--dry-run"])
+
+        assert result.exit_code == 0, result.output
+        assert "Would remove 1 deleted project directories" in result.output
+        assert orphan.exists()
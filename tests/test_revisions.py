@@ -0,0 +1,226 @@
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+db_path = Path("tests/test_revisions.db")
+if db_path.exists():
+    db_path.unlink()
+
+os.environ["PULSE_TEX_DATABASE_URL"] = "sqlite:///tests/test_revisions.db"
+os.environ["PULSE_TEX_PROJECTS_DIR"] = "tests/projects"
+
+
+@pytest.fixture
+def session():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from pulse_tex.models import Base
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as s:
+        yield s
+
+
+@pytest.fixture
+def client(monkeypatch):
+    from fastapi.testclient import TestClient
+    from pulse_tex.web.app import create_app
+
+    monkeypatch.setenv("PULSE_TEX_REVISION_MIN_INTERVAL", "0")
+    app = create_app()
+    with TestClient(app) as c:
+        yield c
+
+
+def _versions(n):
+    return [f"\\section{{Intro}}\nline {i}\nshared line\n" + "x\n" * (i % 5) for i in range(n)]
+
+
+def _longest_delta_chain(revisions):
+    longest = run = 0
+    for revision in revisions:
+        run = run + 1 if revision.kind == "delta" else 0
+        longest = max(longest, run)
+    return longest
+
+
+class TestDelta:
+    def test_roundtrip(self):
+        from pulse_tex.utils.delta import apply_delta, make_delta
+
+        base = "a\nb\nc\nd\n"
+        target = "a\nB\nc\nd\ne"
+        assert apply_delta(base, make_delta(base, target)) == target
+        assert apply_delta(target, make_delta(target, "")) == ""
+
+
+class TestRevisionChain:
+    def test_every_revision_reconstructs(self, session):
+        from pulse_tex.core.revisions import RevisionPolicy, list_revisions, reconstruct_revision, record_revision
+
+        policy = RevisionPolicy(min_interval=0, snapshot_every=4, max_per_file=0)
+        start = datetime(2026, 1, 1)
+        versions = _versions(15)
+        for i, content in enumerate(versions):
+            record_revision(session, "p", "main.tex", content, start + timedelta(minutes=i), policy)
+        session.commit()
+
+        revisions = list_revisions(session, "p", "main.tex")
+        assert [r.rev for r in revisions] == list(range(15, 0, -1))
+        assert revisions[0].kind == "snapshot"
+        assert {r.rev for r in revisions if r.kind == "snapshot"} == {4, 8, 12, 15}
+        for i, content in enumerate(versions):
+            assert reconstruct_revision(session, "p", "main.tex", i + 1) == content
+
+    def test_saves_within_interval_replace_head(self, session):
+        from pulse_tex.core.revisions import RevisionPolicy, list_revisions, reconstruct_revision, record_revision
+
+        policy = RevisionPolicy(min_interval=60, snapshot_every=10, max_per_file=0)
+        start = datetime(2026, 1, 1)
+        record_revision(session, "p", "a.tex", "one\n", start, policy)
+        record_revision(session, "p", "a.tex", "two\n", start + timedelta(minutes=5), policy)
+        record_revision(session, "p", "a.tex", "two and a half\n", start + timedelta(minutes=5, seconds=10), policy)
+        session.commit()
+
+        assert len(list_revisions(session, "p", "a.tex")) == 2
+        assert reconstruct_revision(session, "p", "a.tex", 1) == "one\n"
+        assert reconstruct_revision(session, "p", "a.tex", 2) == "two and a half\n"
+
+    def test_coalescing_does_not_diff(self, session, monkeypatch):
+        from pulse_tex.core import revisions
+        from pulse_tex.core.revisions import RevisionPolicy, list_revisions, reconstruct_revision, record_revision
+
+        policy = RevisionPolicy(min_interval=60, snapshot_every=10, max_per_file=0)
+        start = datetime(2026, 1, 1)
+        versions = _versions(4)
+        record_revision(session, "p", "a.tex", versions[0], start, policy)
+        record_revision(session, "p", "a.tex", versions[1], start + timedelta(minutes=5), policy)
+
+        diffs = []
+        make_delta = revisions.make_delta
+        monkeypatch.setattr(revisions, "make_delta", lambda *args: diffs.append(args) or make_delta(*args))
+        for second in range(1, 20):
+            record_revision(
+                session, "p", "a.tex", f"burst {second}\n", start + timedelta(minutes=5, seconds=second), policy
+            )
+        record_revision(session, "p", "a.tex", versions[2], start + timedelta(minutes=5, seconds=30), policy)
+        assert diffs == []
+
+        record_revision(session, "p", "a.tex", versions[3], start + timedelta(minutes=10), policy)
+        session.commit()
+
+        assert [r.kind for r in list_revisions(session, "p", "a.tex")] == ["snapshot", "delta", "delta"]
+        assert reconstruct_revision(session, "p", "a.tex", 1) == versions[0]
+        assert reconstruct_revision(session, "p", "a.tex", 2) == versions[2]
+        assert reconstruct_revision(session, "p", "a.tex", 3) == versions[3]
+
+    def test_retention_drops_oldest(self, session):
+        from pulse_tex.core.revisions import RevisionPolicy, list_revisions, reconstruct_revision, record_revision
+
+        policy = RevisionPolicy(min_interval=0, snapshot_every=3, max_per_file=5)
+        start = datetime(2026, 1, 1)
+        versions = _versions(12)
+        for i, content in enumerate(versions):
+            record_revision(session, "p", "a.tex", content, start + timedelta(minutes=i), policy)
+        session.commit()
+
+        assert [r.rev for r in list_revisions(session, "p", "a.tex")] == [12, 11, 10, 9, 8]
+        assert reconstruct_revision(session, "p", "a.tex", 8) == versions[7]
+        assert reconstruct_revision(session, "p", "a.tex", 7) is None
+
+    def test_compaction_thins_old_days(self, session):
+        from pulse_tex.core.revisions import (
+            RevisionPolicy,
+            compact_revisions,
+            list_revisions,
+            reconstruct_revision,
+            record_revision,
+        )
+
+        policy = RevisionPolicy(min_interval=0, snapshot_every=50, max_per_file=0)
+        start = datetime(2026, 1, 1)
+        versions = _versions(12)
+        for i, content in enumerate(versions):
+            record_revision(session, "p", "a.tex", content, start + timedelta(hours=6 * i), policy)
+        session.commit()
+
+        removed = compact_revisions(session, "p", "a.tex", policy, older_than=start + timedelta(days=2))
+        session.commit()
+
+        remaining = [r.rev for r in list_revisions(session, "p", "a.tex")]
+        assert removed == 12 - len(remaining)
+        assert remaining == [12, 11, 10, 9, 8, 4]
+        for rev in remaining:
+            assert reconstruct_revision(session, "p", "a.tex", rev) == versions[rev - 1]
+
+    def test_compaction_bounds_delta_chains(self, session):
+        from pulse_tex.core.revisions import (
+            RevisionPolicy,
+            compact_revisions,
+            list_revisions,
+            reconstruct_revision,
+            record_revision,
+        )
+
+        policy = RevisionPolicy(min_interval=0, snapshot_every=5, max_per_file=0)
+        start = datetime(2026, 1, 1)
+        versions = _versions(43)
+        for i, content in enumerate(versions[:40]):
+            record_revision(session, "p", "a.tex", content, start + timedelta(hours=6 * i), policy)
+        session.commit()
+
+        compact_revisions(session, "p", "a.tex", policy, older_than=start + timedelta(days=9))
+        session.commit()
+        remaining = [r.rev for r in list_revisions(session, "p", "a.tex")]
+        assert remaining == [40, 39, 38, 37, 36, 32, 28, 24, 20, 16, 12, 8, 4]
+        assert _longest_delta_chain(list_revisions(session, "p", "a.tex")) <= policy.snapshot_every - 1
+
+        for i in range(40, 43):
+            record_revision(session, "p", "a.tex", versions[i], start + timedelta(hours=6 * i), policy)
+        session.commit()
+        assert _longest_delta_chain(list_revisions(session, "p", "a.tex")) <= policy.snapshot_every - 1
+        for rev in [41, 42, 43, *remaining]:
+            assert reconstruct_revision(session, "p", "a.tex", rev) == versions[rev - 1]
+
+    def test_listing_skips_revision_data(self, session):
+        from sqlalchemy import inspect
+
+        from pulse_tex.core.revisions import RevisionPolicy, list_revisions, record_revision
+
+        record_revision(session, "p", "a.tex", "content", datetime(2026, 1, 1), RevisionPolicy())
+        session.commit()
+        session.expunge_all()
+
+        (revision,) = list_revisions(session, "p", "a.tex")
+        assert "data" in inspect(revision).unloaded
+        assert revision.to_dict()["size"] == len("content")
+
+
+class TestRevisionAPI:
+    def test_list_get_and_restore(self, client):
+        project_id = client.post("/api/projects", json={"name": "History"}).json()["id"]
+        client.post(f"/api/files/{project_id}", json={"path": "a.tex", "content": "first"})
+        client.patch(f"/api/files/{project_id}/a.tex", json={"content": "second"})
+        client.post(f"/api/compile/{project_id}")
+
+        listing = client.get(f"/api/revisions/{project_id}", params={"path": "a.tex"}).json()
+        assert [r["rev"] for r in listing] == [2, 1]
+
+        first = client.get(f"/api/revisions/{project_id}/1", params={"path": "a.tex"}).json()
+        assert first["content"] == "first"
+
+        restored = client.post(f"/api/revisions/{project_id}/1/restore", params={"path": "a.tex"})
+        assert restored.status_code == 200
+        assert client.get(f"/api/files/{project_id}/a.tex").json()["content"] == "first"
+
+    def test_missing_revision(self, client):
+        project_id = client.post("/api/projects", json={"name": "History"}).json()["id"]
+        response = client.get(f"/api/revisions/{project_id}/42", params={"path": "main.tex"})
+        assert response.status_code == 404
@@ -0,0 +1,104 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+db_path = Path("tests/test_search.db")
+if db_path.exists():
+    db_path.unlink()
+
+os.environ["PULSE_TEX_DATABASE_URL"] = "sqlite:///tests/test_search.db"
+os.environ["PULSE_TEX_PROJECTS_DIR"] = "tests/projects"
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    from pulse_tex.web.app import create_app
+
+    app = create_app()
+    with TestClient(app) as c:
+        yield c
+
+
+def _project(client, name, files):
+    project_id = client.post("/api/projects", json={"name": name}).json()["id"]
+    for path, content in files.items():
+        client.post(f"/api/files/{project_id}", json={"path": path, "content": content})
+    return project_id
+
+
+class TestSearch:
+    def test_ranked_highlighted_results(self, client):
+        first = _project(client, "Quantum", {"intro.tex": "Entanglement of qubits <b>\nTopological qubits qubits"})
+        _project(client, "Other", {"intro.tex": "A short note on qubits."})
+
+        data = client.get("/api/search", params={"q": "qubits"}).json()
+        paths = [(r["project_id"], r["path"]) for r in data["results"]]
+        assert (first, "intro.tex") == paths[0]
+        assert "<mark>qubits</mark>" in data["results"][0]["snippet"]
+        assert "&lt;b&gt;" in data["results"][0]["snippet"]
+
+        scoped = client.get("/api/search", params={"q": "qubits", "project_id": first}).json()
+        assert {r["project_id"] for r in scoped["results"]} == {first}
+
+    def test_index_follows_updates_and_deletes(self, client):
+        project_id = _project(client, "Sync", {"a.tex": "alpha"})
+        client.patch(f"/api/files/{project_id}/a.tex", json={"content": "bravozulu"})
+
+        def hits(term):
+            return client.get("/api/search", params={"q": term, "project_id": project_id}).json()["results"]
+
+        assert hits("alpha") == []
+        assert [r["path"] for r in hits("bravozulu")] == ["a.tex"]
+
+        client.delete(f"/api/files/{project_id}/a.tex")
+        assert hits("bravozulu") == []
+
+    def test_regex_post_filter_and_pagination(self, client):
+        files = {f"ch{i}.tex": f"\\label{{sec:{i}}}\nchapter text {i}" for i in range(5)}
+        project_id = _project(client, "Regex", files)
+
+        data = client.get(
+            "/api/search", params={"q": "chapter", "project_id": project_id, "regex": r"sec:[0-2]\}"}
+        ).json()
+        assert sorted(r["path"] for r in data["results"]) == ["ch0.tex", "ch1.tex", "ch2.tex"]
+        assert data["results"][0]["matches"][0]["line"] == 1
+
+        page = client.get("/api/search", params={"q": "chapter", "project_id": project_id, "page_size": 2}).json()
+        assert len(page["results"]) == 2
+        assert page["has_more"] is True
+
+    def test_latex_query_and_invalid_regex(self, client):
+        project_id = _project(client, "Syntax", {"a.tex": '\\section{Intro} "quoted"'})
+        response = client.get("/api/search", params={"q": '\\section{Intro "quoted', "project_id": project_id})
+        assert response.status_code == 200
+
+        response = client.get("/api/search", params={"q": "intro", "project_id": project_id, "regex": "("})
+        assert response.status_code == 400
+        assert response.json()["detail"].startswith("Invalid regex")
+
+    def test_regex_search_is_bounded(self, client, monkeypatch):
+        from pulse_tex.core import database
+
+        monkeypatch.setattr(database, "REGEX_CANDIDATES_PER_RESULT", 1)
+        project_id = _project(client, "Bounded", {f"n{i}.tex": f"notebook entry {i}" for i in range(5)})
+
+        def search(page, regex):
+            params = {"q": "notebook", "project_id": project_id, "regex": regex, "page": page, "page_size": 2}
+            return client.get("/api/search", params=params).json()
+
+        first = search(1, "missing")
+        assert first["results"] == []
+        assert first["has_more"] is True
+        last = search(3, "missing")
+        assert last["results"] == []
+        assert last["has_more"] is False
+        assert len(search(1, "entry")["results"]) == 2
+
+        response = client.get("/api/search", params={"q": "notebook", "regex": "entry"})
+        assert response.status_code == 400
+        assert "project_id" in response.json()["detail"]
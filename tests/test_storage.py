@@ -0,0 +1,204 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+os.environ["PULSE_TEX_DATABASE_URL"] = "sqlite:///tests/test.db"
+os.environ["PULSE_TEX_PROJECTS_DIR"] = "tests/projects"
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + bytes(range(256))
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from pulse_tex.web.app import create_app
+
+    monkeypatch.setenv("PULSE_TEX_PROJECTS_DIR", str(tmp_path))
+    app = create_app()
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def fs_project(client):
+    return client.post("/api/projects", json={"name": "On disk", "storage": "fs"}).json()
+
+
+def _search(client, project_id, q):
+    return [r["path"] for r in client.get("/api/search", params={"q": q, "project_id": project_id}).json()["results"]]
+
+
+class TestFilesystemStorage:
+    def test_sources_live_on_disk(self, client, fs_project, tmp_path):
+        from pulse_tex.core import get_db
+        from pulse_tex.models import ProjectFile
+
+        project_id = fs_project["id"]
+        assert fs_project["storage"] == "fs"
+        client.post(f"/api/files/{project_id}", json={"path": "refs/main.bib", "content": "@book{knuth}"})
+
+        src = tmp_path / project_id / "src"
+        assert (src / "refs/main.bib").read_text() == "@book{knuth}"
+        assert "\\documentclass" in (src / "main.tex").read_text()
+
+        with get_db().get_session() as session:
+            row = session.query(ProjectFile).filter_by(project_id=project_id, path="refs/main.bib").one()
+            assert row.content is None
+            assert row.blob_size == len("@book{knuth}")
+
+        assert client.get(f"/api/files/{project_id}/refs/main.bib").json()["content"] == "@book{knuth}"
+        assert _search(client, project_id, "knuth") == ["refs/main.bib"]
+
+    def test_paths_outside_the_project_are_rejected(self, client, fs_project, tmp_path):
+        project_id = fs_project["id"]
+        for path in ("../escape.tex", "/abs.tex", "a/../../escape.tex"):
+            response = client.post(f"/api/files/{project_id}", json={"path": path, "content": "x"})
+            assert response.status_code == 400
+            assert response.json()["detail"] == "Invalid file path"
+        response = client.patch(f"/api/files/{project_id}//abs.tex", json={"content": "x"})
+        assert response.status_code == 400
+        response = client.patch(f"/api/files/{project_id}/a/%2E%2E/%2E%2E/escape.tex", json={"content": "x"})
+        assert response.status_code == 400
+        assert not (tmp_path / project_id / "escape.tex").exists()
+        assert not (tmp_path / "escape.tex").exists()
+
+    def test_buffered_edits_reach_disk_on_flush(self, client, fs_project, tmp_path):
+        from pulse_tex.core import get_db
+
+        project_id = fs_project["id"]
+        client.patch(f"/api/files/{project_id}/main.tex", json={"content": "edited"})
+        assert client.get(f"/api/files/{project_id}/main.tex").json()["content"] == "edited"
+
+        get_db().flush_file_writes(project_id)
+        assert (tmp_path / project_id / "src" / "main.tex").read_text() == "edited"
+        assert _search(client, project_id, "edited") == ["main.tex"]
+
+    def test_external_changes_are_picked_up(self, client, fs_project, tmp_path):
+        project_id = fs_project["id"]
+        src = tmp_path / project_id / "src"
+        (src / "chapter.tex").write_text("written by an external editor")
+        (src / "main.tex").write_text("changed outside")
+        later = time.time() + 5
+        os.utime(src / "main.tex", (later, later))
+        (src / ".git").mkdir()
+        (src / ".git" / "HEAD").write_text("ref: refs/heads/main")
+
+        files = {f["path"]: f for f in client.get(f"/api/files/{project_id}").json()}
+        assert set(files) == {"main.tex", "chapter.tex"}
+        assert files["main.tex"]["content"] == "changed outside"
+        assert _search(client, project_id, "external") == ["chapter.tex"]
+
+        (src / "chapter.tex").unlink()
+        assert [f["path"] for f in client.get(f"/api/files/{project_id}").json()] == ["main.tex"]
+
+    def test_delete_and_rename_touch_disk(self, client, fs_project, tmp_path):
+        project_id = fs_project["id"]
+        src = tmp_path / project_id / "src"
+        client.post(f"/api/files/{project_id}", json={"path": "a.tex", "content": "alpha"})
+        client.post(f"/api/files/{project_id}", json={"path": "b.tex", "content": "bravo"})
+
+        operations = [
+            {"op": "rename", "path": "a.tex", "new_path": "parts/a.tex"},
+            {"op": "delete", "path": "b.tex"},
+        ]
+        assert client.post(f"/api/files/{project_id}/batch", json={"operations": operations}).json()["success"]
+        assert (src / "parts/a.tex").read_text() == "alpha"
+        assert not (src / "a.tex").exists() and not (src / "b.tex").exists()
+        assert _search(client, project_id, "alpha") == ["parts/a.tex"]
+
+        client.delete(f"/api/files/{project_id}/parts/a.tex")
+        assert not (src / "parts/a.tex").exists()
+
+    def test_clone_and_binary_upload(self, client, fs_project, tmp_path):
+        project_id = fs_project["id"]
+        client.post(
+            f"/api/files/{project_id}/upload",
+            files={"file": ("fig.png", PNG_BYTES, "image/png")},
+            data={"path": "fig.png"},
+        )
+        assert (tmp_path / project_id / "src" / "fig.png").read_bytes() == PNG_BYTES
+        client.post(f"/api/files/{project_id}", json={"path": "refs.bib", "content": "@book{knuth}\n"})
+
+        clone = client.post(f"/api/projects/{project_id}/clone", json={"name": "Copy"}).json()
+        assert clone["storage"] == "fs"
+        client.patch(f"/api/files/{clone['id']}/main.tex", json={"content": "only in the copy"})
+        from pulse_tex.core import get_db
+
+        get_db().flush_file_writes()
+        assert (tmp_path / clone["id"] / "src" / "main.tex").read_text() == "only in the copy"
+        assert "\\documentclass" in (tmp_path / project_id / "src" / "main.tex").read_text()
+        assert client.get(f"/api/files/{clone['id']}/fig.png", params={"raw": True}).content == PNG_BYTES
+
+        # Editors that save in place (vim with backupcopy=yes, appends) write to the clone's own inode.
+        with open(tmp_path / clone["id"] / "src" / "refs.bib", "a") as f:
+            f.write("% appended in place")
+        assert (tmp_path / project_id / "src" / "refs.bib").read_text() == "@book{knuth}\n"
+
+        client.delete(f"/api/projects/{clone['id']}")
+        assert not (tmp_path / clone["id"] / "src").exists()
+
+    def test_uploads_are_private_writable_copies(self, client, fs_project, tmp_path):
+        from pulse_tex.core import get_db
+        from pulse_tex.models import ProjectFile
+        from pulse_tex.services.blob_store import blob_store
+
+        project_id = fs_project["id"]
+        client.post(
+            f"/api/files/{project_id}/upload",
+            files={"file": ("fig.png", PNG_BYTES, "image/png")},
+            data={"path": "fig.png"},
+        )
+        with get_db().get_session() as session:
+            digest = session.query(ProjectFile).filter_by(project_id=project_id, path="fig.png").one().blob_hash
+
+        source = tmp_path / project_id / "src" / "fig.png"
+        assert os.stat(source).st_ino != os.stat(blob_store.path_for(digest)).st_ino
+        assert os.stat(source).st_mode & 0o200
+        with open(source, "r+b") as f:
+            f.write(b"edited")
+        assert blob_store.path_for(digest).read_bytes() == PNG_BYTES
+
+    def test_copy_tree_copies_sources(self, tmp_path):
+        from pulse_tex.core.storage import FilesystemStorage
+
+        storage = FilesystemStorage(tmp_path)
+        from datetime import UTC, datetime
+
+        storage.write("p", "sec/intro.tex", "hi", datetime.now(UTC).replace(tzinfo=None))
+        (storage.src_dir("p") / "main.aux").write_text("from an external latexmk run")
+        (storage.src_dir("p") / ".git").mkdir()
+
+        build = tmp_path / "build"
+        storage.copy_tree("p", build)
+        assert not (build / ".git").exists()
+        assert (build / "sec/intro.tex").read_text() == "hi"
+        assert os.stat(build / "sec/intro.tex").st_ino != os.stat(storage.src_dir("p") / "sec/intro.tex").st_ino
+
+        # Engines truncate and rewrite their outputs in place.
+        with open(build / "main.aux", "r+") as aux:
+            aux.truncate(0)
+            aux.write("rewritten by the build")
+        assert (storage.src_dir("p") / "main.aux").read_text() == "from an external latexmk run"
+
+    def test_compile_builds_from_tree_snapshot(self, client, fs_project, tmp_path, monkeypatch):
+        from pulse_tex.web.api import compile as compile_api
+
+        def fake_tectonic(main_file, tmpdir):
+            (Path(tmpdir) / "main.pdf").write_bytes((Path(tmpdir) / main_file).read_bytes())
+            return True, ""
+
+        monkeypatch.setattr(compile_api, "compile_with_tectonic", fake_tectonic)
+        project_id = fs_project["id"]
+        (tmp_path / project_id / "src" / "main.tex").write_text("from disk")
+        later = time.time() + 5
+        os.utime(tmp_path / project_id / "src" / "main.tex", (later, later))
+
+        result = client.post(f"/api/compile/{project_id}").json()
+        assert result["success"]
+        assert client.get(f"/api/compile/{project_id}/pdf").content == b"from disk"
+        assert set(client.get(f"/api/compile/{project_id}/build").json()["files"]) == {"main.tex"}